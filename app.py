@@ -1,26 +1,60 @@
-# app.py — Detector de Canastas Llenas (Multi-empresa + Unificación por CUIT + Filtro vendedor + SQLite)
-# requirements.txt: streamlit, pandas, numpy
+# app.py — Detector de Canastas Llenas (Multi-empresa + Unificación por CUIT + Filtro vendedor + SQLite / Parquet)
+# requirements.txt: streamlit, pandas, numpy, scipy, pyarrow
 
-import io
 import os
-import re
-import sqlite3
-from datetime import datetime
+import threading
+import time
+from functools import partial
 
-import numpy as np
 import pandas as pd
 import streamlit as st
 
+from canastas.artifacts import load_or_build_model, model_key
+from canastas.ingest import concat_frames, file_hash, read_files
+from canastas.model import (
+    ASSOC_METRICS,
+    as_counts,
+    association_model,
+    key_index,
+    model_slice,
+    related_subrubros,
+    top_clients_for_subrubro,
+    weighted_model,
+)
+from canastas.recommend import client_recommendations
+from canastas.registry import REGISTRY_RETRY_SECONDS, ModelRegistry
+from canastas.store import backend, db_read_recommendations, db_recommendation_params
+from canastas.search import SEARCH_LIMIT, build_search_index, search
+from canastas.timing import collect, dump_profile, peak_rss_mb, setup_log, span, start_profile, summarize
+
 
 # -----------------------------
 # Config
 # -----------------------------
 st.set_page_config(page_title="Detector de Canastas Llenas", layout="wide")
 
+ASSOC_LABELS = {
+    "co": "Co-ocurrencia (clientes)",
+    "lift": "Lift",
+    "jaccard": "Jaccard",
+    "confianza": "Probabilidad condicional",
+    "pmi": "PMI",
+}
+
+# fuente -> backend de ventas (canastas.store.backend)
+BACKENDS = {"Usar base (SQLite)": "sqlite", "Usar base (Parquet)": "parquet"}
+
 TITLE = "🧺 Detector de Canastas Llenas"
 SUBTITLE = "Cross-selling por co-ocurrencia de subrubros. Unificación cliente por CUIT (Cromosol + BBA)."
 
-DB_PATH = "data_cache.sqlite"
+# Diagnóstico: cada rerun junta sus spans (canastas.timing) para el panel del final.
+# CANASTAS_LOG=1 -> además como JSON por stderr; CANASTAS_PROFILE=<carpeta> -> un .prof por rerun
+PROFILE_DIR = os.environ.get("CANASTAS_PROFILE")
+setup_log()
+spans = collect()
+profiler = start_profile(PROFILE_DIR, previous=st.session_state.pop("profiler", None))
+st.session_state["profiler"] = profiler  # por sesión: otra sesión perfilando no lo pisa
+run_t0 = time.perf_counter()
 
 
 # -----------------------------
@@ -31,189 +65,8 @@ st.caption(SUBTITLE)
 
 
 # -----------------------------
-# Helpers: columnas / números / lectura
+# Formato
 # -----------------------------
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df.columns = (
-        df.columns.astype(str)
-        .str.strip()
-        .str.lower()
-        .str.replace(r"\s+", "_", regex=True)
-        .str.replace("$", "", regex=False)
-    )
-    return df
-
-
-def _to_number(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s = s.str.replace("\u00a0", "", regex=False).str.replace(" ", "", regex=False)
-
-    # Heurística: si contiene coma -> decimal coma y miles punto
-    mask_comma = s.str.contains(",", regex=False)
-    s.loc[mask_comma] = (
-        s.loc[mask_comma]
-        .str.replace(".", "", regex=False)
-        .str.replace(",", ".", regex=False)
-    )
-    s.loc[~mask_comma] = s.loc[~mask_comma].str.replace(",", "", regex=False)
-
-    s = s.str.replace(r"[^\d\.\-]", "", regex=True)
-    return pd.to_numeric(s, errors="coerce")
-
-
-def _guess_sep_and_read(raw: bytes) -> pd.DataFrame:
-    encodings = ["utf-8-sig", "utf-8", "latin1", "utf-16"]
-    seps = [";", ",", "\t", "|"]
-
-    last_err = None
-    for enc in encodings:
-        for sep in seps:
-            try:
-                df = pd.read_csv(io.BytesIO(raw), sep=sep, encoding=enc)
-                if df.shape[1] <= 1:
-                    continue
-                return df
-            except Exception as e:
-                last_err = e
-                continue
-    raise RuntimeError(f"No pude leer el archivo. Último error: {last_err}")
-
-
-def read_any_table(uploaded_file) -> pd.DataFrame:
-    name = (uploaded_file.name or "").lower()
-
-    if name.endswith(".xlsx") or name.endswith(".xls"):
-        df = pd.read_excel(uploaded_file)
-        return _normalize_columns(df)
-
-    raw = uploaded_file.getvalue()
-    df = _guess_sep_and_read(raw)
-    return _normalize_columns(df)
-
-
-def infer_empresa_from_filename(filename: str) -> str:
-    fn = (filename or "").lower()
-    if "cromo" in fn:
-        return "CROMOSOL"
-    if "bba" in fn:
-        return "BBA"
-    # fallback
-    return "SIN_ETIQUETA"
-
-
-# -----------------------------
-# Mapeo de columnas esperadas
-# -----------------------------
-REQUIRED = {
-    "cliente": ["cliente", "razonsocial", "razon_social", "razon", "cliente_nombre"],
-    "cliente_id": ["cliente_id", "cliente_codigo", "codigo_cliente", "id_cliente", "nro_cliente", "numero_cliente"],
-    "cuit": ["cuit", "cuit_cliente", "tax_id", "cuitcuil", "cuil"],
-    "subrubro": ["subrubro", "articulo_sub_rubro", "articulo_subrubro", "sub_rubro", "subrubros"],
-    "importe": ["importe", "monto", "total", "neto", "importe_neto"],
-    "unidades": ["unidades", "unidad", "qty", "cantidad"],
-    "cant_pedidos": ["cant_pedidos", "cantidad_pedidos", "cant_pedido", "pedidos", "cantidad_pedidos_distintos"],
-    "anio_mes": ["anio_mes", "año_mes", "periodo", "mes", "year_month", "anio_mes_norm"],
-    "articulo_codigo": ["articulo_codigo", "articulo_cod", "codigo_articulo", "sku", "articulo", "codigo"],
-    "articulo_descripcion": ["articulo_descripcion", "descripcion", "articulo_desc", "producto", "desc"],
-    # NUEVO: vendedor
-    "vendedor": ["vendedor", "cod_vendedor", "vendedor_id", "vendedor_nombre", "sales_rep", "representante"],
-}
-
-
-def pick_col(df_cols, candidates):
-    for c in candidates:
-        if c in df_cols:
-            return c
-    return None
-
-
-def clean_cuit(x) -> str:
-    s = str(x or "").strip()
-    s = re.sub(r"\D", "", s)
-    # CUIT típico 11 dígitos. Si viene con basura igual lo dejamos numérico.
-    return s
-
-
-def standardize_one(df: pd.DataFrame, empresa: str) -> pd.DataFrame:
-    df = df.copy()
-    cols = set(df.columns)
-
-    mapping = {}
-    for std_name, candidates in REQUIRED.items():
-        col = pick_col(cols, candidates)
-        if col:
-            mapping[std_name] = col
-
-    if "subrubro" not in mapping:
-        raise ValueError("Falta columna de subrubro (ej: 'subrubro').")
-
-    if "cliente" not in mapping and "cliente_id" not in mapping:
-        raise ValueError("Falta columna de cliente (razón social o id).")
-
-    if "articulo_codigo" not in mapping or "articulo_descripcion" not in mapping:
-        raise ValueError("Necesito articulo_codigo y articulo_descripcion para productos (Punto 4).")
-
-    df = df.rename(columns={v: k for k, v in mapping.items()})
-
-    # defaults
-    if "cliente" not in df.columns and "cliente_id" in df.columns:
-        df["cliente"] = df["cliente_id"].astype(str)
-
-    if "cliente_id" not in df.columns:
-        df["cliente_id"] = ""
-
-    if "cuit" not in df.columns:
-        df["cuit"] = ""
-
-    if "vendedor" not in df.columns:
-        df["vendedor"] = ""
-
-    df["empresa"] = empresa
-
-    # clean
-    df["cliente"] = df["cliente"].astype(str).str.strip()
-    df["cliente_id"] = df["cliente_id"].astype(str).str.strip()
-    df["cuit"] = df["cuit"].map(clean_cuit)
-    df["vendedor"] = df["vendedor"].astype(str).str.strip()
-
-    df["subrubro"] = df["subrubro"].astype(str).str.strip()
-    df["articulo_codigo"] = df["articulo_codigo"].astype(str).str.strip()
-    df["articulo_descripcion"] = df["articulo_descripcion"].astype(str).str.strip()
-
-    df["importe"] = _to_number(df.get("importe", pd.Series([0] * len(df)))).fillna(0.0)
-    df["unidades"] = _to_number(df.get("unidades", pd.Series([0] * len(df)))).fillna(0.0)
-
-    # si no viene cant_pedidos, ponemos 1 por fila (aprox)
-    if "cant_pedidos" in df.columns:
-        df["cant_pedidos"] = _to_number(df["cant_pedidos"]).fillna(0.0)
-        df.loc[df["cant_pedidos"] <= 0, "cant_pedidos"] = 1.0
-    else:
-        df["cant_pedidos"] = 1.0
-
-    if "anio_mes" in df.columns:
-        df["anio_mes"] = df["anio_mes"].astype(str).str.strip()
-    else:
-        df["anio_mes"] = ""
-
-    # filtro de filas mínimas
-    df = df[
-        df["cliente"].ne("")
-        & df["subrubro"].ne("")
-        & df["articulo_codigo"].ne("")
-        & df["articulo_descripcion"].ne("")
-    ].copy()
-
-    # clave unificada por CUIT (si falta CUIT, fallback por cliente normalizado)
-    # OJO: para unificar por CUIT sí o sí, ideal que venga CUIT.
-    df["cliente_key"] = df["cuit"]
-    df.loc[df["cliente_key"].eq("") | df["cliente_key"].isna(), "cliente_key"] = (
-        df["cliente"].str.lower().str.replace(r"\s+", " ", regex=True).str.strip().map(lambda x: f"NO_CUIT::{x}")
-    )
-
-    return df
-
-
 def fmt_int(n: int) -> str:
     return f"{int(n):,}".replace(",", ".")
 
@@ -222,199 +75,74 @@ def fmt_money(n: float) -> str:
     return f"{float(n):,.0f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
-def metric_col_name(rank_metric: str) -> str:
-    return {"importe": "importe", "unidades": "unidades", "pedidos": "cant_pedidos"}[rank_metric]
-
-
-def normalize_period(s: str) -> str:
-    s = (s or "").strip().replace("/", "-")
-    m = re.match(r"^(\d{4})-(\d{1,2})$", s)
-    if m:
-        y, mo = m.group(1), int(m.group(2))
-        return f"{y}{mo:02d}"
-    digs = re.sub(r"\D", "", s)
-    if len(digs) == 6:
-        return digs
-    return s
-
-
 # -----------------------------
-# SQLite: guardar / cargar
+# Modelo (cache del proceso)
 # -----------------------------
-def db_init():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS ventas (
-            empresa TEXT,
-            cliente_key TEXT,
-            cuit TEXT,
-            cliente TEXT,
-            cliente_id TEXT,
-            vendedor TEXT,
-            subrubro TEXT,
-            importe REAL,
-            unidades REAL,
-            cant_pedidos REAL,
-            anio_mes TEXT,
-            articulo_codigo TEXT,
-            articulo_descripcion TEXT,
-            loaded_at TEXT
-        )
-        """
-    )
-    conn.commit()
-    conn.close()
-
-
-def db_clear():
-    if not os.path.exists(DB_PATH):
-        return
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM ventas")
-    conn.commit()
-    conn.close()
-
-
-def db_save_df(df: pd.DataFrame):
-    db_init()
-    conn = sqlite3.connect(DB_PATH)
-    out = df.copy()
-    out["loaded_at"] = datetime.now().isoformat(timespec="seconds")
-    out.to_sql("ventas", conn, if_exists="append", index=False)
-    conn.close()
-
-
-def db_load_df() -> pd.DataFrame:
-    if not os.path.exists(DB_PATH):
-        return pd.DataFrame()
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM ventas", conn)
-    conn.close()
-    return df
-
-
-# -----------------------------
-# Modelo (cache)
-# -----------------------------
-@st.cache_data(show_spinner=False)
-def build_model(df: pd.DataFrame):
-    df = df.copy()
-    df["anio_mes_norm"] = df["anio_mes"].map(normalize_period)
-
-    # agregación cliente_key x subrubro (UNIFICADO)
-    agg_cs = df.groupby(["cliente_key", "subrubro"], as_index=False).agg(
-        cant_pedidos=("cant_pedidos", "sum"),
-        unidades=("unidades", "sum"),
-        importe=("importe", "sum"),
-    )
-
-    pivot_pedidos = agg_cs.pivot_table(
-        index="cliente_key",
-        columns="subrubro",
-        values="cant_pedidos",
-        aggfunc="sum",
-        fill_value=0.0,
+@st.cache_resource(show_spinner=False)
+def model_registry():
+    # uno por proceso, compartido por todas las sesiones: el modelo global de cada alcance
+    # se arma en un solo hilo y, si los datos cambian, se sigue sirviendo la versión
+    # anterior hasta que la nueva está lista (canastas.registry)
+    return ModelRegistry()
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_model_slice(key: str, _model, vendedor: str):
+    # modelo de un vendedor = corte del modelo global (no relee ni reagrupa las ventas);
+    # pasado max_entries se descartan los menos usados (LRU)
+    return model_slice(_model, vendedor)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_weighted_model(key: str, _model, ventana: int = None, vida_media: float = None):
+    return weighted_model(_model, ventana=ventana, vida_media=vida_media)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_association_model(key: str, _model, asociacion: str = "co", top_k: int = None):
+    return association_model(_model, asociacion=asociacion, top_k=top_k)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_search_index(key: str, _catalog: pd.DataFrame):
+    return build_search_index(_catalog)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def materialize_in_background(key: str, _model, _filters: dict):
+    # una vez por modelo global (sin filtros ni ajustes): si la base no tiene sus
+    # recomendaciones precalculadas, se calculan en un hilo; mientras tanto tab_cliente
+    # calcula en vivo. Otros alcances se calculan en vivo salvo que los haya materializado
+    # la CLI (python -m canastas.batch con esos filtros)
+    if db_recommendation_params(key) is not None:
+        return None
+    from canastas.batch import materialize  # pool de procesos / memoria compartida: solo si hace falta
+
+    t = threading.Thread(target=materialize, args=(_model, key, _filters), daemon=True)
+    t.start()
+    return t
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def read_uploads(hashes: tuple, _uploads, save_to_db: bool, replace_periods: bool, backend_name: str, _progress=None):
+    # una vez por juego de archivos (hashes): los reruns de la página no vuelven a leer,
+    # estandarizar ni cargar en la base. Devuelve (ventas, filas escritas, errores por
+    # archivo): un archivo que falla no corta los demás.
+    # De a uno (workers=1): con `streamlit run` el __main__ es esta página y un proceso hijo
+    # (spawn) la volvería a correr entera al arrancar, sin sesión, y moriría.
+    results = read_files(
+        _uploads,
+        hashes,
+        save_to_db=save_to_db,
+        replace_periods=replace_periods,
+        workers=1,
+        progress=_progress,
+        backend=backend(backend_name),
     )
-
-    X_bin = (pivot_pedidos > 0).astype(np.float32).values
-    norms = np.linalg.norm(X_bin, axis=1)
-    norms[norms == 0] = 1.0
-
-    clients = pivot_pedidos.index.to_numpy()
-    subrubros = pivot_pedidos.columns.to_numpy()
-
-    co = pd.DataFrame(X_bin.T @ X_bin, index=subrubros, columns=subrubros)
-    freq = pivot_pedidos.sum(axis=0).sort_values(ascending=False)
-
-    return df, agg_cs, pivot_pedidos, co, freq, X_bin, norms, clients, subrubros
-
-
-def recommend_for_client(cliente_key: str, pivot: pd.DataFrame, co: pd.DataFrame, freq: pd.Series, topk=10):
-    if cliente_key not in pivot.index:
-        return pd.DataFrame(columns=["subrubro", "score_cooc", "freq_global"])
-
-    owned = pivot.loc[cliente_key]
-    bought = owned[owned > 0].index.tolist()
-    not_bought = owned[owned == 0].index.tolist()
-
-    if len(bought) == 0:
-        rec = freq.head(topk).reset_index()
-        rec.columns = ["subrubro", "freq_global"]
-        rec["score_cooc"] = np.nan
-        return rec[["subrubro", "score_cooc", "freq_global"]]
-
-    scores = co.loc[not_bought, bought].sum(axis=1)
-    rec = pd.DataFrame(
-        {
-            "subrubro": scores.index,
-            "score_cooc": scores.values,
-            "freq_global": freq.reindex(scores.index).fillna(0).values,
-        }
-    ).sort_values(["score_cooc", "freq_global"], ascending=False)
-
-    return rec.head(topk)
-
-
-def top_products_similar_clients(
-    df: pd.DataFrame,
-    selected_cliente_key: str,
-    subrubro: str,
-    rank_metric: str,
-    topn: int,
-    pivot: pd.DataFrame,
-    X_bin: np.ndarray,
-    norms: np.ndarray,
-    clients: np.ndarray,
-    neighbors_n: int = 50,
-    exclude_already_bought: bool = True,
-):
-    if selected_cliente_key not in pivot.index:
-        return pd.DataFrame()
-
-    idx = np.where(clients == selected_cliente_key)[0][0]
-    v = X_bin[idx]
-    sim = (X_bin @ v) / (norms * norms[idx])
-    sim[idx] = -1.0
-
-    top_idx = np.argsort(sim)[::-1][:neighbors_n]
-    neigh_clients = clients[top_idx]
-    neigh_sim = sim[top_idx]
-
-    dfx = df[(df["subrubro"] == subrubro) & (df["cliente_key"].isin(neigh_clients))].copy()
-
-    weights = pd.DataFrame({"cliente_key": neigh_clients, "w": neigh_sim})
-    dfx = dfx.merge(weights, on="cliente_key", how="left")
-    dfx["w"] = dfx["w"].fillna(0.0)
-
-    dfx["importe_w"] = dfx["importe"] * dfx["w"]
-    dfx["unidades_w"] = dfx["unidades"] * dfx["w"]
-    dfx["pedidos_w"] = dfx["cant_pedidos"] * dfx["w"]
-
-    metric_w = {"importe": "importe_w", "unidades": "unidades_w", "pedidos": "pedidos_w"}[rank_metric]
-
-    g = (
-        dfx.groupby(["articulo_codigo", "articulo_descripcion"], as_index=False)
-        .agg(
-            score=(metric_w, "sum"),
-            importe=("importe", "sum"),
-            unidades=("unidades", "sum"),
-            pedidos=("cant_pedidos", "sum"),
-            vecinos=("cliente_key", "nunique"),
-            ultimo_mes=("anio_mes_norm", "max"),
-        )
-        .sort_values("score", ascending=False)
-    )
-
-    if exclude_already_bought:
-        bought = set(
-            df[(df["cliente_key"] == selected_cliente_key) & (df["subrubro"] == subrubro)]["articulo_codigo"].unique()
-        )
-        g = g[~g["articulo_codigo"].isin(bought)]
-
-    return g.head(topn)
+    frames = [r.frame for r in results if r.error is None]
+    errors = [f"{r.name}: {r.error}" for r in results if r.error is not None]
+    written = sum(r.written for r in results)
+    return (concat_frames(frames) if frames else None), written, errors
 
 
 # -----------------------------
@@ -422,7 +150,7 @@ def top_products_similar_clients(
 # -----------------------------
 with st.sidebar:
     st.header("Datos")
-    mode = st.radio("Fuente", ["Subir archivos", "Usar base (SQLite)"], index=0)
+    mode = st.radio("Fuente", ["Subir archivos", *BACKENDS], index=0)
 
     if mode == "Subir archivos":
         uploads = st.file_uploader(
@@ -431,24 +159,34 @@ with st.sidebar:
             accept_multiple_files=True,
         )
         st.caption("Tip: si el nombre del archivo contiene 'bba' o 'cromo' lo etiqueta solo como empresa.")
+        backend_name = st.radio("Base", ["sqlite", "parquet"], format_func=str.title, horizontal=True)
+        be = backend(backend_name)
 
         colA, colB = st.columns(2)
         with colA:
-            save_to_db = st.checkbox("Guardar en base (SQLite)", value=True)
+            save_to_db = st.checkbox("Guardar en base", value=True)
+            replace_periods = st.checkbox(
+                "Reemplazar meses ya cargados",
+                value=False,
+                help="Si no, los meses (empresa + período) que ya están en la base se saltean.",
+            )
         with colB:
             if st.button("🧽 Limpiar base", use_container_width=True):
-                db_clear()
+                be.clear()
+                read_uploads.clear()  # para que los mismos archivos se vuelvan a cargar
                 st.success("Base limpiada.")
 
     else:
-        st.info("Cargando datos desde la base SQLite local…")
+        backend_name = BACKENDS[mode]
+        be = backend(backend_name)
+        st.info(f"Cargando datos desde la base {backend_name.title()} local…")
         colA, colB = st.columns(2)
         with colA:
             if st.button("🔄 Recargar base", use_container_width=True):
-                st.cache_data.clear()
+                st.cache_resource.clear()
         with colB:
             if st.button("🧽 Limpiar base", use_container_width=True):
-                db_clear()
+                be.clear()
                 st.success("Base limpiada.")
 
 
@@ -456,122 +194,236 @@ with st.sidebar:
 # Carga de datos
 # -----------------------------
 df_all = None
+from_db = mode in BACKENDS
 
-if mode == "Usar base (SQLite)":
-    df_db = db_load_df()
-    if df_db.empty:
+if from_db:
+    vendedores_db, empresas_db, periodos_db = be.filter_options()
+    if not periodos_db:
         st.warning("La base está vacía. Elegí 'Subir archivos' y guardá en base.")
         st.stop()
-    df_all = df_db.copy()
+
+    # en modo base los filtros se aplican en la consulta (no se lee todo y se filtra después)
+    with st.sidebar:
+        st.divider()
+        st.header("Filtro")
+        if vendedores_db:
+            vendedor_sel = st.selectbox("Vendedor", options=["(Todos)"] + vendedores_db, index=0)
+        else:
+            vendedor_sel = "(Todos)"
+            st.caption("⚠️ No detecté columna de vendedor (o viene vacía). El filtro de vendedor no se aplicará.")
+        empresas_sel = st.multiselect("Empresas", options=empresas_db, default=empresas_db)
+        if len(periodos_db) > 1:
+            period_from, period_to = st.select_slider(
+                "Períodos", options=periodos_db, value=(periodos_db[0], periodos_db[-1])
+            )
+        else:
+            period_from, period_to = periodos_db[0], periodos_db[-1]
+
+    if not empresas_sel:
+        st.warning("Elegí al menos una empresa.")
+        st.stop()
+
+    # empresas ordenadas (como batch._scopes): el orden en que se eligieron no cambia la clave
+    filters = {
+        "vendedor": None if vendedor_sel == "(Todos)" else vendedor_sel,
+        "empresas": None if len(empresas_sel) == len(empresas_db) else sorted(empresas_sel),
+        "period_from": None if period_from == periodos_db[0] else period_from,
+        "period_to": None if period_to == periodos_db[-1] else period_to,
+    }
+    # el modelo global (todos los vendedores) se arma una vez; cambiar de vendedor solo corta
+    vendedor = filters["vendedor"]
+    source, scope, base_scope = be.fingerprint(), filters, {**filters, "vendedor": None}
+
+    def load_df(**kw):
+        return be.load_df(**{**base_scope, **kw})
+
+    def month_fps():
+        return be.month_fingerprints(**base_scope)
 
 else:
     if not uploads:
         st.info("Subí al menos un archivo para empezar.")
         st.stop()
 
-    frames = []
-    for up in uploads:
-        try:
-            df_raw = read_any_table(up)
-            empresa = infer_empresa_from_filename(up.name)
-            df_std = standardize_one(df_raw, empresa=empresa)
-            frames.append(df_std)
-        except Exception as e:
-            st.error(f"Error leyendo {up.name}: {e}")
-            st.stop()
+    # cada archivo se lee por bloques (canastas.ingest); con save_to_db cada bloque se
+    # escribe en la base antes de leer el siguiente
+    hashes = [file_hash(up) for up in uploads]
+    bar = st.empty()
 
-    df_all = pd.concat(frames, ignore_index=True)
+    def show_progress(i, n, res):
+        status = f"⚠️ {res.name}" if res.error else f"{res.name}: {fmt_int(len(res.frame))} filas"
+        bar.progress((i + 1) / n, text=f"Leyendo archivos ({i + 1}/{n}) — {status}")
+
+    df_all, written, errors = read_uploads(
+        tuple(hashes), uploads, save_to_db, replace_periods, backend_name, show_progress
+    )
+    bar.empty()
+    for err in errors:
+        st.error(f"Error leyendo {err}")
+    if df_all is None:
+        st.stop()
 
     if save_to_db:
-        # estrategia simple: limpiar y guardar todo (para evitar duplicados)
-        # después lo refinamos con "dataset_id" si querés histórico.
-        db_clear()
-        db_save_df(df_all)
-        st.success("Guardado en base (SQLite).")
+        if written:
+            st.success(f"Guardado en base ({backend_name.title()}): {fmt_int(written)} filas nuevas/actualizadas.")
+        else:
+            st.info("La base ya tenía estos archivos/meses: no hubo filas nuevas.")
 
 
 # -----------------------------
 # Filtro por vendedor (si existe)
 # -----------------------------
-has_vendedor = df_all["vendedor"].astype(str).str.strip().ne("").any()
-if has_vendedor:
-    vendedores = sorted([v for v in df_all["vendedor"].dropna().astype(str).unique().tolist() if v.strip() != ""])
-    with st.sidebar:
-        st.divider()
-        st.header("Filtro")
-        vendedor_sel = st.selectbox("Vendedor", options=["(Todos)"] + vendedores, index=0)
-    if vendedor_sel != "(Todos)":
-        df_all = df_all[df_all["vendedor"] == vendedor_sel].copy()
-else:
-    with st.sidebar:
-        st.divider()
-        st.caption("⚠️ No detecté columna de vendedor (o viene vacía). El filtro de vendedor no se aplicará.")
-
+# (en modo base el selector está arriba, con el resto de los filtros). No se filtra df_all:
+# el modelo global se arma una vez y cada vendedor es un corte (get_model_slice).
+if mode == "Subir archivos":
+    vendedor_sel = "(Todos)"
+    # df_all es compacto (category con un diccionario ordenado): se mira el diccionario, no las filas
+    vendedores = [v for v in df_all["vendedor"].cat.categories if str(v).strip() != ""]
+    has_vendedor = bool(vendedores)
+    if has_vendedor:
+        with st.sidebar:
+            st.divider()
+            st.header("Filtro")
+            vendedor_sel = st.selectbox("Vendedor", options=["(Todos)"] + vendedores, index=0)
+    else:
+        with st.sidebar:
+            st.divider()
+            st.caption("⚠️ No detecté columna de vendedor (o viene vacía). El filtro de vendedor no se aplicará.")
 
-# -----------------------------
-# KPIs + Info unificación
-# -----------------------------
-# “Clientes” = cliente_key unificado
-c1, c2, c3, c4 = st.columns(4)
-c1.metric("Filas", fmt_int(len(df_all)))
-c2.metric("Clientes unificados", fmt_int(df_all["cliente_key"].nunique()))
-c3.metric("Subrubros", fmt_int(df_all["subrubro"].nunique()))
-c4.metric("Empresas", fmt_int(df_all["empresa"].nunique()))
+    vendedor = None if vendedor_sel == "(Todos)" else vendedor_sel
+    source, scope, base_scope = {"files": sorted(hashes)}, {"vendedor": vendedor_sel}, {"vendedor": "(Todos)"}
+    month_fps = None
 
-st.divider()
+    def load_df():
+        return df_all
 
 
 # -----------------------------
-# Construir modelo
+# Co-ocurrencia en el tiempo
 # -----------------------------
-with st.spinner("Armando modelo…"):
-    df, agg_cs, pivot, co, freq, X_bin, norms, clients, subrubros = build_model(df_all)
-
+# (se aplica sobre las partes por mes del modelo ya armado: cambiarla no reconstruye nada)
+with st.sidebar:
+    st.divider()
+    st.header("Co-ocurrencia en el tiempo")
+    time_mode = st.radio("Meses que cuentan", ["Todos por igual", "Últimos N meses", "Decaimiento"], index=0)
+    tiempo = {}
+    if time_mode == "Últimos N meses":
+        tiempo["ventana"] = int(st.number_input("Meses", min_value=1, max_value=120, value=12, step=1))
+    elif time_mode == "Decaimiento":
+        tiempo["vida_media"] = float(
+            st.number_input(
+                "Vida media (meses)",
+                min_value=0.5,
+                max_value=120.0,
+                value=6.0,
+                step=0.5,
+                help="Una compra de hace N meses pesa la mitad que una del último mes.",
+            )
+        )
+        st.caption(
+            "Con decaimiento cada canasta es un cliente en un mes (pesado por antigüedad): la co-ocurrencia "
+            "cuenta clientes-mes, no clientes. Con todos los meses o los últimos N, cuenta clientes."
+        )
+    # qué cuenta "co" (canastas.model.weighted_model): clientes, o clientes-mes con decaimiento
+    assoc_labels = ASSOC_LABELS
+    if "vida_media" in tiempo:
+        assoc_labels = {**ASSOC_LABELS, "co": "Co-ocurrencia (clientes-mes pesados)"}
 
 # -----------------------------
-# Catálogo de clientes unificados (para buscador)
+# Asociación entre subrubros
 # -----------------------------
-def build_customer_catalog(df: pd.DataFrame) -> pd.DataFrame:
-    # Para cada cliente_key armamos un resumen:
-    # - CUIT
-    # - razones sociales (pueden ser diferentes)
-    # - IDs por empresa
-    base = df.groupby("cliente_key", as_index=False).agg(
-        cuit=("cuit", lambda s: next((x for x in s.astype(str).tolist() if x.strip() != ""), "")),
-        empresas=("empresa", lambda s: sorted(list(set([x for x in s.astype(str).tolist() if x])))),
-        razones=("cliente", lambda s: sorted(list(set([x for x in s.astype(str).tolist() if x.strip() != ""])))),
-        ids=("cliente_id", lambda s: sorted(list(set([x for x in s.astype(str).tolist() if x.strip() != ""])))),
+# (se deriva de la co-ocurrencia del modelo ya armado: canastas.model.association_model)
+with st.sidebar:
+    st.divider()
+    st.header("Asociación entre subrubros")
+    asociacion = st.selectbox(
+        "Rankear subrubros por",
+        ASSOC_METRICS,
+        format_func=assoc_labels.get,
+        help="Co-ocurrencia favorece a los subrubros más vendidos; lift, Jaccard, probabilidad condicional "
+        "y PMI la corrigen por lo que vende cada subrubro.",
+    )
+    top_k = int(
+        st.number_input(
+            "Guardar solo los K más asociados por subrubro (0 = todos)",
+            min_value=0,
+            max_value=500,
+            value=0,
+            step=10,
+        )
     )
+    asoc = {} if asociacion == "co" and not top_k else {"asociacion": asociacion, "top_k": top_k or None}
 
-    # IDs por empresa (si querés verlo explícito)
-    # armamos string “CROMOSOL:123 | BBA:987”
-    pairs = (
-        df[["cliente_key", "empresa", "cliente_id"]]
-        .drop_duplicates()
-        .assign(cliente_id=lambda x: x["cliente_id"].astype(str).str.strip())
+
+# -----------------------------
+# Construir modelo
+# -----------------------------
+# Modelo global: del registro del proceso (de disco o construido si la huella cambió). En
+# modo base el alcance no incluye la huella: con datos nuevos se ve el modelo anterior
+# mientras se arma el actualizado; con archivos subidos cada juego de archivos es otro alcance.
+registry = model_registry()
+registry_scope = model_key({"backend": backend_name} if from_db else source, **base_scope)
+build = partial(
+    load_or_build_model,
+    model_key(source, **base_scope),
+    load_df,
+    month_fps=month_fps,
+    scope=registry_scope if from_db else None,
+)
+with st.spinner("Armando modelo…"):
+    served = registry.get(registry_scope, source, build)
+    stale = served.source != source
+    source = served.source  # las claves de abajo son las del modelo que se muestra
+    slice_key = model_key(source, **scope)
+    weighted_key = model_key(source, **scope, **tiempo)
+    key = model_key(source, **scope, **tiempo, **asoc)
+
+    model = served.model
+    if model is not None and vendedor is not None:
+        model = get_model_slice(slice_key, model, vendedor)
+    if model is not None and tiempo:
+        model = get_weighted_model(weighted_key, model, **tiempo)
+    if model is not None and asoc:
+        model = get_association_model(key, model, **asoc)
+
+if stale and registry.building(registry_scope):
+    st.info(
+        f"Hay datos nuevos en la base: se está armando el modelo actualizado en segundo plano. "
+        f"Mientras tanto se muestra la versión anterior (v{served.version})."
     )
-    pairs = pairs[pairs["cliente_id"].ne("")].copy()
-    by_key = pairs.groupby("cliente_key").apply(
-        lambda g: " | ".join([f"{r['empresa']}:{r['cliente_id']}" for _, r in g.iterrows()])
+elif stale:
+    # el hilo ya terminó: o el modelo nuevo quedó listo entre el get y acá, o falló
+    failed = registry.errors.get(registry_scope)
+    if failed is None:
+        st.rerun()
+    st.warning(
+        f"Hay datos nuevos en la base pero no se pudo armar el modelo actualizado ({failed[1]}). "
+        f"Se muestra la versión anterior (v{served.version}); se vuelve a intentar pasados "
+        f"{REGISTRY_RETRY_SECONDS:.0f} s."
     )
-    base["ids_por_empresa"] = base["cliente_key"].map(by_key).fillna("")
 
-    def label(r):
-        cuit = r["cuit"] if r["cuit"] else "SIN_CUIT"
-        name = r["razones"][0] if r["razones"] else "(sin nombre)"
-        extra = ""
-        if r["ids_por_empresa"]:
-            extra = f" | {r['ids_por_empresa']}"
-        # si hay más de 1 razón, lo indicamos
-        if len(r["razones"]) > 1:
-            extra += f" | +{len(r['razones'])-1} razones"
-        return f"{name} | CUIT {cuit}{extra}"
+if model is None:
+    st.warning("No hay ventas para ese filtro.")
+    st.stop()
+
+agg_cs, co, freq, clients, subrubros = model.agg_cs, model.co, model.freq, model.clients, model.subrubros
+cube, cube_offsets, catalog, kpis = model.cube, model.cube_offsets, model.catalog, model.kpis
 
-    base["label"] = base.apply(label, axis=1)
-    return base
+if from_db and not any(filters.values()) and not tiempo and not asoc:
+    materialize_in_background(key, model, filters)
 
 
-catalog = build_customer_catalog(df)
+# -----------------------------
+# KPIs + Info unificación
+# -----------------------------
+# “Clientes” = cliente_key unificado
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Filas", fmt_int(kpis["filas"]))
+c2.metric("Clientes unificados", fmt_int(kpis["clientes"]))
+c3.metric("Subrubros", fmt_int(kpis["subrubros"]))
+c4.metric("Empresas", fmt_int(kpis["empresas"]))
+
+st.divider()
 
 
 # -----------------------------
@@ -586,23 +438,24 @@ tab_cliente, tab_subrubro = st.tabs(["🔎 Por cliente (1+2+4)", "🧭 Por subru
 with tab_cliente:
     st.subheader("Buscar cliente (unificado por CUIT)")
     q = st.text_input("Buscar por Razón Social / ID / CUIT", value="", placeholder="Ej: fridman, 167, 202111...")
-    q_norm = q.strip().lower()
-
-    if q_norm:
-        mask = catalog["label"].str.lower().str.contains(re.escape(q_norm), na=False)
-        options = catalog.loc[mask, "label"].tolist()
-        if not options:
-            st.warning("No encontré clientes con ese texto. Probá otra parte del nombre, un ID, o el CUIT.")
-            st.stop()
-    else:
-        options = catalog["label"].tolist()
+
+    search_index = get_search_index(slice_key, catalog)
+    with span("buscar", consulta=q) as s:
+        rows, n_hits = search(search_index, q, limit=SEARCH_LIMIT)
+        s["filas"] = n_hits
+    if q.strip() and not n_hits:
+        st.warning("No encontré clientes con ese texto. Probá otra parte del nombre, un ID, o el CUIT.")
+        st.stop()
+    options = catalog["label"].to_numpy()[rows].tolist()
+    if n_hits > len(options):
+        st.caption(f"Mostrando {fmt_int(len(options))} de {fmt_int(n_hits)} clientes. Escribí más para afinar.")
 
     selected_label = st.selectbox("Seleccioná un cliente", options=options, index=0 if options else None)
     if not selected_label:
         st.stop()
 
-    selected_key = catalog.loc[catalog["label"] == selected_label, "cliente_key"].iloc[0]
-    selected_row = catalog[catalog["cliente_key"] == selected_key].iloc[0]
+    selected_row = catalog.iloc[search_index.row_by_label[selected_label]]
+    selected_key = selected_row["cliente_key"]
 
     # Mostrar info unificada
     with st.expander("📌 Cliente unificado detectado (detalle)", expanded=True):
@@ -622,7 +475,7 @@ with tab_cliente:
         st.markdown("### 📦 Subrubros que compra (unificado)")
         sub = (
             agg_cs[agg_cs["cliente_key"] == selected_key]
-            .groupby("subrubro", as_index=False)
+            .groupby("subrubro", as_index=False, observed=True)
             .agg(
                 pedidos=("cant_pedidos", "sum"),
                 unidades=("unidades", "sum"),
@@ -644,31 +497,34 @@ with tab_cliente:
         neighbors_n = st.slider("Clientes similares a mirar", 10, 200, 50, 10)
         exclude_bought = st.checkbox("Excluir productos que ya compra", value=True)
 
-        rec = recommend_for_client(selected_key, pivot, co, freq, topk=top_subrubros)
+        # precalculado (tabla rec_*) si los parámetros entran en lo materializado; si no, en vivo
+        recs = client_recommendations(
+            model,
+            selected_key,
+            topk=top_subrubros,
+            topn=top_products,
+            neighbors_n=neighbors_n,
+            exclude_bought=exclude_bought,
+            materialized=db_read_recommendations(key, selected_key) if from_db else None,
+        )
+        rec = recs.subrubros
+        if recs.precalculadas:
+            st.caption("⚡ Recomendaciones precalculadas")
         rec_show = rec.copy()
-        rec_show["score_cooc"] = rec_show["score_cooc"].fillna(0).astype(int)
-        rec_show["freq_global"] = rec_show["freq_global"].fillna(0).astype(int)
+        rec_show["score_cooc"] = as_counts(rec_show["score_cooc"].fillna(0))
+        rec_show["freq_global"] = as_counts(rec_show["freq_global"].fillna(0))
         st.dataframe(rec_show.rename(columns={"score_cooc": "score_similitud"}), use_container_width=True, height=260)
 
         st.markdown("### 🧠 Plan de acción (clientes similares)")
-        for _, row in rec.head(top_subrubros).iterrows():
+        # (en vivo, el primer recs.products rankea todos los subrubros recomendados en una sola
+        # pasada con los vecinos ya buscados; los demás expanders lo leen de ahí)
+        for i, row in rec.head(top_subrubros).iterrows():
             sr = row["subrubro"]
-            score = int(row["score_cooc"]) if pd.notna(row["score_cooc"]) else 0
+            score = rec_show.at[i, "score_cooc"]  # como en la tabla: con decaimiento quedan decimales
 
             with st.expander(f"📌 {sr} — score {score}", expanded=False):
-                g = top_products_similar_clients(
-                    df=df,
-                    selected_cliente_key=selected_key,
-                    subrubro=sr,
-                    rank_metric=rank_metric,
-                    topn=top_products,
-                    pivot=pivot,
-                    X_bin=X_bin,
-                    norms=norms,
-                    clients=clients,
-                    neighbors_n=neighbors_n,
-                    exclude_already_bought=exclude_bought,
-                )
+                with span("ranking_productos", subrubro=sr, precalculadas=recs.precalculadas):
+                    g = recs.products(sr, rank_metric)
 
                 if g.empty:
                     st.info("Sin datos suficientes para armar ranking por clientes similares.")
@@ -693,33 +549,21 @@ with tab_cliente:
 # -----------------------------
 with tab_subrubro:
     st.subheader("Análisis por subrubro")
-    subrubro_sel = st.selectbox("Elegí un subrubro", options=sorted(df["subrubro"].unique().tolist()))
+    subrubro_sel = st.selectbox("Elegí un subrubro", options=subrubros.tolist())
     topk_sr = st.slider("Top sugerencias", 3, 30, 10, 1)
 
     # co-ocurrencia por subrubro
-    if subrubro_sel not in co.index:
+    if key_index(subrubros, subrubro_sel) < 0:
         st.warning("No pude encontrar ese subrubro en la matriz.")
         st.stop()
 
-    scores = co.loc[subrubro_sel].drop(index=subrubro_sel).sort_values(ascending=False).head(topk_sr)
-    rec_sr = pd.DataFrame(
-        {
-            "subrubro": scores.index,
-            "score_similitud": scores.values.astype(int),
-            "freq_global": freq.reindex(scores.index).fillna(0).astype(int).values,
-        }
-    )
+    rec_sr = related_subrubros(subrubro_sel, co, freq, subrubros, topk=topk_sr)
     st.markdown("### 🔗 Subrubros que suelen comprarse junto con este")
+    st.caption(f"score_similitud: {assoc_labels[asociacion]}" + (f" (top {top_k} por subrubro)" if top_k else ""))
     st.dataframe(rec_sr, use_container_width=True, height=320)
 
     st.markdown("### 👥 Clientes unificados con mayor compra (por importe)")
-    top_clients = (
-        df[df["subrubro"] == subrubro_sel]
-        .groupby("cliente_key", as_index=False)
-        .agg(importe=("importe", "sum"), unidades=("unidades", "sum"), pedidos=("cant_pedidos", "sum"))
-        .sort_values("importe", ascending=False)
-        .head(25)
-    )
+    top_clients = top_clients_for_subrubro(subrubro_sel, cube, cube_offsets, clients, subrubros, topn=25)
     top_clients = top_clients.merge(catalog[["cliente_key", "label"]], on="cliente_key", how="left")
     showc = top_clients.copy()
     showc["importe"] = showc["importe"].map(fmt_money)
@@ -727,3 +571,23 @@ with tab_subrubro:
     showc["pedidos"] = showc["pedidos"].round(0).astype(int)
     showc = showc.rename(columns={"label": "cliente_unificado"})
     st.dataframe(showc[["cliente_unificado", "importe", "unidades", "pedidos"]], use_container_width=True, height=360)
+
+
+# -----------------------------
+# Diagnóstico (tiempos por etapa)
+# -----------------------------
+# (solo lo que corrió en este rerun: lo que vino de cache_resource no aparece)
+with st.sidebar:
+    st.divider()
+    if st.checkbox("🔧 Tiempos por etapa", value=False):
+        st.caption(
+            f"Rerun: {time.perf_counter() - run_t0:.2f} s · pico de memoria del proceso: {peak_rss_mb():,.0f} MB"
+        )
+        if spans:
+            st.dataframe(summarize(spans), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Todo salió de cache: no corrió ninguna etapa pesada.")
+    prof_path = dump_profile(profiler, PROFILE_DIR)
+    st.session_state.pop("profiler", None)
+    if prof_path:
+        st.caption(f"Perfil: {prof_path}")
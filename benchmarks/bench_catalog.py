@@ -0,0 +1,101 @@
+# benchmarks/bench_catalog.py — build_customer_catalog vectorizado vs. versión anterior
+#
+# Uso: python benchmarks/bench_catalog.py [--clientes 100000] [--filas 1000000]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from canastas.catalog import build_customer_catalog  # noqa: E402
+
+
+def build_customer_catalog_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    # versión anterior (lambdas por grupo + iterrows + apply por fila), solo para comparar
+    base = df.groupby("cliente_key", as_index=False, observed=True).agg(
+        cuit=("cuit", lambda s: next((x for x in s.astype(str).tolist() if x.strip() != ""), "")),
+        empresas=("empresa", lambda s: sorted(list(set([x for x in s.astype(str).tolist() if x])))),
+        razones=("cliente", lambda s: sorted(list(set([x for x in s.astype(str).tolist() if x.strip() != ""])))),
+        ids=("cliente_id", lambda s: sorted(list(set([x for x in s.astype(str).tolist() if x.strip() != ""])))),
+    )
+    pairs = (
+        df[["cliente_key", "empresa", "cliente_id"]]
+        .drop_duplicates()
+        .assign(cliente_id=lambda x: x["cliente_id"].astype(str).str.strip())
+    )
+    pairs = pairs[pairs["cliente_id"].ne("")].copy()
+    by_key = pairs.groupby("cliente_key", observed=True).apply(
+        lambda g: " | ".join([f"{r['empresa']}:{r['cliente_id']}" for _, r in g.iterrows()])
+    )
+    base["ids_por_empresa"] = base["cliente_key"].astype(object).map(by_key).fillna("")
+
+    def label(r):
+        cuit = r["cuit"] if r["cuit"] else "SIN_CUIT"
+        name = r["razones"][0] if r["razones"] else "(sin nombre)"
+        extra = ""
+        if r["ids_por_empresa"]:
+            extra = f" | {r['ids_por_empresa']}"
+        if len(r["razones"]) > 1:
+            extra += f" | +{len(r['razones'])-1} razones"
+        return f"{name} | CUIT {cuit}{extra}"
+
+    base["label"] = base.apply(label, axis=1)
+    return base
+
+
+def synthetic_sales(n_clientes: int, n_filas: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    cli = rng.integers(0, n_clientes, n_filas)
+    empresa = np.where(rng.random(n_filas) < 0.6, "CROMOSOL", "BBA")
+    cuit = (20_000_000_000 + cli).astype(str).astype(object)
+    cuit[cli % 10 == 0] = ""
+    razon = np.char.add("Cliente ", cli.astype(str)).astype(object)
+    razon[rng.random(n_filas) < 0.05] += " SA"  # misma empresa con otra razón social
+    razon[rng.random(n_filas) < 0.02] = ""
+    return pd.DataFrame(
+        {
+            "cliente_key": np.where(cuit == "", np.char.add("NO_CUIT::cliente ", cli.astype(str)), cuit),
+            "cuit": cuit,
+            "cliente": razon,
+            "cliente_id": np.char.add(np.where(empresa == "BBA", "B", "C"), (cli % 50_000).astype(str)),
+            "empresa": empresa,
+        }
+    )
+
+
+def _time(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clientes", type=int, default=100_000)
+    ap.add_argument("--filas", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--sin-legacy", action="store_true", help="no correr la versión anterior (lenta)")
+    args = ap.parse_args()
+
+    df = synthetic_sales(args.clientes, args.filas)
+    print(f"filas={len(df):,} clientes={df['cliente_key'].nunique():,}")
+
+    t_new, out_new = _time(build_customer_catalog, df, args.repeat)
+    print(f"vectorizado: {t_new:8.2f} s")
+
+    if not args.sin_legacy:
+        t_old, out_old = _time(build_customer_catalog_legacy, df, 1)
+        same = out_old["label"].tolist() == out_new["label"].tolist()
+        print(f"anterior:    {t_old:8.2f} s  (x{t_old / t_new:.1f}, labels idénticos: {same})")
+
+
+if __name__ == "__main__":
+    main()
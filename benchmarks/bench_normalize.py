@@ -0,0 +1,151 @@
+# benchmarks/bench_normalize.py — standardize_one sobre valores únicos vs. versión anterior
+#
+# Uso: python benchmarks/bench_normalize.py [--filas 5000000] [--clientes 50000]
+#
+# Genera dos exports sintéticos "como vienen del ERP" (ya con columnas normalizadas):
+# Cromosol con decimales con coma y miles con punto, BBA con decimales con punto.
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from canastas.normalize import REQUIRED, pick_col, standardize_one  # noqa: E402
+
+
+def _to_number_legacy(series: pd.Series) -> pd.Series:
+    s = series.astype(str).str.strip()
+    s = s.str.replace("\u00a0", "", regex=False).str.replace(" ", "", regex=False)
+    mask_comma = s.str.contains(",", regex=False)
+    s.loc[mask_comma] = s.loc[mask_comma].str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    s.loc[~mask_comma] = s.loc[~mask_comma].str.replace(",", "", regex=False)
+    s = s.str.replace(r"[^\d\.\-]", "", regex=True)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _clean_cuit_legacy(x) -> str:
+    return re.sub(r"\D", "", str(x or "").strip())
+
+
+def standardize_one_legacy(df: pd.DataFrame, empresa: str) -> pd.DataFrame:
+    # versión anterior (una pasada .str por columna sobre todas las filas), solo para comparar
+    df = df.copy()
+    cols = set(df.columns)
+    mapping = {}
+    for std_name, candidates in REQUIRED.items():
+        col = pick_col(cols, candidates)
+        if col:
+            mapping[std_name] = col
+    df = df.rename(columns={v: k for k, v in mapping.items()})
+    if "cliente" not in df.columns and "cliente_id" in df.columns:
+        df["cliente"] = df["cliente_id"].astype(str)
+    for c in ("cliente_id", "cuit", "vendedor"):
+        if c not in df.columns:
+            df[c] = ""
+    df["empresa"] = empresa
+    for c in ("cliente", "cliente_id", "vendedor", "subrubro", "articulo_codigo", "articulo_descripcion"):
+        df[c] = df[c].astype(str).str.strip()
+    df["cuit"] = df["cuit"].map(_clean_cuit_legacy)
+    df["importe"] = _to_number_legacy(df.get("importe", pd.Series([0] * len(df)))).fillna(0.0)
+    df["unidades"] = _to_number_legacy(df.get("unidades", pd.Series([0] * len(df)))).fillna(0.0)
+    if "cant_pedidos" in df.columns:
+        df["cant_pedidos"] = _to_number_legacy(df["cant_pedidos"]).fillna(0.0)
+        df.loc[df["cant_pedidos"] <= 0, "cant_pedidos"] = 1.0
+    else:
+        df["cant_pedidos"] = 1.0
+    if "anio_mes" in df.columns:
+        df["anio_mes"] = df["anio_mes"].astype(str).str.strip()
+    else:
+        df["anio_mes"] = ""
+    df = df[
+        df["cliente"].ne("")
+        & df["subrubro"].ne("")
+        & df["articulo_codigo"].ne("")
+        & df["articulo_descripcion"].ne("")
+    ].copy()
+    df["cliente_key"] = df["cuit"]
+    df.loc[df["cliente_key"].eq("") | df["cliente_key"].isna(), "cliente_key"] = (
+        df["cliente"].str.lower().str.replace(r"\s+", " ", regex=True).str.strip().map(lambda x: f"NO_CUIT::{x}")
+    )
+    return df
+
+
+def _pool(prefix: str, n: int) -> np.ndarray:
+    return np.char.add(prefix, np.arange(n).astype(str)).astype(object)
+
+
+def synthetic_export(empresa: str, n_filas: int, n_clientes: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    cli = rng.integers(0, n_clientes, n_filas)
+    art = rng.integers(0, 20_000, n_filas)
+
+    cuits = (20_000_000_000 + np.arange(n_clientes)).astype(str).astype(object)
+    cuits = np.array([f"{c[:2]}-{c[2:10]}-{c[10:]}" for c in cuits], dtype=object)  # con guiones, como en el ERP
+    cuits[::10] = ""
+    razones = np.char.add(" Cliente ", np.arange(n_clientes).astype(str)).astype(object)
+
+    cents = rng.integers(100, 50_000_000, 200_000)
+    if empresa == "CROMOSOL":
+        precios = np.array([f"{c / 100:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for c in cents])
+        precios = precios.astype(object)
+        cols = {"razon_social": "r", "cuit": "c", "articulo_sub_rubro": "s", "articulo_codigo": "a",
+                "articulo_descripcion": "d", "importe": "i", "cantidad": "u", "cant_pedidos": "p",
+                "anio_mes": "m", "vendedor": "v"}
+    else:
+        precios = np.array([f"{c / 100:.2f}" for c in cents], dtype=object)
+        cols = {"razonsocial": "r", "cuit_cliente": "c", "subrubro": "s", "codigo_articulo": "a",
+                "descripcion": "d", "importe_neto": "i", "unidades": "u", "pedidos": "p",
+                "periodo": "m", "cod_vendedor": "v"}
+
+    data = {
+        "r": razones[cli],
+        "c": cuits[cli],
+        "s": _pool("SR ", 400)[art % 400],
+        "a": _pool("A", 20_000)[art],
+        "d": _pool("Articulo descripcion ", 20_000)[art],
+        "i": precios[rng.integers(0, len(precios), n_filas)],
+        "u": rng.integers(1, 200, n_filas).astype(str).astype(object),
+        "p": rng.integers(0, 5, n_filas).astype(str).astype(object),
+        "m": _pool("2024-", 12)[rng.integers(0, 12, n_filas)],
+        "v": _pool("V", 40)[cli % 40],
+    }
+    return pd.DataFrame({name: data[k] for name, k in cols.items()})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--filas", type=int, default=5_000_000, help="filas por archivo")
+    ap.add_argument("--clientes", type=int, default=50_000)
+    ap.add_argument("--sin-legacy", action="store_true", help="no correr la versión anterior (lenta)")
+    args = ap.parse_args()
+
+    for empresa in ("CROMOSOL", "BBA"):
+        df = synthetic_export(empresa, args.filas, args.clientes, seed=len(empresa))
+        print(f"{empresa}: filas={len(df):,}")
+
+        t0 = time.perf_counter()
+        out_new = standardize_one(df, empresa)
+        t_new = time.perf_counter() - t0
+        print(f"  valores únicos: {t_new:8.2f} s")
+
+        if not args.sin_legacy:
+            t0 = time.perf_counter()
+            out_old = standardize_one_legacy(df, empresa)
+            t_old = time.perf_counter() - t0
+            cols = list(out_old.columns)
+            try:
+                pd.testing.assert_frame_equal(out_new[cols], out_old, check_dtype=False)
+                same = True
+            except AssertionError:
+                same = False
+            print(f"  anterior:       {t_old:8.2f} s  (x{t_old / t_new:.1f}, resultado idéntico: {same})")
+
+
+if __name__ == "__main__":
+    main()
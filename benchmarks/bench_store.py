@@ -0,0 +1,109 @@
+# benchmarks/bench_store.py — Base de ventas: SQLite vs. Parquet particionado (carga y lectura)
+#
+# Uso: python benchmarks/bench_store.py [--escala chica|mediana|grande] [--repeat 3]
+#
+# Con los mismos datos sintéticos (synthetic.py) se carga cada base desde cero y se mide la
+# lectura como la hace la app: todo, solo las columnas del modelo (proyección), un rango de
+# meses (en Parquet descarta particiones enteras) y un vendedor. Se verifica que las dos
+# bases devuelvan las mismas filas y se informa el tamaño en disco.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import SCALES, synthetic_exports  # noqa: E402
+
+from canastas import parquet_store, store  # noqa: E402
+from canastas.normalize import standardize_one  # noqa: E402
+
+INGEST_CHUNK = 500_000
+MODEL_COLS = ["cliente_key", "subrubro", "vendedor", "anio_mes", "cant_pedidos"]
+
+
+def _time(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _disk_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2**20
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(path) for f in fs) / 2**20
+
+
+def _same(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    def norm(df):
+        df = df.astype({c: str for c in df.columns if c not in store.MEASURES})
+        return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+    return norm(a).equals(norm(b))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Carga y lectura de ventas: SQLite vs. Parquet.")
+    ap.add_argument("--escala", choices=sorted(SCALES), default="chica")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"escala={args.escala} {SCALES[args.escala]}")
+    exports = synthetic_exports(**SCALES[args.escala], seed=args.seed)
+    std = {e: standardize_one(d, empresa=e)[store.VENTAS_COLS] for e, d in exports.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store.DB_PATH = os.path.join(tmp, "bench.sqlite")
+        parquet_store.PARQUET_PATH = os.path.join(tmp, "bench_parquet")
+        backends = {
+            "sqlite": (store.SQLITE, store.DB_PATH),
+            "parquet": (parquet_store.PARQUET, parquet_store.PARQUET_PATH),
+        }
+
+        results = {}
+        for name, (be, path) in backends.items():
+            t0 = time.perf_counter()
+            rows = 0
+            for e, d in std.items():
+                chunks = (d.iloc[i : i + INGEST_CHUNK] for i in range(0, len(d), INGEST_CHUNK))
+                rows += be.ingest_chunks(chunks, f"{e}.csv", f"{args.escala}-{args.seed}-{e}")
+            results[name] = {"cargar": time.perf_counter() - t0, "filas": rows, "disco_mb": _disk_mb(path)}
+
+        vendedores, empresas, periodos = store.db_filter_options()
+        last3 = {"period_from": periodos[-3]}
+        queries = {
+            "leer_todo": {},
+            "columnas_modelo": {"columns": MODEL_COLS},
+            "ultimos_3_meses": last3,
+            "un_vendedor": {"vendedor": vendedores[0]},
+            "una_empresa_3_meses": {"empresas": [empresas[0]], **last3},
+        }
+        frames = {}
+        for name, (be, _) in backends.items():
+            for q, kw in queries.items():
+                t, frames[name, q] = _time(lambda: be.load_df(**kw), args.repeat)
+                results[name][q] = t
+            results[name]["huellas_mes"] = _time(lambda: be.month_fingerprints(), args.repeat)[0]
+
+        print(f"\n  {'':<22} {'sqlite':>10} {'parquet':>10} {'x':>7}")
+        for k in ["cargar", *queries, "huellas_mes"]:
+            a, b = results["sqlite"][k], results["parquet"][k]
+            print(f"  {k:<22} {a:9.3f}s {b:9.3f}s {a / max(b, 1e-9):6.1f}x")
+        print(f"  {'disco (MB)':<22} {results['sqlite']['disco_mb']:10.1f} {results['parquet']['disco_mb']:10.1f}")
+        for q in queries:
+            n = len(frames["sqlite", q])
+            ok = _same(frames["sqlite", q], frames["parquet", q])
+            print(f"  {q:<22} {n:>10,} filas {'iguales' if ok else 'DISTINTAS'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/load_api.py — Prueba de carga de canastas.api: latencia p50 / p99 con pedidos concurrentes
+#
+# Uso:
+#   python benchmarks/load_api.py --url http://127.0.0.1:8000 [--concurrencia 32] [--pedidos 5000]
+#   python benchmarks/load_api.py --db data_cache.sqlite        # levanta la API en este proceso
+#
+# Los clientes se eligen con popularidad Zipf (unos pocos clientes concentran las consultas,
+# como en el CRM), así se ve el efecto del cache de respuestas; con --sin-repetir cada
+# pedido es un cliente distinto (todo miss). Se informa p50 / p90 / p99, pedidos por
+# segundo y la proporción de hits del cache (header x-cache).
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _get(url: str):
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=120) as r:
+            r.read()
+            status, cache = r.status, r.headers.get("x-cache")
+    except urllib.error.HTTPError as e:
+        status, cache = e.code, None
+    return time.perf_counter() - t0, status, cache
+
+
+def _serve(db: str, port: int):
+    import uvicorn
+
+    from canastas import api, store
+
+    store.DB_PATH = db
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="API ya levantada; si no, se levanta una con --db")
+    ap.add_argument("--db", default="data_cache.sqlite")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--endpoint", choices=["subrubros", "recomendaciones"], default="recomendaciones")
+    ap.add_argument("--concurrencia", type=int, default=32)
+    ap.add_argument("--pedidos", type=int, default=2000)
+    ap.add_argument("--clientes", type=int, default=2000, help="clientes distintos a consultar")
+    ap.add_argument("--sin-repetir", action="store_true", help="cada pedido a un cliente distinto")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    base = args.url or _serve(args.db, args.port)
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(f"{base}/health", timeout=600) as r:  # primera carga del modelo
+        print("health:", json.loads(r.read()), f"({time.perf_counter() - t0:.1f} s)")
+    with urllib.request.urlopen(f"{base}/clientes?limit={args.clientes}") as r:
+        keys = json.loads(r.read())["clientes"]
+    if not keys:
+        print("La API no tiene clientes.")
+        return
+
+    rng = np.random.default_rng(args.seed)
+    if args.sin_repetir:
+        picks = rng.permutation(len(keys))[: args.pedidos]
+    else:
+        p = 1.0 / np.arange(1, len(keys) + 1)
+        picks = rng.permutation(len(keys))[np.searchsorted(np.cumsum(p), rng.random(args.pedidos) * p.sum())]
+    urls = [
+        f"{base}/clientes/{urllib.parse.quote(keys[i], safe='')}/{args.endpoint}?topk=10&topn=10&vecinos=50"
+        for i in picks
+    ]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        results = list(pool.map(_get, urls))
+    wall = time.perf_counter() - t0
+
+    lat = np.array([r[0] for r in results]) * 1000
+    errors = sum(r[1] != 200 for r in results)
+    hits = sum(r[2] == "hit" for r in results)
+    print(
+        f"{len(urls):,} pedidos, concurrencia {args.concurrencia}, {args.endpoint}: "
+        f"{len(urls) / wall:,.0f} pedidos/s, errores {errors}, hits de cache {hits / len(urls):.0%}"
+    )
+    print(
+        f"latencia ms  p50 {np.percentile(lat, 50):7.1f}  p90 {np.percentile(lat, 90):7.1f}  "
+        f"p99 {np.percentile(lat, 99):7.1f}  máx {lat.max():7.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/suite.py — Suite de tiempos de punta a punta con datos sintéticos y línea base
+#
+# Uso:
+#   python benchmarks/suite.py [--escala chica|mediana|grande] [--repeat 3]
+#   python benchmarks/suite.py --escala mediana --guardar     # actualiza la línea base
+#
+# Cada paso (normalizar, cargar en SQLite, leer, armar modelo, catálogo, buscador,
+# recomendaciones, ranking de productos, plan de acción de un cliente, cortes por vendedor,
+# decaimiento) se mide con el mejor de --repeat corridas sobre los mismos datos
+# (synthetic.py, semilla fija). El resultado se compara contra
+# benchmarks/baselines/<escala>.json: un paso más lento que la línea base por encima de
+# --tolerancia se marca y el script sale con código 1.
+# Las líneas base son de una máquina puntual: comparar siempre en la misma máquina.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import SCALES, synthetic_exports  # noqa: E402
+
+from canastas import store  # noqa: E402
+from canastas.catalog import build_customer_catalog  # noqa: E402
+from canastas.model import (  # noqa: E402
+    association_matrices,
+    basket_count,
+    build_model,
+    freq_order,
+    model_slice,
+    recommend_batch,
+    recommend_for_client,
+    top_products_similar_clients,
+    weighted_model,
+)
+from canastas.normalize import standardize_one  # noqa: E402
+from canastas.recommend import client_recommendations  # noqa: E402
+from canastas.search import build_search_index, search  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+SAMPLE_CLIENTS = 200  # clientes para medir las consultas de a uno (como la app)
+INGEST_CHUNK = 500_000
+
+
+def _time(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def run(escala: str, repeat: int, seed: int = 0) -> dict:
+    exports = synthetic_exports(**SCALES[escala], seed=seed)
+    results = {}
+
+    def step(name, fn, times=repeat):
+        t, out = _time(fn, times)
+        results[name] = round(t, 4)
+        print(f"  {name:<22} {t:9.3f} s")
+        return out
+
+    std = step("normalizar", lambda: {e: standardize_one(d, empresa=e) for e, d in exports.items()})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store.DB_PATH = os.path.join(tmp, "bench.sqlite")
+
+        def ingest():
+            # base nueva en cada repetición: se mide la carga completa, no el "ya estaba"
+            if os.path.exists(store.DB_PATH):
+                store.db_clear()
+            rows = 0
+            for e, d in std.items():
+                d = d[store.VENTAS_COLS]
+                chunks = (d.iloc[i : i + INGEST_CHUNK] for i in range(0, len(d), INGEST_CHUNK))
+                rows += store.db_ingest_chunks(chunks, f"{e}.csv", f"{escala}-{seed}-{e}")
+            return rows
+
+        step("cargar_sqlite", ingest, times=1)
+        df = step("leer_sqlite", store.db_load_df)
+
+    model = step("armar_modelo", lambda: build_model(df), times=1)
+    catalog = step("catalogo", lambda: build_customer_catalog(df))
+    index = step("buscador", lambda: build_search_index(catalog))
+    step("buscar", lambda: [search(index, q) for q in ("cliente 12", "20-0000", "s.a.", "C15")])
+
+    rng = np.random.default_rng(seed)
+    sample = model.clients[rng.choice(len(model.clients), min(SAMPLE_CLIENTS, len(model.clients)), replace=False)]
+
+    def recommend_each():
+        return [
+            recommend_for_client(k, model.X_bin, model.co, model.freq, model.clients, model.subrubros, topk=10)
+            for k in sample
+        ]
+
+    recs = step("recomendar_cliente", recommend_each)
+
+    def recommend_everyone():
+        by_freq = freq_order(model.freq, model.subrubros)
+        block = 2048
+        return [recommend_batch(model.X_bin[b : b + block], model.co, by_freq, 25) for b in range(0, len(model.clients), block)]
+
+    step("recomendar_todos", recommend_everyone)
+
+    def rank_products():
+        out = []
+        for k, rec in zip(sample, recs):
+            for sr in rec["subrubro"].head(3):
+                out.append(
+                    top_products_similar_clients(
+                        k, sr, "importe", 30, model.cube, model.cli_prod, model.prod_offsets, model.articulos,
+                        model.clients, model.subrubros, model.neigh_idx, model.neigh_sim,
+                    )
+                )
+        return out
+
+    step("ranking_productos", rank_products)
+
+    def action_plan():
+        # pestaña "Por cliente": 10 subrubros recomendados con su ranking (vecinos una vez)
+        out = []
+        for k in sample:
+            recs = client_recommendations(model, k, topk=10, topn=10)
+            out.append([recs.products(sr, "importe") for sr in recs.subrubros["subrubro"]])
+        return out
+
+    step("plan_de_accion", action_plan)
+    step("cortes_vendedor", lambda: [model_slice(model, v) for v in model.vendedores[:5]])
+    step("decaimiento", lambda: weighted_model(model, vida_media=6))
+    step("asociacion", lambda: association_matrices(model.co, basket_count(model), top_k=50))
+
+    return {
+        "escala": escala,
+        "params": SCALES[escala],
+        "seed": seed,
+        "maquina": {
+            "python": platform.python_version(),
+            "sistema": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+        },
+        "fecha": time.strftime("%Y-%m-%d"),
+        "tiempos": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerancia: float) -> bool:
+    ok = True
+    print(f"\n  {'paso':<22} {'base':>9} {'ahora':>9} {'x':>6}")
+    for name, t in current["tiempos"].items():
+        b = baseline["tiempos"].get(name)
+        if b is None:
+            print(f"  {name:<22} {'-':>9} {t:9.3f}")
+            continue
+        ratio = t / max(b, 1e-6)
+        slower = ratio > tolerancia and t - b > 0.05  # pasos de milisegundos tienen mucho ruido
+        ok &= not slower
+        print(f"  {name:<22} {b:9.3f} {t:9.3f} {ratio:6.2f}{'  ⚠ más lento' if slower else ''}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tiempos de la app con datos sintéticos, contra una línea base.")
+    ap.add_argument("--escala", choices=sorted(SCALES), default="chica")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--guardar", action="store_true", help="guardar el resultado como nueva línea base")
+    ap.add_argument("--tolerancia", type=float, default=1.25, help="factor sobre la base que cuenta como regresión")
+    args = ap.parse_args()
+
+    print(f"escala={args.escala} {SCALES[args.escala]}")
+    current = run(args.escala, args.repeat, args.seed)
+
+    path = os.path.join(BASELINE_DIR, f"{args.escala}.json")
+    if args.guardar:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nLínea base guardada en {path}")
+        return
+    if not os.path.exists(path):
+        print(f"\nSin línea base para '{args.escala}' (correr con --guardar).")
+        return
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if not compare(current, baseline, args.tolerancia):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
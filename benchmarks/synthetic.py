@@ -0,0 +1,118 @@
+# benchmarks/synthetic.py — Exports sintéticos Cromosol / BBA con la forma de los datos reales
+#
+# - dos empresas con clientes en común (mismo CUIT, distinto ID y a veces otra razón social)
+# - ~10% de clientes sin CUIT (se unifican por razón social)
+# - subrubros y artículos con popularidad Zipf (pocos subrubros concentran casi todo)
+# - cada cliente tiene un vendedor (y algunas filas las factura otro)
+# - varios meses; Cromosol con "AAAA-MM" y decimales con coma, BBA con "AAAAMM" y punto
+#
+# Con la misma semilla y escala devuelve siempre los mismos datos.
+
+import numpy as np
+import pandas as pd
+
+SCALES = {
+    "chica": dict(filas=50_000, clientes=2_000, subrubros=150, articulos=3_000, vendedores=10, meses=12),
+    "mediana": dict(filas=500_000, clientes=20_000, subrubros=400, articulos=20_000, vendedores=40, meses=24),
+    "grande": dict(filas=5_000_000, clientes=150_000, subrubros=800, articulos=60_000, vendedores=120, meses=36),
+}
+
+COLS = {
+    "CROMOSOL": {
+        "razon_social": "r", "cuit": "c", "cliente_id": "id", "articulo_sub_rubro": "s", "articulo_codigo": "a",
+        "articulo_descripcion": "d", "importe": "i", "cantidad": "u", "cant_pedidos": "p", "anio_mes": "m",
+        "vendedor": "v",
+    },
+    "BBA": {
+        "razonsocial": "r", "cuit_cliente": "c", "codigo_cliente": "id", "subrubro": "s", "codigo_articulo": "a",
+        "descripcion": "d", "importe_neto": "i", "unidades": "u", "pedidos": "p", "periodo": "m",
+        "cod_vendedor": "v",
+    },
+}
+
+
+def _zipf(rng, n: int, size: int, s: float) -> np.ndarray:
+    # Zipf acotado a n valores: P(k) ∝ 1 / (k + 1) ** s, con k en 0..n-1
+    p = np.cumsum(1.0 / np.arange(1, n + 1) ** s)
+    return np.searchsorted(p, rng.random(size) * p[-1]).astype(np.int64)
+
+
+def _pool(prefix: str, n: int) -> np.ndarray:
+    return np.char.add(prefix, np.arange(n).astype(str)).astype(object)
+
+
+def _money(cents: np.ndarray, comma: bool) -> np.ndarray:
+    # pool de importes ya formateados (formatear millones de floats por fila es lento)
+    if comma:
+        txt = [f"{c / 100:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for c in cents]
+        return np.array(txt, dtype=object)
+    return np.array([f"{c / 100:.2f}" for c in cents], dtype=object)
+
+
+def synthetic_exports(
+    filas: int,
+    clientes: int,
+    subrubros: int,
+    articulos: int,
+    vendedores: int,
+    meses: int,
+    seed: int = 0,
+) -> dict:
+    # {empresa: DataFrame crudo "como viene del ERP"}; las filas se reparten 60/40
+    rng = np.random.default_rng(seed)
+
+    # clientes: 50% solo Cromosol, 30% solo BBA, 20% en las dos (mismo CUIT)
+    u = rng.random(clientes)
+    in_empresa = {"CROMOSOL": u < 0.7, "BBA": u >= 0.5}
+    cuits = (20_000_000_000 + rng.permutation(clientes) * 7).astype(str).astype(object)
+    cuits = np.array([f"{c[:2]}-{c[2:10]}-{c[10:]}" for c in cuits], dtype=object)
+    cuits[rng.random(clientes) < 0.1] = ""
+    razones = np.char.add("Cliente ", np.arange(clientes).astype(str)).astype(object)
+    razones_bba = razones.copy()
+    otra = rng.random(clientes) < 0.15
+    razones_bba[otra] = razones_bba[otra] + " S.A."
+    vend_cli = _zipf(rng, vendedores, clientes, 0.8)
+
+    # artículos: cada uno en un subrubro; los subrubros populares tienen más artículos
+    art_sr = np.sort(_zipf(rng, subrubros, articulos, 1.0))
+    sr_names = np.array([f"SUBRUBRO {i:04d}" for i in range(subrubros)], dtype=object)
+    art_codes = np.array([f"A{i:06d}" for i in range(articulos)], dtype=object)
+    art_desc = _pool("Articulo descripcion ", articulos)
+
+    years, months = np.divmod(np.arange(meses) + (2024 * 12 + 12 - meses), 12)
+
+    out = {}
+    for empresa, share in (("CROMOSOL", 0.6), ("BBA", 0.4)):
+        n = int(filas * share)
+        pool = np.flatnonzero(in_empresa[empresa])
+        # ranking de popularidad al azar: el cliente / artículo más comprado no es el primero
+        cli = rng.permutation(pool)[_zipf(rng, len(pool), n, 1.05)]
+        art = rng.permutation(articulos)[_zipf(rng, articulos, n, 1.1)]
+        mes = np.minimum(meses - 1, (meses * rng.random(n) ** 0.7).astype(np.int64))  # más filas en meses recientes
+        vend = np.where(rng.random(n) < 0.05, rng.integers(0, vendedores, n), vend_cli[cli])
+        unidades = rng.integers(1, 60, n)
+        precios = _money(rng.integers(100, 50_000_000, 200_000), comma=empresa == "CROMOSOL")
+        if empresa == "CROMOSOL":
+            periodos = np.array([f"{y}-{m + 1:02d}" for y, m in zip(years, months)], dtype=object)
+            ids = np.char.add("C", np.arange(clientes).astype(str)).astype(object)
+            nombres = razones
+        else:
+            periodos = np.array([f"{y}{m + 1:02d}" for y, m in zip(years, months)], dtype=object)
+            ids = (100_000 + np.arange(clientes)).astype(str).astype(object)
+            nombres = razones_bba
+
+        data = {
+            "r": nombres[cli],
+            "c": cuits[cli],
+            "id": ids[cli],
+            "s": sr_names[art_sr[art]],
+            "a": art_codes[art],
+            "d": art_desc[art],
+            "i": precios[rng.integers(0, len(precios), n)],
+            "u": unidades.astype(str).astype(object),
+            "p": rng.integers(1, 4, n).astype(str).astype(object),
+            "m": periodos[mes],
+            "v": _pool("V", vendedores)[vend],
+        }
+        out[empresa] = pd.DataFrame({name: data[k] for name, k in COLS[empresa].items()})
+    return out
@@ -0,0 +1,45 @@
+# canastas — motor del Detector de Canastas Llenas (sin Streamlit)
+#
+# Módulos: ingest (lectura de exports) -> normalize -> store (SQLite; parquet_store como
+# alternativa) -> model / artifacts (modelo y su cache en disco) -> registry (modelo
+# compartido por el proceso) -> recommend / batch (recomendaciones), más catalog / search
+# para el buscador y timing (tiempo / memoria por etapa). `import canastas` no carga pandas
+# ni scipy: los nombres de abajo importan su módulo recién cuando se usan
+# (canastas.build_model, canastas.materialize, ...).
+
+import importlib
+
+_LAZY = {
+    "file_hash": "canastas.ingest",
+    "iter_table_chunks": "canastas.ingest",
+    "read_file": "canastas.ingest",
+    "read_files": "canastas.ingest",
+    "concat_frames": "canastas.ingest",
+    "standardize_one": "canastas.normalize",
+    "db_ingest_chunks": "canastas.store",
+    "db_load_df": "canastas.store",
+    "db_fingerprint": "canastas.store",
+    "db_read_recommendations": "canastas.store",
+    "Model": "canastas.model",
+    "build_model": "canastas.model",
+    "model_slice": "canastas.model",
+    "weighted_model": "canastas.model",
+    "load_or_build_model": "canastas.artifacts",
+    "model_key": "canastas.artifacts",
+    "client_recommendations": "canastas.recommend",
+    "ModelRegistry": "canastas.registry",
+    "materialize": "canastas.batch",
+    "recommend_all": "canastas.batch",
+    "build_customer_catalog": "canastas.catalog",
+    "build_search_index": "canastas.search",
+}
+
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module 'canastas' has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
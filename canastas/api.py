@@ -0,0 +1,295 @@
+# canastas/api.py — API HTTP de recomendaciones (Starlette) para el CRM
+#
+# Uso:
+#   python -m canastas.api [--db data_cache.sqlite] [--port 8000]
+#   (o: CANASTAS_DB=data_cache.sqlite uvicorn canastas.api:app)
+#
+#   GET /health
+#   GET /clientes?offset=0&limit=100
+#   GET /clientes/{cliente_key}/subrubros?topk=10
+#   GET /clientes/{cliente_key}/productos?subrubro=...&metrica=importe&topn=10&vecinos=50
+#   GET /clientes/{cliente_key}/recomendaciones?topk=10&topn=10&metrica=importe&vecinos=50
+#   (todas aceptan además vendedor=, ventana=, vida_media=, excluir_comprados=,
+#   asociacion=co|lift|jaccard|confianza|pmi, top_k=)
+#
+# El modelo global vive en memoria del proceso (el mismo que arma la app, con la misma
+# clave, así comparten model_cache/ y las tablas rec_*). Cada MODEL_CHECK_SECONDS se mira
+# la huella de la base y, si cambió, el modelo nuevo se arma en segundo plano
+# (canastas.registry) mientras se sigue respondiendo con el anterior. Las respuestas van a un cache
+# LRU con vencimiento (RESPONSE_TTL) cuya clave incluye la clave del modelo: una base
+# nueva nunca sirve respuestas viejas. El cálculo (numpy / SQLite) corre en el pool de
+# hilos para no frenar el event loop.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from functools import partial
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from canastas import store
+from canastas.artifacts import load_or_build_model, model_key
+from canastas.model import ASSOC_METRICS, NEIGHBORS_K, association_model, key_index, model_slice, weighted_model
+from canastas.recommend import client_recommendations
+from canastas.registry import ModelRegistry
+
+MODEL_CHECK_SECONDS = 30.0
+RESPONSE_CACHE = 10_000  # respuestas guardadas
+RESPONSE_TTL = 300.0  # segundos
+SLICE_CACHE = 32  # modelos por vendedor / ventana en memoria
+METRICS = ("importe", "unidades", "pedidos")
+GLOBAL_SCOPE = {"vendedor": None, "empresas": None, "period_from": None, "period_to": None}
+
+
+class LRUCache:
+    # OrderedDict en orden de uso; ttl=None no vence. Solo se usa desde el event loop.
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.data = OrderedDict()
+
+    def get(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires < time.monotonic():
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self.data[key] = (value, expires)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+
+class ModelHolder:
+    # modelo global + cortes (vendedor / ventana) y cache de respuestas del modelo actual
+    def __init__(self):
+        self.model, self.key, self.fingerprint, self.checked = None, None, None, 0.0
+        self.lock = asyncio.Lock()
+        self.registry = ModelRegistry(max_scopes=1)
+        self.scoped = LRUCache(SLICE_CACHE)
+        self.responses = LRUCache(RESPONSE_CACHE, RESPONSE_TTL)
+
+    def _load(self, fingerprint: dict):
+        key = model_key(fingerprint, **GLOBAL_SCOPE)
+        scope = model_key({"backend": store.SQLITE.name}, **GLOBAL_SCOPE)  # el mismo alcance que la app
+        return load_or_build_model(key, store.db_load_df, month_fps=store.db_month_fingerprints, scope=scope)
+
+    async def current(self):
+        if self.model is not None and time.monotonic() - self.checked < MODEL_CHECK_SECONDS:
+            return self.model, self.fingerprint
+        async with self.lock:
+            if self.model is None or time.monotonic() - self.checked >= MODEL_CHECK_SECONDS:
+                fingerprint = await run_in_threadpool(store.db_fingerprint)
+                if fingerprint != self.fingerprint or self.model is None:
+                    # solo espera la primera vez; después devuelve el anterior hasta que el nuevo esté
+                    build = partial(self._load, fingerprint)
+                    served = await run_in_threadpool(self.registry.get, "global", fingerprint, build)
+                    if served.source != self.fingerprint or self.model is None:
+                        self.model, self.fingerprint = served.model, served.source
+                        self.key = model_key(served.source, **GLOBAL_SCOPE)
+                        self.scoped.clear()
+                        self.responses.clear()
+                self.checked = time.monotonic()
+        return self.model, self.fingerprint
+
+    async def scoped_model(self, vendedor: str, tiempo: dict, asoc: dict = None):
+        asoc = asoc or {}
+        model, fingerprint = await self.current()
+        if model is None or (vendedor is None and not tiempo and not asoc):
+            return model, fingerprint
+        cache_key = (self.key, vendedor, tuple(sorted(tiempo.items())), tuple(sorted(asoc.items())))
+        scoped = self.scoped.get(cache_key)
+        if scoped is None:
+
+            def build():
+                m = model_slice(model, vendedor) if vendedor is not None else model
+                m = weighted_model(m, **tiempo) if m is not None and tiempo else m
+                return association_model(m, **asoc) if m is not None and asoc else m
+
+            scoped = await run_in_threadpool(build)
+            self.scoped.put(cache_key, scoped)
+        return scoped, fingerprint
+
+
+holder = ModelHolder()
+
+
+# -----------------------------
+# Parámetros y respuestas
+# -----------------------------
+class BadRequest(Exception):
+    pass
+
+
+def _int(q, name: str, default: int, lo: int, hi: int) -> int:
+    try:
+        v = int(q.get(name, default))
+    except ValueError:
+        raise BadRequest(f"'{name}' tiene que ser un entero")
+    if not lo <= v <= hi:
+        raise BadRequest(f"'{name}' tiene que estar entre {lo} y {hi}")
+    return v
+
+
+def _params(q) -> dict:
+    tiempo = {}
+    if q.get("ventana"):
+        tiempo["ventana"] = _int(q, "ventana", 0, 1, 600)
+    if q.get("vida_media"):
+        try:
+            vida_media = float(q["vida_media"])
+        except ValueError:
+            raise BadRequest("'vida_media' tiene que ser un número")
+        if not math.isfinite(vida_media) or vida_media <= 0:
+            raise BadRequest("'vida_media' tiene que ser un número mayor que 0")
+        tiempo["vida_media"] = vida_media
+    metrica = q.get("metrica", "importe")
+    if metrica not in METRICS:
+        raise BadRequest(f"'metrica' tiene que ser una de {', '.join(METRICS)}")
+    asociacion = q.get("asociacion", "co")
+    if asociacion not in ASSOC_METRICS:
+        raise BadRequest(f"'asociacion' tiene que ser una de {', '.join(ASSOC_METRICS)}")
+    top_k = _int(q, "top_k", 0, 0, 10_000) if q.get("top_k") else None
+    return {
+        "vendedor": q.get("vendedor") or None,
+        "tiempo": tiempo,
+        "asoc": {} if asociacion == "co" and not top_k else {"asociacion": asociacion, "top_k": top_k or None},
+        "topk": _int(q, "topk", 10, 1, 100),
+        "topn": _int(q, "topn", 10, 1, 200),
+        "neighbors_n": _int(q, "vecinos", 50, 1, NEIGHBORS_K),
+        "exclude_bought": q.get("excluir_comprados", "true").lower() not in ("0", "false", "no"),
+        "metrica": metrica,
+        "subrubro": q.get("subrubro"),
+    }
+
+
+def _records(df) -> list:
+    # to_json resuelve NaN -> null y tipos de numpy
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+def _recommendations(model, fingerprint: dict, cliente_key: str, p: dict, what: str):
+    # corre en el pool de hilos: numpy + (si hay) lectura de la corrida materializada
+    if key_index(model.clients, cliente_key) < 0:
+        return None
+    filters = {"vendedor": p["vendedor"], "empresas": None, "period_from": None, "period_to": None}
+    mat = store.db_read_recommendations(model_key(fingerprint, **filters, **p["tiempo"], **p["asoc"]), cliente_key)
+    if mat is not None and what == "productos" and p["subrubro"] not in set(mat[1]["subrubro"].head(p["topk"])):
+        mat = None  # lo materializado solo tiene productos de los subrubros recomendados
+    recs = client_recommendations(
+        model,
+        cliente_key,
+        topk=p["topk"],
+        topn=p["topn"],
+        neighbors_n=p["neighbors_n"],
+        exclude_bought=p["exclude_bought"],
+        materialized=mat,
+    )
+    body = {"cliente_key": cliente_key, "precalculadas": recs.precalculadas}
+    if what == "productos":
+        body["subrubro"] = p["subrubro"]
+        body["productos"] = _records(recs.products(p["subrubro"], p["metrica"]))
+        return body
+    body["subrubros"] = _records(recs.subrubros)
+    if what == "recomendaciones":
+        for item in body["subrubros"]:
+            item["productos"] = _records(recs.products(item["subrubro"], p["metrica"]))
+    return body
+
+
+def _endpoint(what: str):
+    async def handler(request):
+        try:
+            p = _params(request.query_params)
+        except BadRequest as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        if what == "productos" and not p["subrubro"]:
+            return JSONResponse({"error": "falta 'subrubro'"}, status_code=400)
+
+        cliente_key = request.path_params["cliente_key"]
+        model, fingerprint = await holder.scoped_model(p["vendedor"], p["tiempo"], p["asoc"])
+        if model is None:
+            return JSONResponse({"error": "no hay ventas para ese filtro"}, status_code=404)
+
+        cache_key = (holder.key, what, cliente_key, tuple(sorted((k, str(v)) for k, v in p.items())))
+        cached = holder.responses.get(cache_key)
+        if cached is not None:
+            return Response(cached, media_type="application/json", headers={"x-cache": "hit"})
+
+        body = await run_in_threadpool(_recommendations, model, fingerprint, cliente_key, p, what)
+        if body is None:
+            return JSONResponse({"error": f"cliente '{cliente_key}' no encontrado"}, status_code=404)
+        response = JSONResponse(body, headers={"x-cache": "miss"})
+        holder.responses.put(cache_key, response.body)
+        return response
+
+    return handler
+
+
+async def health(request):
+    model, _ = await holder.current()
+    return JSONResponse(
+        {
+            "status": "ok" if model is not None else "sin_datos",
+            "model_key": holder.key,
+            "clientes": len(model.clients) if model is not None else 0,
+            "respuestas_en_cache": len(holder.responses.data),
+        }
+    )
+
+
+async def clientes(request):
+    try:
+        offset = _int(request.query_params, "offset", 0, 0, 1 << 31)
+        limit = _int(request.query_params, "limit", 100, 1, 10_000)
+    except BadRequest as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    model, _ = await holder.current()
+    keys = [] if model is None else model.clients[offset : offset + limit].tolist()
+    return JSONResponse({"total": 0 if model is None else len(model.clients), "clientes": keys})
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/clientes", clientes),
+        Route("/clientes/{cliente_key:path}/subrubros", _endpoint("subrubros")),
+        Route("/clientes/{cliente_key:path}/productos", _endpoint("productos")),
+        Route("/clientes/{cliente_key:path}/recomendaciones", _endpoint("recomendaciones")),
+    ],
+)
+if os.environ.get("CANASTAS_DB"):
+    store.DB_PATH = os.environ["CANASTAS_DB"]
+
+
+def main():
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="API HTTP de recomendaciones de canastas.")
+    ap.add_argument("--db", default=store.DB_PATH, help="base SQLite con las ventas")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args()
+
+    store.DB_PATH = args.db
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# canastas/artifacts.py — Modelos armados guardados en disco (npy con mmap + Parquet)
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from canastas.model import Model, build_model, extend_model, month_block
+from canastas.timing import timed
+
+
+# -----------------------------
+# Artefactos del modelo en disco
+# -----------------------------
+# Cada modelo armado se guarda en MODEL_DIR/<clave>/ (arrays .npy que se abren con mmap,
+# tablas en Parquet). La clave sale de la huella de los datos (db_fingerprint o hashes de
+# archivos) + filtros, así un reinicio del proceso no reconstruye nada si la base no cambió.
+MODEL_DIR = "model_cache"
+MODEL_VERSION = 4  # subir si cambia lo que arma build_model
+MODEL_KEEP = 8  # versiones guardadas en disco
+MONTHS_DIR = "meses"  # subcarpeta con la co-ocurrencia de cada mes (fuera de MODEL_KEEP)
+MONTHS_KEEP = 240  # partes por mes guardadas en disco
+
+
+def model_key(source: dict, **params) -> str:
+    payload = json.dumps({"v": MODEL_VERSION, "source": source, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _list_cols_to_lists(df: pd.DataFrame) -> pd.DataFrame:
+    # Parquet devuelve las columnas de listas (catálogo) como arrays de numpy
+    for c in df.columns:
+        if df[c].dtype == object and len(df) and isinstance(df[c].iloc[0], np.ndarray):
+            df[c] = df[c].map(list)
+    return df
+
+
+@timed("save_model")
+def save_model(model: Model, key: str, meta: dict = None):
+    # meta: alcance y huellas por mes con que se armó (para extenderlo con un mes nuevo)
+    final = os.path.join(MODEL_DIR, key)
+    if os.path.isdir(final):
+        return
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=MODEL_DIR)
+
+    manifest = {}
+    for name, value in zip(model._fields, model):
+        path = os.path.join(tmp, name)
+        if sp.issparse(value):
+            value = value.tocsr()
+            for part in ("data", "indices", "indptr"):
+                np.save(f"{path}.{part}.npy", getattr(value, part))
+            manifest[name] = {"kind": "csr", "shape": list(value.shape)}
+        elif isinstance(value, pd.DataFrame):
+            value.to_parquet(f"{path}.parquet", index=False)
+            manifest[name] = {"kind": "frame"}
+        elif isinstance(value, pd.Series):
+            pd.DataFrame({"index": value.index, "value": value.to_numpy()}).to_parquet(f"{path}.parquet", index=False)
+            manifest[name] = {"kind": "series"}
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            np.save(f"{path}.npy", value)
+            manifest[name] = {"kind": "array"}
+        elif isinstance(value, np.ndarray):
+            pd.DataFrame({"value": value}).to_parquet(f"{path}.parquet", index=False)
+            manifest[name] = {"kind": "objects"}
+        else:
+            manifest[name] = {"kind": "json", "value": value}
+    if meta:
+        manifest["_meta"] = meta
+
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    # rename atómico: otro proceso nunca ve un directorio a medio escribir
+    try:
+        os.rename(tmp, final)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    versions = sorted(
+        (d for d in os.listdir(MODEL_DIR) if not d.startswith(".") and d != MONTHS_DIR),
+        key=lambda d: os.path.getmtime(os.path.join(MODEL_DIR, d)),
+    )
+    for old in versions[:-MODEL_KEEP]:
+        shutil.rmtree(os.path.join(MODEL_DIR, old), ignore_errors=True)
+
+
+@timed("load_model")
+def load_model(key: str):
+    folder = os.path.join(MODEL_DIR, key)
+    manifest_path = os.path.join(folder, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    values = {}
+    for name in Model._fields:
+        info = manifest[name]
+        path = os.path.join(folder, name)
+        if info["kind"] == "csr":
+            parts = [np.load(f"{path}.{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr")]
+            m = sp.csr_matrix(tuple(parts), shape=tuple(info["shape"]), copy=False)
+            m.has_sorted_indices = True
+            values[name] = m
+        elif info["kind"] == "frame":
+            values[name] = _list_cols_to_lists(pd.read_parquet(f"{path}.parquet"))
+        elif info["kind"] == "series":
+            t = pd.read_parquet(f"{path}.parquet")
+            values[name] = pd.Series(t["value"].to_numpy(), index=t["index"].to_numpy())
+        elif info["kind"] == "array":
+            values[name] = np.load(f"{path}.npy", mmap_mode="r")
+        elif info["kind"] == "objects":
+            values[name] = pd.read_parquet(f"{path}.parquet")["value"].to_numpy(dtype=object)
+        else:
+            values[name] = info["value"]
+    return Model(**values)
+
+
+# -----------------------------
+# Partes por mes
+# -----------------------------
+# La co-ocurrencia de cada mes se guarda aparte, identificada por la huella de ese mes
+# (db_month_fingerprints). Si cambió un mes que ya estaba el modelo se vuelve a armar, pero la
+# co-ocurrencia de los meses que no cambiaron sale del disco: solo se calcula la del mes que
+# cambió. La huella de cada mes trae la de cada empresa (por_empresa): si lo único nuevo son
+# pares (empresa, mes) que no estaban (meses nuevos, u otra empresa que carga un mes ya
+# cargado), load_or_build_model extiende el modelo anterior con esas filas. Si cambió un par
+# que ya estaba (se reemplazó un mes de una empresa) se arma de nuevo.
+def _month_path(mes: str, fp: dict) -> str:
+    payload = json.dumps({"v": MODEL_VERSION, "mes": mes, "fp": fp}, sort_keys=True, default=str)
+    return os.path.join(MODEL_DIR, MONTHS_DIR, hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16] + ".npz")
+
+
+@timed("load_month_parts", filas=len)
+def load_month_parts(month_fps: dict) -> dict:
+    parts = {}
+    for mes, fp in month_fps.items():
+        path = _month_path(mes, fp)
+        if not os.path.exists(path):
+            continue
+        with np.load(path) as z:
+            U = sp.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"]))
+            parts[mes] = (z["subrubros"].astype(object), U)
+        os.utime(path)  # usada: la limpieza borra primero las que nadie lee
+    return parts
+
+
+def save_month_parts(model: Model, month_fps: dict, skip=()):
+    folder = os.path.join(MODEL_DIR, MONTHS_DIR)
+    os.makedirs(folder, exist_ok=True)
+    n_sr = len(model.subrubros)
+    for m, mes in enumerate(model.months):
+        if mes in skip or mes not in month_fps:
+            continue
+        # solo los subrubros que aparecen ese mes (el orden global se rearma al cargar)
+        U = month_block(model.co_months, m, n_sr).tocoo()
+        used = np.unique(np.concatenate([U.row, U.col]))
+        local = sp.csr_matrix(
+            (U.data, (np.searchsorted(used, U.row), np.searchsorted(used, U.col))), shape=(len(used), len(used))
+        )
+        path = _month_path(mes, month_fps[mes])
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                subrubros=model.subrubros[used].astype(str),
+                data=local.data,
+                indices=local.indices,
+                indptr=local.indptr,
+                shape=np.array(local.shape),
+            )
+        os.replace(path + ".tmp", path)
+
+    files = sorted(
+        (f for f in os.listdir(folder) if f.endswith(".npz")),
+        key=lambda f: os.path.getmtime(os.path.join(folder, f)),
+    )
+    for old in files[:-MONTHS_KEEP]:
+        os.remove(os.path.join(folder, old))
+
+
+def _empresa_months(fps: dict) -> dict:
+    # {(mes, empresa): huella} a partir de las huellas por mes
+    return {(mes, e): fp for mes, f in fps.items() for e, fp in (f.get("por_empresa") or {}).items()}
+
+
+def _previous_model(scope: str, fps: dict):
+    # el último modelo guardado del mismo alcance, si se puede extender a `fps`: sus pares
+    # (mes, empresa) siguen iguales y solo hay pares nuevos. Devuelve (modelo, pares nuevos,
+    # meses sin cambios)
+    if not os.path.isdir(MODEL_DIR):
+        return None, [], set()
+    versions = sorted(
+        (d for d in os.listdir(MODEL_DIR) if not d.startswith(".") and d != MONTHS_DIR),
+        key=lambda d: os.path.getmtime(os.path.join(MODEL_DIR, d)),
+        reverse=True,
+    )
+    for d in versions:
+        try:
+            with open(os.path.join(MODEL_DIR, d, "manifest.json"), encoding="utf-8") as f:
+                meta = json.load(f).get("_meta") or {}
+        except (OSError, ValueError):
+            continue
+        if meta.get("scope") != scope or meta.get("v") != MODEL_VERSION:
+            continue
+        old = meta.get("month_fps") or {}
+        old_pairs, pairs = _empresa_months(old), _empresa_months(fps)
+        new = sorted(set(pairs) - set(old_pairs))
+        if not old_pairs or not new or any(pairs.get(k) != fp for k, fp in old_pairs.items()):
+            return None, [], set()
+        return load_model(d), new, {m for m, fp in old.items() if fps.get(m) == fp}
+    return None, [], set()
+
+
+def _load_pairs(load_df, pairs: list) -> pd.DataFrame:
+    # solo las filas de los pares (mes, empresa) nuevos: una lectura por empresa
+    frames = []
+    for empresa in sorted({e for _, e in pairs}):
+        months = sorted(m for m, e in pairs if e == empresa)
+        df = load_df(empresas=[empresa], period_from=months[0], period_to=months[-1])
+        frames.append(df[df["anio_mes"].isin(months)])  # los meses del medio que no cambiaron
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def load_or_build_model(key: str, load_df, month_fps=None, scope: str = None):
+    # disco si ya está, si no construir (load_df() trae las ventas) y guardar.
+    # month_fps() (opcional) da la huella de cada mes para reutilizar sus partes; con
+    # `scope` (alcance de los datos sin la huella), si lo único que cambió es que hay pares
+    # (mes, empresa) nuevos, se extiende el último modelo del alcance: load_df(empresas=...,
+    # period_from=..., period_to=...) trae solo esas filas y la historia no se vuelve a leer
+    model = load_model(key)
+    if model is not None:
+        return model
+    fps = month_fps() if month_fps is not None else {}
+    prev, new, same = _previous_model(scope, fps) if scope is not None and fps else (None, [], set())
+    if prev is not None:
+        parts = same  # los meses a los que se sumó otra empresa cambian de huella: se guardan otra vez
+        model = extend_model(prev, _load_pairs(load_df, new))
+    else:
+        df = load_df()
+        if df.empty:
+            return None
+        parts = load_month_parts(fps)
+        model = build_model(df, month_co=parts)
+    save_model(model, key, meta={"v": MODEL_VERSION, "scope": scope, "month_fps": fps} if scope is not None else None)
+    if fps:
+        save_month_parts(model, fps, skip=parts)
+    return model
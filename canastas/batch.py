@@ -0,0 +1,415 @@
+# canastas/batch.py — Canastas precalculadas para todos los clientes (sin Streamlit)
+#
+# Uso (desde la carpeta de la app, usa la misma base y el mismo model_cache):
+#   python -m canastas.batch [--por-vendedor] [--workers 8] [--salida recomendaciones/]
+#
+# 1) Subrubros: por bloques de clientes con recommend_batch (X_bin[bloque] @ co, lo mismo
+#    que recommend_for_client para todo el bloque; co puede ser otra métrica de asociación).
+# 2) Productos: por subrubro recomendado, scores = W @ A, con W = pesos de los vecinos de
+#    cada cliente (neigh_sim) y A = cliente x artículo del tramo del cubo de ese subrubro.
+#
+# Los productos se rankean para las tres métricas (importe / unidades / pedidos), así la app
+# puede servir cualquier combinación de sliders desde la tabla sin recalcular.
+#
+# Los arrays del modelo se publican una sola vez en memoria compartida; los procesos del
+# pool los mapean sin copiarlos. Salida: tablas rec_* en SQLite o Parquet en una carpeta.
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from canastas import store
+from canastas.artifacts import load_or_build_model, model_key
+from canastas.model import (
+    ASSOC_METRICS,
+    BLOCK_CELLS,
+    NEIGHBORS_K,
+    association_model,
+    freq_order,
+    metric_col_name,
+    model_slice,
+    recommend_batch,
+    weighted_model,
+)
+from canastas.timing import setup_log, timed
+
+BATCH_CLIENTS = 2048  # clientes por tarea
+
+# lo que se materializa: alcanza para los topes de los sliders de la app con los valores
+# por defecto de "clientes similares" y "excluir productos que ya compra"
+REC_TOPK = 25
+REC_TOPN = 30
+REC_NEIGHBORS = 50
+REC_EXCLUDE_BOUGHT = True
+RANK_METRICS = ["importe", "unidades", "pedidos"]
+
+# arrays del modelo y parámetros de la corrida, en cada proceso del pool (en el proceso
+# principal las tareas los reciben directo: puede haber varias corridas en hilos distintos)
+_ARRAYS = {}
+_PARAMS = {}
+
+
+# -----------------------------
+# Memoria compartida
+# -----------------------------
+def _share(arrays: dict):
+    blocks, specs = [], {}
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        blocks.append(shm)
+        specs[name] = (shm.name, a.shape, a.dtype.str)
+    return blocks, specs
+
+
+def _init_worker(specs: dict, params: dict):
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _ARRAYS[name] = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        _ARRAYS[f"_shm_{name}"] = shm  # mantener abierto mientras viva el proceso
+    _PARAMS.update(params)
+
+
+def _in_worker(fn, *task):
+    return fn(_ARRAYS, _PARAMS, *task)
+
+
+def _csr(arrays: dict, prefix: str, shape) -> sp.csr_matrix:
+    parts = tuple(arrays[f"{prefix}_{p}"] for p in ("data", "indices", "indptr"))
+    return sp.csr_matrix(parts, shape=shape, copy=False)
+
+
+# -----------------------------
+# Tareas
+# -----------------------------
+def _subrubros_block(arrays: dict, params: dict, b0: int, b1: int):
+    n_sr = params["n_subrubros"]
+    X = _csr(arrays, "x", (params["n_clients"], n_sr))[b0:b1]
+    rows, rank, sr, score = recommend_batch(X, _csr(arrays, "co", (n_sr, n_sr)), arrays["by_freq"], params["topk"])
+    return rows + b0, rank, sr, score
+
+
+def _productos_subrubro(arrays: dict, params: dict, j: int, cli: np.ndarray):
+    n_clients = params["n_clients"]
+    lo, hi = arrays["cube_offsets"][j], arrays["cube_offsets"][j + 1]
+    cube_cli = arrays["cube_cli"][lo:hi]
+    arts, art_local = np.unique(arrays["cube_art"][lo:hi], return_inverse=True)
+    n_art = len(arts)
+    shape = (n_clients, n_art)
+    B = sp.csr_matrix((np.ones(hi - lo, dtype=np.float32), (cube_cli, art_local)), shape=shape)
+
+    # pesos de vecinos (los -1 del índice LSH quedan afuera)
+    nn = arrays["neigh_idx"][cli, : params["neighbors_n"]]
+    sim = arrays["neigh_sim"][cli, : params["neighbors_n"]]
+    valid = nn >= 0
+    r = np.broadcast_to(np.arange(len(cli))[:, None], nn.shape)[valid]
+    W = sp.csr_matrix((sim[valid], (r, nn[valid])), shape=(len(cli), n_clients))
+    W_bin = sp.csr_matrix((np.ones(len(r), dtype=np.float32), (r, nn[valid])), shape=W.shape)
+
+    vecinos = (W_bin @ B).toarray()
+    blocked = vecinos == 0  # solo artículos que compró algún vecino
+    if params["exclude_bought"]:
+        # por código de artículo (el mismo código puede tener varias descripciones)
+        codes, code_local = np.unique(arrays["art_code"][arts], return_inverse=True)
+        M = sp.csr_matrix((np.ones(n_art), (np.arange(n_art), code_local)), shape=(n_art, len(codes)))
+        own_codes = (B[cli] @ M) > 0
+        blocked |= ((own_codes @ M.T) > 0).toarray()
+
+    k = min(params["topn"], n_art)
+    if k == 0:
+        return tuple(np.empty(0) for _ in range(10))
+
+    # (cliente, artículo) del tramo, ordenado: para sumar sobre los vecinos de cada sugerencia
+    pair = cube_cli.astype(np.int64) * n_art + art_local
+    by_pair = np.argsort(pair, kind="stable")
+    pair = pair[by_pair]
+    extra = {c: arrays[f"cube_{c}"][lo:hi][by_pair] for c in RANK_METRICS + ["ultimo"]}
+
+    out = []
+    for mi, metric in enumerate(RANK_METRICS):
+        A = sp.csr_matrix((arrays[f"cube_{metric}"][lo:hi], (cube_cli, art_local)), shape=shape)
+        score = (W @ A).toarray()
+        score[blocked] = -np.inf
+
+        part = np.argpartition(-score, k - 1, axis=1)[:, :k]
+        order = np.lexsort((part, -np.take_along_axis(score, part, axis=1)), axis=1)  # empate: por artículo
+        top = np.take_along_axis(part, order, axis=1)
+        top_score = np.take_along_axis(score, top, axis=1)
+        keep = np.isfinite(top_score)
+        rr = np.broadcast_to(np.arange(len(cli))[:, None], top.shape)[keep]
+        aa = top[keep]
+
+        q = nn[rr].astype(np.int64) * n_art + aa[:, None]
+        pos = np.minimum(np.searchsorted(pair, q), len(pair) - 1)
+        found = (pair[pos] == q) & (nn[rr] >= 0)
+        out.append(
+            (
+                cli[rr].astype(np.int32),
+                np.full(len(rr), mi, dtype=np.int8),
+                np.broadcast_to(np.arange(k), top.shape)[keep].astype(np.int16),
+                arts[aa].astype(np.int32),
+                top_score[keep],
+                vecinos[rr, aa],
+                *(np.where(found, extra[c][pos], 0.0).sum(axis=1) for c in RANK_METRICS),
+                np.where(found, extra["ultimo"][pos], -1).max(axis=1),
+            )
+        )
+    return tuple(np.concatenate(x) for x in zip(*out))
+
+
+def _run(fn, tasks, workers: int, arrays: dict, specs: dict, params: dict):
+    if workers <= 1:
+        return [fn(arrays, params, *t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs, params)) as pool:
+        futures = [pool.submit(_in_worker, fn, *t) for t in tasks]
+        return [f.result() for f in futures]
+
+
+# -----------------------------
+# Corrida completa
+# -----------------------------
+@timed("recommend_all")
+def recommend_all(
+    model,
+    topk: int = REC_TOPK,
+    topn: int = REC_TOPN,
+    neighbors_n: int = REC_NEIGHBORS,
+    exclude_bought: bool = REC_EXCLUDE_BOUGHT,
+    workers: int = 1,
+    block: int = BATCH_CLIENTS,
+):
+    n_clients, n_sr = model.X_bin.shape
+    X_bin = model.X_bin.tocsr()
+    co = model.co.tocsr()
+    art_code, _ = pd.factorize(model.articulos["articulo_codigo"])
+    ultimo, meses = pd.factorize(model.cube["ultimo_mes"], sort=True)
+    arrays = {
+        "x_data": X_bin.data,
+        "x_indices": X_bin.indices,
+        "x_indptr": X_bin.indptr,
+        "co_data": co.data,
+        "co_indices": co.indices,
+        "co_indptr": co.indptr,
+        "by_freq": freq_order(model.freq, model.subrubros),
+        "neigh_idx": model.neigh_idx[:, :neighbors_n],
+        "neigh_sim": model.neigh_sim[:, :neighbors_n],
+        "cube_offsets": model.cube_offsets,
+        "cube_cli": model.cube["cli"].to_numpy(),
+        "cube_art": model.cube["art"].to_numpy(),
+        **{f"cube_{m}": model.cube[metric_col_name(m)].to_numpy(dtype=np.float64) for m in RANK_METRICS},
+        "cube_ultimo": ultimo.astype(np.int32),
+        "art_code": art_code,
+    }
+    params = {
+        "n_clients": n_clients,
+        "n_subrubros": n_sr,
+        "topk": topk,
+        "topn": topn,
+        "neighbors_n": neighbors_n,
+        "exclude_bought": exclude_bought,
+    }
+
+    blocks, specs = _share(arrays) if workers > 1 else ([], {})
+    try:
+        # 1) subrubros recomendados, por bloques de clientes
+        tasks = [(b0, min(n_clients, b0 + block)) for b0 in range(0, n_clients, block)]
+        parts = _run(_subrubros_block, tasks, workers, arrays, specs, params)
+        cli, rank, sr, score = (np.concatenate(p) for p in zip(*parts))
+        freq = model.freq.reindex(model.subrubros).fillna(0).to_numpy()
+        subs = pd.DataFrame(
+            {
+                "cliente_key": model.clients[cli],
+                "rank": rank + 1,
+                "subrubro": model.subrubros[sr],
+                "score_cooc": score,
+                "freq_global": freq[sr],
+            }
+        )
+
+        # 2) productos (las tres métricas): una tarea por subrubro, partida si la piden muchos clientes
+        order = np.lexsort((cli, sr))
+        cli_s, sr_s = cli[order], sr[order]
+        bounds = np.searchsorted(sr_s, np.arange(n_sr + 1))
+        # el bloque denso de cada tarea es clientes x artículos del subrubro (acotado por BLOCK_CELLS)
+        steps = np.clip(BLOCK_CELLS // np.maximum(np.diff(model.cube_offsets), 1), 1, block)
+        tasks = [
+            (j, cli_s[p0 : min(bounds[j + 1], p0 + steps[j])])
+            for j in range(n_sr)
+            for p0 in range(bounds[j], bounds[j + 1], steps[j])
+        ]
+        parts = _run(_productos_subrubro, tasks, workers, arrays, specs, params)
+        sr_t = np.concatenate([np.full(len(p[0]), j, dtype=np.int32) for (j, _), p in zip(tasks, parts)])
+        cli, metric, rank, art, pscore, vecinos, importe, unidades, pedidos, ult = (
+            np.concatenate(p) for p in zip(*parts)
+        )
+        cli, metric, rank, art, ult = (a.astype(np.int64) for a in (cli, metric, rank, art, ult))
+        arts = model.articulos.iloc[art].reset_index(drop=True)
+        prods = pd.DataFrame(
+            {
+                "cliente_key": model.clients[cli],
+                "subrubro": model.subrubros[sr_t],
+                "metrica": np.asarray(RANK_METRICS, dtype=object)[metric],
+                "rank": rank + 1,
+                "articulo_codigo": arts["articulo_codigo"].to_numpy(),
+                "articulo_descripcion": arts["articulo_descripcion"].to_numpy(),
+                "score": pscore,
+                "vecinos": vecinos.astype(np.int64),
+                "importe": importe,
+                "unidades": unidades,
+                "pedidos": pedidos,
+                "ultimo_mes": np.asarray(meses, dtype=object)[ult],
+            }
+        ).sort_values(["cliente_key", "subrubro", "metrica", "rank"], ignore_index=True)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return subs, prods
+
+
+def recommendation_frames(model, key: str, filters: dict, workers: int = 1, block: int = BATCH_CLIENTS, **params):
+    # corrida + filas de rec_runs, listas para db_write_recommendations o Parquet
+    params = {
+        "topk": REC_TOPK,
+        "topn": REC_TOPN,
+        "neighbors_n": REC_NEIGHBORS,
+        "exclude_bought": REC_EXCLUDE_BOUGHT,
+        **params,
+    }
+    subs, prods = recommend_all(model, workers=workers, block=block, **params)
+    for df in (subs, prods):
+        df.insert(0, "vendedor", filters.get("vendedor") or "")
+        df.insert(0, "model_key", key)
+    runs = pd.DataFrame(
+        [
+            {
+                "model_key": key,
+                "filtros": json.dumps(filters, sort_keys=True),
+                "params": json.dumps(params, sort_keys=True),
+                "clientes": len(model.clients),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+            }
+        ]
+    )
+    return runs, subs, prods
+
+
+@timed("materialize")
+def materialize(model, key: str, filters: dict, path: str = None, workers: int = 1, **params):
+    store.db_write_recommendations(*recommendation_frames(model, key, filters, workers=workers, **params), path=path)
+
+
+def _scopes(args):
+    vendedores, empresas, periodos = store.db_filter_options()
+    if not periodos:
+        return []
+    # mismos filtros (y misma clave de modelo) que arma la app
+    empresas_sel = args.empresas or empresas
+    base = {
+        "empresas": None if sorted(empresas_sel) == empresas else sorted(empresas_sel),
+        "period_from": None if args.desde in (None, periodos[0]) else args.desde,
+        "period_to": None if args.hasta in (None, periodos[-1]) else args.hasta,
+    }
+    if args.por_vendedor:
+        return [{"vendedor": v, **base} for v in vendedores]
+    return [{"vendedor": args.vendedor, **base}]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Precalcula subrubros y productos recomendados para todos los clientes.")
+    ap.add_argument("--db", default=store.DB_PATH, help="base SQLite con las ventas")
+    ap.add_argument("--salida", help="archivo .sqlite (tablas rec_*) o carpeta para Parquet; por defecto, la misma base")
+    ap.add_argument("--vendedor", help="solo la cartera de este vendedor")
+    ap.add_argument("--por-vendedor", action="store_true", help="una corrida por cada vendedor")
+    ap.add_argument("--empresas", nargs="+")
+    ap.add_argument("--desde", help="período desde (AAAAMM)")
+    ap.add_argument("--hasta", help="período hasta (AAAAMM)")
+    ap.add_argument("--ventana", type=int, help="co-ocurrencia solo de los últimos N meses")
+    ap.add_argument("--vida-media", type=float, help="co-ocurrencia con decaimiento (vida media en meses)")
+    ap.add_argument("--asociacion", choices=ASSOC_METRICS, default="co", help="métrica para rankear subrubros")
+    ap.add_argument("--top-k", type=int, help="solo los K subrubros más asociados a cada uno")
+    ap.add_argument("--subrubros", type=int, default=REC_TOPK, help="subrubros recomendados por cliente")
+    ap.add_argument("--productos", type=int, default=REC_TOPN, help="productos por subrubro y métrica")
+    ap.add_argument("--vecinos", type=int, default=REC_NEIGHBORS, help="clientes similares a mirar")
+    ap.add_argument("--incluir-comprados", action="store_true", help="no excluir productos que el cliente ya compra")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--bloque", type=int, default=BATCH_CLIENTS, help="clientes por tarea")
+    ap.add_argument("--log", action="store_true", help="tiempo y memoria por etapa (JSON por stderr)")
+    args = ap.parse_args()
+    if args.vida_media is not None and not (np.isfinite(args.vida_media) and args.vida_media > 0):
+        ap.error("--vida-media tiene que ser un número mayor que 0")
+
+    setup_log(args.log)
+    store.DB_PATH = args.db
+    params = {
+        "topk": args.subrubros,
+        "topn": args.productos,
+        "neighbors_n": min(args.vecinos, NEIGHBORS_K),
+        "exclude_bought": not args.incluir_comprados,
+    }
+    tiempo = {k: v for k, v in (("ventana", args.ventana), ("vida_media", args.vida_media)) if v}
+    asoc = {} if args.asociacion == "co" and not args.top_k else {"asociacion": args.asociacion, "top_k": args.top_k}
+    fingerprint = store.db_fingerprint()
+
+    frames = []
+    base = {}
+    for filters in _scopes(args):
+        t0 = time.perf_counter()
+        key = model_key(fingerprint, **filters, **tiempo, **asoc)
+        # el modelo global se arma (o se lee de disco) una sola vez; cada vendedor es un corte
+        everyone = {**filters, "vendedor": None}
+        base_key = model_key(fingerprint, **everyone)
+        if base_key not in base:
+            base[base_key] = load_or_build_model(
+                base_key,
+                lambda **kw: store.db_load_df(**{**everyone, **kw}),
+                month_fps=lambda: store.db_month_fingerprints(**everyone),
+                scope=model_key({"backend": store.SQLITE.name}, **everyone),
+            )
+        model = base[base_key]
+        if model is not None and filters["vendedor"] is not None:
+            model = model_slice(model, filters["vendedor"])
+        if model is not None and tiempo:
+            model = weighted_model(model, **tiempo)
+        if model is not None and asoc:
+            model = association_model(model, **asoc)
+        if model is None:
+            print(f"{filters['vendedor'] or '(todos)'}: sin ventas")
+            continue
+        runs, subs, prods = recommendation_frames(
+            model, key, {**filters, **tiempo, **asoc}, workers=args.workers, block=args.bloque, **params
+        )
+        frames.append((runs, subs, prods))
+        print(
+            f"{filters['vendedor'] or '(todos)'}: {len(model.clients):,} clientes, {len(subs):,} subrubros, "
+            f"{len(prods):,} productos en {time.perf_counter() - t0:.1f} s"
+        )
+
+    if not frames:
+        print("La base está vacía: no hay nada para recomendar.")
+        return
+
+    runs, subs, prods = (pd.concat(f, ignore_index=True) for f in zip(*frames))
+    salida = args.salida or args.db
+    if salida.endswith((".sqlite", ".db")):
+        store.db_write_recommendations(runs, subs, prods, path=salida)
+    else:
+        os.makedirs(salida, exist_ok=True)
+        runs.to_parquet(os.path.join(salida, "runs.parquet"), index=False)
+        subs.to_parquet(os.path.join(salida, "subrubros.parquet"), index=False)
+        prods.to_parquet(os.path.join(salida, "productos.parquet"), index=False)
+    print(f"Guardado en {salida}")
+
+
+if __name__ == "__main__":
+    main()
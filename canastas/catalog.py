@@ -0,0 +1,89 @@
+# canastas/catalog.py — Catálogo de clientes unificados (para el buscador)
+#
+# Todo se resuelve sobre combinaciones únicas (código de cliente_key, valor) deduplicadas
+# como enteros; las listas por cliente salen de cortar un único array ordenado, sin
+# groupby.apply / iterrows / apply por fila.
+
+import numpy as np
+import pandas as pd
+
+from canastas.timing import timed
+
+
+def _unique_rows(codes: np.ndarray, *cols: pd.Series) -> pd.DataFrame:
+    # filas únicas (k, v0, v1, ...) en orden de aparición, con los valores ya como texto.
+    # Cada columna se factoriza una sola vez y las combinaciones se deduplican como enteros.
+    combo = codes.astype(np.int64)
+    decoded = []
+    for s in cols:
+        v, uniques = pd.factorize(s, use_na_sentinel=False)
+        m = max(len(uniques), 1)
+        combo = combo * m + v
+        decoded.append((m, np.asarray(uniques.astype(str), dtype=object)))
+
+    combo = pd.unique(combo)
+    out = {}
+    for i in reversed(range(len(cols))):
+        m, txt = decoded[i]
+        out[f"v{i}"] = txt[combo % m]
+        combo = combo // m
+    t = pd.DataFrame({"k": combo, **dict(sorted(out.items()))})
+    return t.drop_duplicates()
+
+
+def _split(t: pd.DataFrame, n: int):
+    # t ordenado por k: devuelve la lista de valores de cada k (0..n-1) y sus inicios
+    starts = np.searchsorted(t["k"].to_numpy(), np.arange(n + 1))
+    vals = t["v0"].tolist()
+    return [vals[a:b] for a, b in zip(starts[:-1], starts[1:])], starts
+
+
+def _sorted_lists(codes: np.ndarray, s: pd.Series, n: int, blank_ok: bool):
+    t = _unique_rows(codes, s)
+    keep = t["v0"].ne("") if blank_ok else t["v0"].str.strip().ne("")
+    return _split(t[keep].sort_values(["k", "v0"]), n)
+
+
+@timed("build_customer_catalog", filas=len)
+def build_customer_catalog(df: pd.DataFrame) -> pd.DataFrame:
+    # Para cada cliente_key armamos un resumen:
+    # - CUIT
+    # - razones sociales (pueden ser diferentes)
+    # - IDs por empresa
+    codes, keys = pd.factorize(df["cliente_key"], sort=True)
+    n = len(keys)
+    base = pd.DataFrame({"cliente_key": np.asarray(keys, dtype=object)})
+
+    cuits = _unique_rows(codes, df["cuit"])
+    cuits = cuits[cuits["v0"].str.strip().ne("")].drop_duplicates("k")
+    cuit = np.full(n, "", dtype=object)
+    cuit[cuits["k"].to_numpy()] = cuits["v0"].to_numpy()
+    base["cuit"] = cuit
+
+    razones, starts = _sorted_lists(codes, df["cliente"], n, blank_ok=False)
+    base["empresas"] = _sorted_lists(codes, df["empresa"], n, blank_ok=True)[0]
+    base["razones"] = razones
+    base["ids"] = _sorted_lists(codes, df["cliente_id"], n, blank_ok=False)[0]
+
+    # IDs por empresa (si querés verlo explícito)
+    # armamos string “CROMOSOL:123 | BBA:987” (en orden de aparición)
+    pairs = _unique_rows(codes, df["empresa"], df["cliente_id"])
+    ids = pairs["v1"].str.strip().to_numpy(dtype=object)
+    keep = ids != ""
+    txt = pairs["v0"].to_numpy(dtype=object)[keep] + ":" + ids[keep]
+    t = pd.DataFrame({"k": pairs["k"].to_numpy()[keep], "v0": txt}).sort_values("k", kind="stable")
+    base["ids_por_empresa"] = [" | ".join(x) for x in _split(t, n)[0]]
+
+    n_razones = np.diff(starts)
+    name = np.full(n, "(sin nombre)", dtype=object)
+    has_name = n_razones > 0
+    name[has_name] = [r[0] for r, ok in zip(razones, has_name) if ok]
+
+    cuit_txt = np.where(cuit != "", cuit, "SIN_CUIT").astype(object)
+    ids_txt = base["ids_por_empresa"].to_numpy(dtype=object)
+    ids_txt = np.where(ids_txt != "", " | " + ids_txt, "").astype(object)
+    # si hay más de 1 razón, lo indicamos
+    mas = (n_razones - 1).astype(str).astype(object)
+    extra = np.where(n_razones > 1, " | +" + mas + " razones", "").astype(object)
+    base["label"] = name + " | CUIT " + cuit_txt + ids_txt + extra
+    return base
@@ -0,0 +1,306 @@
+# canastas/ingest.py — Lectura de exports (CSV / Excel) y carga a la base, sin Streamlit
+#
+# Los CSV se leen en streaming: el formato (encoding + separador) se detecta una sola vez
+# sobre una muestra del principio del archivo y después se parsea por bloques de
+# CHUNK_ROWS filas, todo como texto (dtype=str) para que cada bloque se interprete igual.
+# Los Excel no se pueden leer por partes: vienen en un único bloque.
+#
+# Sirve tanto para los archivos subidos en la app (UploadedFile) como para archivos
+# abiertos desde disco:  python -m canastas.ingest ventas_cromosol.csv ventas_bba.xlsx
+#
+# Con varios archivos, read_files los parsea y estandariza en paralelo (un proceso por
+# archivo, hasta `workers`): cada proceso devuelve el archivo ya estandarizado y compacto
+# (texto como category: viaja al proceso principal como códigos + diccionario) y la carga en
+# la base sigue siendo una sola a la vez y en el orden de los archivos (SQLite tiene un solo
+# escritor y, entre archivos, el que se carga después pisa). Un archivo que falla no corta
+# el resto: su resultado trae el error. El pool es para la línea de comandos y los procesos
+# sin Streamlit: bajo `streamlit run` el __main__ es la página, y cada hijo (spawn) la
+# volvería a ejecutar al arrancar; la app lee con workers=1.
+
+import argparse
+import codecs
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from canastas import store
+from canastas.normalize import standardize_one
+from canastas.timing import setup_log, span, timed, timed_iter
+
+CSV_ENCODINGS = ["utf-8-sig", "utf-8", "latin1", "utf-16"]
+CSV_SEPS = [";", ",", "\t", "|"]
+SNIFF_BYTES = 1 << 20  # 1 MB
+CHUNK_ROWS = 500_000
+
+# frame: estandarizado y compacto (None si falló); written: filas nuevas en la base;
+# seconds: lo que tardó el proceso hijo en leerlo y estandarizarlo
+FileResult = namedtuple("FileResult", ["name", "frame", "written", "error", "seconds"])
+
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    cols = (
+        df.columns.astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(r"\s+", "_", regex=True)
+        .str.replace("$", "", regex=False)
+    )
+    return df.set_axis(cols, axis=1, copy=False)
+
+
+def sniff_csv_format(head: bytes):
+    last_err = None
+    # con BOM UTF-16 no hay que adivinar (latin1 "decodifica" cualquier cosa)
+    utf16 = head[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+    for enc in ["utf-16"] if utf16 else CSV_ENCODINGS:
+        try:
+            # decoder incremental: tolera que la muestra corte un carácter multibyte al final
+            text = codecs.getincrementaldecoder(enc)().decode(head)
+        except UnicodeDecodeError as e:
+            last_err = e
+            continue
+        if len(head) >= SNIFF_BYTES and "\n" in text:
+            text = text[: text.rindex("\n") + 1]  # descartar la última línea (incompleta)
+        for sep in CSV_SEPS:
+            try:
+                df = pd.read_csv(io.StringIO(text), sep=sep, dtype=str)
+                if df.shape[1] <= 1:
+                    continue
+                return enc, sep
+            except Exception as e:
+                last_err = e
+                continue
+    raise RuntimeError(f"No pude leer el archivo. Último error: {last_err}")
+
+
+def iter_table_chunks(uploaded_file, chunksize: int = CHUNK_ROWS):
+    name = (getattr(uploaded_file, "name", None) or "").lower()
+
+    if name.endswith(".xlsx") or name.endswith(".xls"):
+        uploaded_file.seek(0)
+        with span("read_table", archivo=os.path.basename(name)) as s:
+            df = pd.read_excel(uploaded_file)
+            s["filas"] = len(df)
+        yield _normalize_columns(df)
+        return
+
+    uploaded_file.seek(0)
+    enc, sep = sniff_csv_format(uploaded_file.read(SNIFF_BYTES))
+    uploaded_file.seek(0)
+    with pd.read_csv(uploaded_file, sep=sep, encoding=enc, dtype=str, chunksize=chunksize) as reader:
+        for chunk in timed_iter("read_table", reader, archivo=os.path.basename(name)):
+            yield _normalize_columns(chunk)
+
+
+def file_hash(uploaded_file) -> str:
+    h = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(SNIFF_BYTES), b""):
+        h.update(block)
+    uploaded_file.seek(0)
+    return h.hexdigest()
+
+
+def infer_empresa_from_filename(filename: str) -> str:
+    fn = os.path.basename(filename or "").lower()
+    if "cromo" in fn:
+        return "CROMOSOL"
+    if "bba" in fn:
+        return "BBA"
+    # fallback
+    return "SIN_ETIQUETA"
+
+
+def _collect(chunks, into):
+    for c in chunks:
+        into.append(c)
+        yield c
+
+
+@timed("read_file", filas=lambda result: sum(len(p) for p in result[0]))
+def read_file(uploaded_file, digest: str, save_to_db: bool = True, replace_periods: bool = False, backend=None):
+    # Un archivo por bloques: cada bloque se estandariza y (si corresponde) se escribe en la
+    # base antes de leer el siguiente. En memoria quedan solo las columnas estándar, no el
+    # archivo crudo. Devuelve (bloques estandarizados, filas escritas en la base).
+    # backend: store.SQLITE (por defecto) o el de Parquet (store.backend("parquet")).
+    empresa = infer_empresa_from_filename(uploaded_file.name)
+    parts, written = [], 0
+    # closing: si algo falla a mitad, el lector se cierra acá y no cuando el GC lo encuentre
+    # (con el archivo ya cerrado)
+    with contextlib.closing(iter_table_chunks(uploaded_file)) as raw:
+        chunks = (standardize_one(c, empresa=empresa)[store.VENTAS_COLS] for c in raw)
+        if save_to_db:
+            # carga incremental por archivo (hash) y período: no reescribe el histórico
+            name = os.path.basename(uploaded_file.name)
+            ingest_chunks = (backend or store.SQLITE).ingest_chunks
+            written = ingest_chunks(_collect(chunks, parts), name, digest, replace_periods=replace_periods)
+        parts.extend(chunks)  # lo que la base no consumió (archivo ya cargado)
+    return parts, written
+
+
+# -----------------------------
+# Varios archivos en paralelo
+# -----------------------------
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # columnas de texto -> category: se pickean como códigos + diccionario (mucho menos que
+    # un objeto str por fila) al volver del proceso hijo. Las medidas siguen en float64
+    # hasta cargarse en la base (concat_frames las achica recién para el frame en memoria)
+    text = [c for c in df.columns if c not in store.MEASURES and df[c].dtype == object]
+    return df.astype({c: "category" for c in text}, copy=False)
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    # frame único de ventas en memoria: cada columna de texto es una category con un solo
+    # diccionario ordenado para todos los archivos / empresas (pd.concat de categories
+    # distintas vuelve a object) y las medidas van en store.MEASURE_DTYPES
+    frames = [compact_frame(f) for f in frames]
+    cols = {}
+    for c in frames[0].columns:
+        parts = [f[c] for f in frames]
+        if c in store.MEASURES:
+            cols[c] = np.concatenate([p.to_numpy(dtype=store.MEASURE_DTYPES[c]) for p in parts])
+        else:
+            cols[c] = union_categoricals(parts, sort_categories=True, ignore_order=True)
+    return pd.DataFrame(cols)
+
+
+def _expand_chunks(df: pd.DataFrame, chunksize: int = CHUNK_ROWS):
+    # para la base, de a bloques y otra vez como texto (groupby sobre category arma el
+    # producto de todas las categorías)
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    for i in range(0, len(df), chunksize):
+        yield df.iloc[i : i + chunksize].astype({c: object for c in cats})
+
+
+def _standardize_file(path: str, name: str):
+    # corre en el proceso hijo: path es el archivo en disco (el subido, volcado a un temporal)
+    t0 = time.perf_counter()
+    empresa = infer_empresa_from_filename(name)
+    with open(path, "rb") as f, contextlib.closing(iter_table_chunks(f)) as chunks:
+        parts = [standardize_one(c, empresa=empresa)[store.VENTAS_COLS] for c in chunks]
+    return compact_frame(pd.concat(parts, ignore_index=True)), time.perf_counter() - t0
+
+
+def _spill(f, tmp_dir: str, i: int) -> str:
+    # el proceso hijo recibe una ruta, no el contenido: un archivo subido se copia a disco
+    # por bloques (sin armar los bytes enteros para mandarlos por el pipe)
+    if isinstance(f, str):
+        return f
+    path = os.path.join(tmp_dir, f"{i}-{os.path.basename(f.name)}")  # conserva la extensión
+    f.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(f, out, SNIFF_BYTES)
+    f.seek(0)
+    return path
+
+
+def read_files(
+    files,
+    digests,
+    save_to_db: bool = True,
+    replace_periods: bool = False,
+    workers: int = None,
+    progress=None,
+    backend=None,
+) -> list:
+    # files: rutas o archivos abiertos / subidos; digests: file_hash de cada uno.
+    # progress(i, n, FileResult) se llama al terminar cada archivo (en orden).
+    # Devuelve un FileResult por archivo; los que fallan traen error y frame None.
+    # Con un solo archivo o un solo CPU no hay pool: read_file en streaming, uno por uno.
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    results = []
+    if workers <= 1:
+        for i, (f, digest) in enumerate(zip(files, digests)):
+            name = os.path.basename(f if isinstance(f, str) else f.name)
+            t0 = time.perf_counter()
+            try:
+                if isinstance(f, str):
+                    with open(f, "rb") as fh:
+                        parts, written = read_file(fh, digest, save_to_db, replace_periods, backend)
+                else:
+                    parts, written = read_file(f, digest, save_to_db, replace_periods, backend)
+                frame = compact_frame(pd.concat(parts, ignore_index=True))
+                res = FileResult(name, frame, written, None, time.perf_counter() - t0)
+            except Exception as e:
+                res = FileResult(name, None, 0, f"{type(e).__name__}: {e}", None)
+            results.append(res)
+            if progress is not None:
+                progress(i, len(files), res)
+        return results
+
+    # spawn: el hijo arranca limpio (fork copiaría los hilos y locks de la app / del servidor)
+    spawn = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="canastas-") as tmp_dir:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=spawn) as pool:
+            names = [os.path.basename(f if isinstance(f, str) else f.name) for f in files]
+            paths = [_spill(f, tmp_dir, i) for i, f in enumerate(files)]
+            futures = [pool.submit(_standardize_file, path, name) for path, name in zip(paths, names)]
+            for i, (fut, name, digest) in enumerate(zip(futures, names, digests)):
+                try:
+                    frame, secs = fut.result()
+                    written = 0
+                    if save_to_db:
+                        written = (backend or store.SQLITE).ingest_chunks(
+                            _expand_chunks(frame), name, digest, replace_periods=replace_periods
+                        )
+                    res = FileResult(name, frame, written, None, secs)
+                except Exception as e:
+                    res = FileResult(name, None, 0, f"{type(e).__name__}: {e}", None)
+                results.append(res)
+                if progress is not None:
+                    progress(i, len(files), res)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Carga exports de ventas (CSV / Excel) en la base SQLite o Parquet.")
+    ap.add_argument("archivos", nargs="+")
+    ap.add_argument("--db", default=store.DB_PATH, help="base SQLite destino")
+    ap.add_argument("--parquet", help="carpeta de la base Parquet (en vez de SQLite)")
+    ap.add_argument("--reemplazar", action="store_true", help="reemplazar meses (empresa + período) ya cargados")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="archivos que se leen a la vez")
+    ap.add_argument("--log", action="store_true", help="tiempo y memoria por etapa (JSON por stderr)")
+    args = ap.parse_args()
+
+    setup_log(args.log)
+    store.DB_PATH = args.db
+    backend, destino = store.SQLITE, args.db
+    if args.parquet:
+        from canastas import parquet_store  # pyarrow solo si se usa
+
+        parquet_store.PARQUET_PATH = args.parquet
+        backend, destino = parquet_store.PARQUET, args.parquet
+    digests = []
+    for path in args.archivos:
+        with open(path, "rb") as f:
+            digests.append(file_hash(f))
+
+    def report(i, n, res):
+        if res.error:
+            print(f"[{i + 1}/{n}] {res.name}: ERROR {res.error}")
+        else:
+            print(
+                f"[{i + 1}/{n}] {res.name}: {len(res.frame):,} filas leídas, "
+                f"{res.written:,} nuevas/actualizadas en {destino} ({res.seconds:.1f} s)"
+            )
+
+    results = read_files(
+        args.archivos, digests, replace_periods=args.reemplazar, workers=args.workers, progress=report, backend=backend
+    )
+    if any(r.error for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1056 @@
+# canastas/model.py — Modelo de canastas: matrices cliente x subrubro, vecinos y rankings
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from canastas.catalog import build_customer_catalog
+from canastas.normalize import normalize_period
+from canastas.timing import timed
+
+
+# -----------------------------
+# Índice de vecinos (clientes similares)
+# -----------------------------
+# Para cada cliente guardamos sus NEIGHBORS_K vecinos más parecidos (coseno sobre X_bin),
+# ordenados de mayor a menor. Con más de LSH_MIN_CLIENTS clientes usamos MinHash/LSH
+# para generar candidatos en vez de comparar todos contra todos.
+NEIGHBORS_K = 200  # tope del slider "Clientes similares a mirar"
+LSH_MIN_CLIENTS = 100_000
+BLOCK_CELLS = 1 << 24  # celdas del bloque denso de similitudes (~64 MB en float32)
+
+
+def _topk_rows(S: np.ndarray, k: int):
+    part = np.argpartition(-S, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(S, part, axis=1)
+    order = np.argsort(-vals, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+def _neighbors_exact(X_bin: sp.csr_matrix, norms: np.ndarray, k: int):
+    n = X_bin.shape[0]
+    neigh_idx = np.empty((n, k), dtype=np.int32)
+    neigh_sim = np.empty((n, k), dtype=np.float32)
+    XT = X_bin.T.tocsc()
+    block = max(1, BLOCK_CELLS // max(n, 1))
+
+    for b0 in range(0, n, block):
+        b1 = min(n, b0 + block)
+        S = (X_bin[b0:b1] @ XT).toarray()
+        S /= norms[b0:b1, None] * norms[None, :]
+        S[np.arange(b1 - b0), np.arange(b0, b1)] = -1.0
+        neigh_idx[b0:b1], neigh_sim[b0:b1] = _topk_rows(S, k)
+
+    return neigh_idx, neigh_sim
+
+
+def _minhash_signatures(X_bin: sp.csr_matrix, num_perm: int, seed: int = 0) -> np.ndarray:
+    prime = np.int64(2_147_483_647)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, prime, num_perm, dtype=np.int64)
+    b = rng.integers(0, prime, num_perm, dtype=np.int64)
+    cols = np.arange(X_bin.shape[1], dtype=np.int64)
+    hv = (a[:, None] * cols[None, :] + b[:, None]) % prime
+
+    sig = np.full((X_bin.shape[0], num_perm), prime, dtype=np.int64)
+    nonempty = np.flatnonzero(np.diff(X_bin.indptr))
+    if len(nonempty) == 0:
+        return sig
+    starts = X_bin.indptr[nonempty]
+    for p0 in range(0, num_perm, 16):
+        vals = hv[p0 : p0 + 16][:, X_bin.indices]
+        sig[nonempty, p0 : p0 + 16] = np.minimum.reduceat(vals, starts, axis=1).T
+    return sig
+
+
+def _neighbors_lsh(X_bin: sp.csr_matrix, norms: np.ndarray, k: int, num_perm: int = 64, band_rows: int = 4):
+    n = X_bin.shape[0]
+    sig = _minhash_signatures(X_bin, num_perm)
+    valid = np.flatnonzero(np.diff(X_bin.indptr))
+    cap = 4 * k  # buckets enormes (ej. clientes de un solo subrubro) se parten en tramos
+
+    rows, cols = [], []
+    offset = 0
+    for b0 in range(0, num_perm - band_rows + 1, band_rows):
+        _, inv = np.unique(sig[valid, b0 : b0 + band_rows], axis=0, return_inverse=True)
+        inv = inv.ravel()
+        order = np.argsort(inv, kind="stable")
+        first = np.searchsorted(inv[order], inv[order], side="left")
+        chunk = (np.arange(len(order)) - first) // cap
+        bucket = inv[order] * (len(valid) // cap + 1) + chunk
+        _, bucket = np.unique(bucket, return_inverse=True)
+        rows.append(valid[order])
+        cols.append(bucket.ravel() + offset)
+        offset += int(bucket.max()) + 1
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    B = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, offset))
+    C = sp.triu(B @ B.T, k=1).tocoo()
+    I = np.concatenate([C.row, C.col]).astype(np.int64)
+    J = np.concatenate([C.col, C.row]).astype(np.int64)
+
+    sim = np.empty(len(I), dtype=np.float32)
+    for p0 in range(0, len(I), 1_000_000):
+        i, j = I[p0 : p0 + 1_000_000], J[p0 : p0 + 1_000_000]
+        dots = np.asarray(X_bin[i].multiply(X_bin[j]).sum(axis=1)).ravel()
+        sim[p0 : p0 + len(i)] = dots / (norms[i] * norms[j])
+
+    order = np.lexsort((-sim, I))
+    I, J, sim = I[order], J[order], sim[order]
+    rank = np.arange(len(I)) - np.searchsorted(I, I, side="left")
+    keep = rank < k
+
+    neigh_idx = np.full((n, k), -1, dtype=np.int32)
+    neigh_sim = np.zeros((n, k), dtype=np.float32)
+    neigh_idx[I[keep], rank[keep]] = J[keep]
+    neigh_sim[I[keep], rank[keep]] = sim[keep]
+    return neigh_idx, neigh_sim
+
+
+def build_neighbor_index(X_bin: sp.csr_matrix, norms: np.ndarray, k: int = NEIGHBORS_K, method: str = "auto"):
+    n = X_bin.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int32), np.empty((n, 0), dtype=np.float32)
+
+    if method == "auto":
+        method = "lsh" if n > LSH_MIN_CLIENTS else "exact"
+    if method == "lsh":
+        return _neighbors_lsh(X_bin, norms, k)
+    return _neighbors_exact(X_bin, norms, k)
+
+
+def similar_clients(idx: int, neigh_idx: np.ndarray, neigh_sim: np.ndarray, neighbors_n: int):
+    # índice aproximado (LSH) puede dejar huecos (-1) si no encontró suficientes candidatos
+    nn = neigh_idx[idx, :neighbors_n]
+    keep = nn >= 0
+    return nn[keep], neigh_sim[idx, :neighbors_n][keep]
+
+
+# -----------------------------
+# Modelo
+# -----------------------------
+# Matriz cliente x subrubro en formato disperso (CSR). Las filas son los cliente_key
+# ordenados y las columnas los subrubros ordenados; buscamos posiciones con searchsorted.
+# vcube / vcube_offsets / vendedores / idents guardan el detalle por vendedor: con eso
+# model_slice arma el modelo de un vendedor sin volver a leer ni agrupar las ventas.
+# cli_prod / prod_offsets son el cubo como matriz cliente x producto para rankear productos
+# por vecinos (ver _client_products).
+# months / ped_months / co_months / vped son las partes por mes (ver weighted_model).
+Model = namedtuple(
+    "Model",
+    [
+        "agg_cs",
+        "X_ped",
+        "co",
+        "freq",
+        "X_bin",
+        "norms",
+        "clients",
+        "subrubros",
+        "neigh_idx",
+        "neigh_sim",
+        "cube",
+        "cube_offsets",
+        "cli_prod",
+        "prod_offsets",
+        "articulos",
+        "catalog",
+        "kpis",
+        "vendedores",
+        "vcube",
+        "vcube_offsets",
+        "idents",
+        "months",
+        "ped_months",
+        "co_months",
+        "vped",
+    ],
+)
+
+IDENT_COLS = ["cliente_key", "cuit", "empresa", "cliente", "cliente_id"]
+
+
+def _matrices(cli_codes: np.ndarray, sr_codes: np.ndarray, pedidos: np.ndarray, subrubros: np.ndarray, n_clients: int):
+    # X_ped / X_bin / norms / co / freq a partir de los pares (cliente, subrubro) ya agregados
+    shape = (n_clients, len(subrubros))
+
+    # pedidos por cliente x subrubro (equivalente disperso del pivot con fill_value=0)
+    X_ped = sp.csr_matrix((pedidos.astype(np.float64), (cli_codes, sr_codes)), shape=shape)
+
+    owned = pedidos > 0
+    X_bin = sp.csr_matrix(
+        (np.ones(int(owned.sum()), dtype=np.float32), (cli_codes[owned], sr_codes[owned])),
+        shape=shape,
+    )
+    norms = np.sqrt(np.diff(X_bin.indptr).astype(np.float32))
+    norms[norms == 0] = 1.0
+
+    # co-ocurrencia subrubro x subrubro (dispersa)
+    co = (X_bin.T @ X_bin).tocsr()
+    freq = pd.Series(np.asarray(X_ped.sum(axis=0)).ravel(), index=subrubros).sort_values(ascending=False)
+    return X_ped, X_bin, norms, co, freq
+
+
+# -----------------------------
+# Co-ocurrencia por mes (ventana / decaimiento)
+# -----------------------------
+# Por cada mes guardamos su matriz cliente x subrubro de pedidos y su co-ocurrencia
+# (triángulo superior, clientes que compraron ambos subrubros ese mes), apiladas:
+#   ped_months[m * n_clientes + c, s]   co_months[m * n_subrubros + i, j]
+# Un decaimiento es solo una suma pesada de esos bloques (weighted_model; una ventana suma
+# los pedidos de sus meses y cuenta clientes, como la co-ocurrencia sin ajuste);
+# un mes nuevo agrega su bloque y el resto se reutiliza (ver month_parts en artifacts).
+def _month_matrices(mes, cli, sr, ped, n_months: int, n_clients: int, n_sr: int, cached: dict = None):
+    # cached: {mes: co triangular ya calculada (en códigos globales)}; esos meses no se recalculan
+    cached = cached or {}
+    rows = mes.astype(np.int64) * n_clients + cli
+    ped_months = sp.csr_matrix((ped.astype(np.float32), (rows, sr)), shape=(n_months * n_clients, n_sr))
+    owned = ped > 0
+    X = sp.csr_matrix(
+        (np.ones(int(owned.sum()), dtype=np.float32), (rows[owned], sr[owned])),
+        shape=(n_months * n_clients, n_sr),
+    )
+    blocks = []
+    for m in range(n_months):
+        if m in cached:
+            blocks.append(cached[m])
+            continue
+        Xm = X[m * n_clients : (m + 1) * n_clients]
+        blocks.append(sp.triu(Xm.T @ Xm).tocsr())
+    co_months = sp.vstack(blocks, format="csr") if blocks else sp.csr_matrix((0, n_sr), dtype=np.float32)
+    return ped_months, co_months
+
+
+def month_block(co_months: sp.csr_matrix, m: int, n_sr: int) -> sp.csr_matrix:
+    return co_months[m * n_sr : (m + 1) * n_sr]
+
+
+def month_weights(months: np.ndarray, ventana: int = None, vida_media: float = None) -> np.ndarray:
+    # antigüedad en meses contra el último mes cargado (AAAAMM); si hay períodos que no
+    # son AAAAMM, se usa el orden de los meses
+    ok = all(len(m) == 6 and m.isdigit() for m in months)
+    num = np.array([int(m[:4]) * 12 + int(m[4:]) for m in months]) if ok else np.arange(len(months))
+    age = (num.max() - num) if len(num) else num
+    w = np.ones(len(months))
+    if ventana:
+        w[age >= ventana] = 0.0
+    if vida_media:
+        w *= 0.5 ** (age / vida_media)
+    return w
+
+
+@timed("weighted_model")
+def weighted_model(model: Model, ventana: int = None, vida_media: float = None) -> Model:
+    # co / freq / X_ped con solo los últimos `ventana` meses y/o pesos 0.5 ** (antigüedad / vida_media).
+    # Lo que el cliente ya compró (X_bin) y sus vecinos siguen mirando todo el período cargado.
+    # Canastas: con solo ventana, clientes (como sin ajuste: una ventana que cubre todos los
+    # meses da la misma co); con decaimiento, clientes-mes pesados (el peso es por mes)
+    w = month_weights(model.months, ventana, vida_media)
+    n_clients, n_sr = model.X_bin.shape
+    X_ped = (sp.kron(w[None, :], sp.identity(n_clients), format="csr") @ model.ped_months).tocsr()
+    freq = pd.Series(np.asarray(X_ped.sum(axis=0)).ravel(), index=model.subrubros).sort_values(ascending=False)
+    if not vida_media:
+        X_win = (X_ped > 0).astype(np.float32).tocsr()
+        co = (X_win.T @ X_win).tocsr()
+        kpis = {**model.kpis, "canastas": float(np.count_nonzero(np.diff(X_win.indptr)))}
+        return model._replace(X_ped=X_ped, co=co, freq=freq, kpis=kpis)
+    U = (sp.kron(w[None, :], sp.identity(n_sr), format="csr") @ model.co_months).tocsr()
+    co = (U + U.T - sp.diags(U.diagonal())).tocsr()
+    # co ahora cuenta clientes-mes: el total de canastas (para lift / PMI) también
+    active = np.diff((model.ped_months > 0).tocsr().indptr).reshape(len(w), n_clients) > 0
+    kpis = {**model.kpis, "canastas": float(w @ active.sum(axis=1))}
+    return model._replace(X_ped=X_ped, co=co, freq=freq, kpis=kpis)
+
+
+# -----------------------------
+# Métricas de asociación
+# -----------------------------
+# co cuenta las canastas (clientes; con decaimiento, clientes-mes pesados) que
+# compraron los dos subrubros y su diagonal, las que compraron cada uno (soporte s). Con
+# N = canastas totales, sobre los mismos no-ceros de co y en una sola pasada:
+#   lift       co_ij * N / (s_i * s_j)     > 1: se compran juntos más de lo esperable
+#   jaccard    co_ij / (s_i + s_j - co_ij)
+#   confianza  co_ij / s_i                 P(compra j | compra i): la fila i es lo que ya compra
+#   pmi        max(log(lift), 0)           PMI positivo: los pares que no aparecen quedan en 0
+# "co" son los conteos de siempre, que favorecen a los subrubros más vendidos. Las métricas
+# derivadas no tienen diagonal (un subrubro no se recomienda a sí mismo) y, con top_k, de
+# cada fila se guardan solo los top_k valores más altos.
+ASSOC_METRICS = ["co", "lift", "jaccard", "confianza", "pmi"]
+
+
+def basket_count(model: Model) -> float:
+    # N de lift / PMI: clientes con compras, o lo que dejó weighted_model
+    n = model.kpis.get("canastas")
+    return float(n) if n is not None else float(np.count_nonzero(np.diff(model.X_bin.indptr)))
+
+
+def _keep_top_k(i: np.ndarray, j: np.ndarray, v: np.ndarray, n_rows: int, top_k: int):
+    # por fila, los top_k valores más altos (a igual valor, el de menor columna)
+    order = np.lexsort((j, -v, i))
+    i, j, v = i[order], j[order], v[order]
+    rank = np.arange(len(i)) - np.searchsorted(i, np.arange(n_rows))[i]
+    keep = rank < top_k
+    return i[keep], j[keep], v[keep]
+
+
+def association_matrices(co: sp.csr_matrix, n_baskets: float, metrics=ASSOC_METRICS, top_k: int = None) -> dict:
+    # {métrica: matriz subrubro x subrubro (CSR, float32)}
+    n_sr = co.shape[0]
+    coo = co.tocoo()
+    s = coo.diagonal().astype(np.float64)
+    keep = (coo.row != coo.col) & (coo.data > 0)
+    i, j, c = coo.row[keep], coo.col[keep], coo.data[keep].astype(np.float64)
+    si, sj = s[i], s[j]
+    lift = c * n_baskets / (si * sj) if {"lift", "pmi"} & set(metrics) else None
+
+    out = {}
+    for m in metrics:
+        if m == "co" and not top_k:
+            out[m] = co
+            continue
+        if m == "co":
+            v = c
+        elif m == "lift":
+            v = lift
+        elif m == "jaccard":
+            v = c / (si + sj - c)
+        elif m == "confianza":
+            v = c / si
+        elif m == "pmi":
+            v = np.maximum(np.log(lift), 0.0)
+        else:
+            raise ValueError(f"Métrica de asociación desconocida: {m}")
+        r, q = i, j
+        if top_k:
+            r, q, v = _keep_top_k(r, q, v, n_sr, top_k)
+        out[m] = sp.csr_matrix((v.astype(np.float32), (r, q)), shape=co.shape)
+    return out
+
+
+@timed("association_model")
+def association_model(model: Model, asociacion: str = "co", top_k: int = None) -> Model:
+    # el mismo modelo rankeando con otra métrica: todo lo que puntúa con model.co
+    # (recomendaciones, subrubros relacionados, batch) pasa a usarla
+    if asociacion == "co" and not top_k:
+        return model
+    co = association_matrices(model.co, basket_count(model), [asociacion], top_k)[asociacion]
+    return model._replace(co=co)
+
+
+def as_counts(values) -> np.ndarray:
+    # enteros si lo son (clientes, o clientes en una ventana); con decaimiento quedan decimales
+    v = np.asarray(values, dtype=np.float64)
+    return v.astype(np.int64) if np.all(v == np.round(v)) else v.round(2)
+
+
+# -----------------------------
+# Armado del modelo
+# -----------------------------
+# build_model = _model_parts (lo que se suma mes a mes: cliente x subrubro, cubos, pedidos por
+# mes, identidades) + _assemble (lo que sale de esas partes: índices, matrices, vecinos,
+# catálogo). Un mes nuevo (extend_model) solo calcula las partes de sus filas y las suma a
+# las del modelo anterior; la co-ocurrencia de los meses viejos no se vuelve a calcular.
+VCUBE_KEYS = ["vendedor", "subrubro", "cliente_key", "articulo_codigo", "articulo_descripcion"]
+
+
+def _positions(keys: np.ndarray, col: pd.Series) -> np.ndarray:
+    # posición de cada valor de `col` en `keys` (ordenado); con category se busca una vez
+    # por categoría y se indexa con los códigos (no se compara texto fila por fila)
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        cats = np.asarray(col.cat.categories, dtype=object)
+        return np.searchsorted(keys, cats).astype(np.int32)[col.cat.codes.to_numpy()]
+    return np.searchsorted(keys, col.to_numpy()).astype(np.int32)
+
+
+def _model_parts(df: pd.DataFrame) -> dict:
+    # el frame llega compacto (category + medidas en float32) y no se copia: astype sin copy
+    # arma un frame nuevo que comparte las columnas de texto y solo suma en float64 las medidas
+    df = df.astype({c: np.float64 for c in ("importe", "unidades", "cant_pedidos")}, copy=False)
+    # meses como códigos enteros sobre los AAAAMM ordenados (se normalizan las categorías de
+    # anio_mes, no las filas): max / groupby por mes trabajan con enteros, no con texto
+    periods = df["anio_mes"].astype("category").cat
+    months, month_of_cat = np.unique(
+        np.asarray([normalize_period(p) for p in periods.categories], dtype=object), return_inverse=True
+    )
+    mes = month_of_cat[periods.codes.to_numpy()]
+    used = np.bincount(mes, minlength=len(months)) > 0  # categorías sin filas (frame filtrado)
+    months = np.asarray(months[used], dtype=object)
+    df["mes"] = (np.cumsum(used) - 1)[mes].astype(np.int32)
+
+    # agregación cliente_key x subrubro (UNIFICADO)
+    agg_cs = df.groupby(["cliente_key", "subrubro"], as_index=False, observed=True).agg(
+        cant_pedidos=("cant_pedidos", "sum"),
+        unidades=("unidades", "sum"),
+        importe=("importe", "sum"),
+    )
+    # cubo vendedor x subrubro x cliente x artículo; ultimo_mes como código de mes
+    vcube = df.groupby(VCUBE_KEYS, as_index=False, observed=True).agg(
+        importe=("importe", "sum"),
+        unidades=("unidades", "sum"),
+        cant_pedidos=("cant_pedidos", "sum"),
+        ultimo_mes=("mes", "max"),
+    )
+    # pedidos vendedor x mes x cliente x subrubro: de acá salen las partes por mes
+    # (globales sumando vendedores, o las de un vendedor en model_slice)
+    vped = df.groupby(["vendedor", "mes", "cliente_key", "subrubro"], as_index=False, observed=True).agg(
+        cant_pedidos=("cant_pedidos", "sum")
+    )
+    return {
+        "agg_cs": agg_cs,
+        "vcube": vcube,
+        "vped": vped,
+        # identidades por vendedor en orden de aparición (catálogo del modelo y de cada slice)
+        "idents": df[["vendedor"] + IDENT_COLS].drop_duplicates(),
+        "months": months,
+        "filas": len(df),
+        "filas_vendedor": {str(k): int(n) for k, n in df["vendedor"].value_counts(sort=False).items() if n},
+    }
+
+
+def _client_products(cube: pd.DataFrame, n_clients: int, n_sr: int):
+    # el cubo como matriz cliente x producto (subrubro, artículo): cada celda guarda la fila
+    # del cubo (de ahí salen las medidas). Las columnas van por subrubro y, dentro, por
+    # artículo: prod_offsets[j]:prod_offsets[j+1] son los productos del subrubro j. Rankear
+    # productos es tomar las filas de los vecinos (cli_prod[vecinos]) y sumar por columna.
+    sr = cube["sr"].to_numpy()
+    key = sr.astype(np.int64) * (int(cube["art"].max()) + 1 if len(cube) else 1) + cube["art"].to_numpy()
+    prod, uniques = pd.factorize(key, sort=True)
+    prod_offsets = np.searchsorted(sr[np.unique(prod, return_index=True)[1]], np.arange(n_sr + 1))
+    cli = cube["cli"].to_numpy()
+    order = np.lexsort((prod, cli))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(cli, minlength=n_clients))])
+    cli_prod = sp.csr_matrix(
+        (order.astype(np.int64), prod[order].astype(np.int32), indptr), shape=(n_clients, len(uniques))
+    )
+    return cli_prod, prod_offsets
+
+
+def _assemble(parts: dict, month_co: dict = None) -> Model:
+    agg_cs, vcube, vped, months = parts["agg_cs"], parts["vcube"], parts["vped"], parts["months"]
+
+    cli_codes, clients = pd.factorize(agg_cs["cliente_key"], sort=True)
+    sr_codes, subrubros = pd.factorize(agg_cs["subrubro"], sort=True)
+    clients = np.asarray(clients, dtype=object)
+    subrubros = np.asarray(subrubros, dtype=object)
+
+    X_ped, X_bin, norms, co, freq = _matrices(
+        cli_codes, sr_codes, agg_cs["cant_pedidos"].to_numpy(), subrubros, len(clients)
+    )
+
+    # vecinos precalculados: una sola pasada por todos los clientes
+    neigh_idx, neigh_sim = build_neighbor_index(X_bin, norms)
+
+    # cubo ordenado por vendedor: vcube_offsets[v]:vcube_offsets[v+1] es el tramo del
+    # vendedor v (para model_slice). ultimo_mes: category ordenada sobre months (códigos
+    # enteros; se ve como AAAAMM)
+    vcube = vcube.assign(
+        ultimo_mes=pd.Categorical.from_codes(vcube["ultimo_mes"].to_numpy(), categories=months, ordered=True)
+    )
+    articulos = vcube[["articulo_codigo", "articulo_descripcion"]].drop_duplicates()
+    articulos = articulos.sort_values(["articulo_codigo", "articulo_descripcion"]).reset_index(drop=True)
+    vendedores = np.asarray(np.sort(vcube["vendedor"].astype(object).unique()), dtype=object)
+
+    art = vcube.groupby(["articulo_codigo", "articulo_descripcion"], observed=True).ngroup()
+    vcube.insert(0, "art", art.astype(np.int32))
+    vcube.insert(0, "cli", _positions(clients, vcube["cliente_key"]))
+    vcube.insert(0, "sr", _positions(subrubros, vcube["subrubro"]))
+    vcube.insert(0, "vend", _positions(vendedores, vcube["vendedor"]))
+    vcube = vcube.drop(columns=VCUBE_KEYS).sort_values(["vend", "sr", "cli", "art"], ignore_index=True)
+    vcube_offsets = np.searchsorted(vcube["vend"].to_numpy(), np.arange(len(vendedores) + 1))
+
+    # cubo subrubro x cliente x artículo = suma de los vendedores (agrupar enteros, no texto),
+    # ordenado por subrubro: cube_offsets[j]:cube_offsets[j+1] es el tramo del subrubro j
+    # (así rankear productos no recorre todo df). ultimo_mes: max de los códigos enteros
+    cube = vcube.assign(ultimo_mes=vcube["ultimo_mes"].cat.codes)
+    cube = cube.groupby(["sr", "cli", "art"], as_index=False, sort=True).agg(
+        importe=("importe", "sum"),
+        unidades=("unidades", "sum"),
+        cant_pedidos=("cant_pedidos", "sum"),
+        ultimo_mes=("ultimo_mes", "max"),
+    )
+    cube["ultimo_mes"] = pd.Categorical.from_codes(cube["ultimo_mes"].to_numpy(), categories=months, ordered=True)
+    cube_offsets = np.searchsorted(cube["sr"].to_numpy(), np.arange(len(subrubros) + 1))
+    cli_prod, prod_offsets = _client_products(cube, len(clients), len(subrubros))
+
+    vkeys = ["vendedor", "cliente_key", "subrubro"]
+    vped.insert(0, "sr", _positions(subrubros, vped["subrubro"]))
+    vped.insert(0, "cli", _positions(clients, vped["cliente_key"]))
+    vped.insert(0, "mes", vped.pop("mes").astype(np.int32))
+    vped.insert(0, "vend", _positions(vendedores, vped["vendedor"]))
+    vped = vped.drop(columns=vkeys).sort_values(["vend", "mes", "cli", "sr"], ignore_index=True)
+
+    # month_co: {mes: (subrubros, co triangular en esos subrubros)} de meses ya calculados
+    cached = {}
+    for label, (srs, U) in (month_co or {}).items():
+        m = key_index(months, label)
+        if m < 0 or not np.isin(srs, subrubros).all():
+            continue
+        pos = np.searchsorted(subrubros, srs)
+        U = U.tocoo()
+        cached[m] = sp.csr_matrix((U.data, (pos[U.row], pos[U.col])), shape=(len(subrubros), len(subrubros)))
+    g = vped.groupby(["mes", "cli", "sr"], as_index=False, sort=True)["cant_pedidos"].sum()
+    ped_months, co_months = _month_matrices(
+        g["mes"].to_numpy(), g["cli"].to_numpy(), g["sr"].to_numpy(), g["cant_pedidos"].to_numpy(),
+        len(months), len(clients), len(subrubros), cached,
+    )
+
+    idents = parts["idents"]
+    catalog = build_customer_catalog(idents)
+    idents = pd.DataFrame(
+        {
+            "vend": _positions(vendedores, idents["vendedor"]),
+            **{c: idents[c].to_numpy(dtype=object) for c in IDENT_COLS},
+        }
+    )
+
+    kpis = {
+        "filas": parts["filas"],
+        "clientes": len(clients),
+        "subrubros": len(subrubros),
+        "empresas": int(idents["empresa"].nunique()),
+        "filas_vendedor": parts["filas_vendedor"],
+    }
+
+    return Model(
+        agg_cs=agg_cs,
+        X_ped=X_ped,
+        co=co,
+        freq=freq,
+        X_bin=X_bin,
+        norms=norms,
+        clients=clients,
+        subrubros=subrubros,
+        neigh_idx=neigh_idx,
+        neigh_sim=neigh_sim,
+        cube=cube,
+        cube_offsets=cube_offsets,
+        cli_prod=cli_prod,
+        prod_offsets=prod_offsets,
+        articulos=articulos,
+        catalog=catalog,
+        kpis=kpis,
+        vendedores=vendedores,
+        vcube=vcube,
+        vcube_offsets=vcube_offsets,
+        idents=idents,
+        months=months,
+        ped_months=ped_months,
+        co_months=co_months,
+        vped=vped,
+    )
+
+
+@timed("build_model", filas=lambda model: model.kpis["filas"])
+def build_model(df: pd.DataFrame, month_co: dict = None) -> Model:
+    return _assemble(_model_parts(df), month_co=month_co)
+
+
+def _model_parts_of(model: Model) -> dict:
+    # las partes de un modelo ya armado, otra vez con claves (category sobre las claves del
+    # modelo: se decodifican códigos, no se compara texto)
+    def cat(codes, keys):
+        return pd.Categorical.from_codes(np.asarray(codes), categories=keys)
+
+    art = model.vcube["art"].to_numpy()
+    arts = {}
+    for c in ("articulo_codigo", "articulo_descripcion"):
+        keys, inv = np.unique(model.articulos[c].to_numpy(dtype=object), return_inverse=True)
+        arts[c] = cat(inv[art], keys)
+    vcube = pd.DataFrame(
+        {
+            "vendedor": cat(model.vcube["vend"], model.vendedores),
+            "subrubro": cat(model.vcube["sr"], model.subrubros),
+            "cliente_key": cat(model.vcube["cli"], model.clients),
+            **arts,
+            **{c: model.vcube[c].to_numpy() for c in ("importe", "unidades", "cant_pedidos")},
+            "ultimo_mes": model.vcube["ultimo_mes"].cat.codes.to_numpy(),
+        }
+    )
+    vped = pd.DataFrame(
+        {
+            "vendedor": cat(model.vped["vend"], model.vendedores),
+            "mes": model.vped["mes"].to_numpy(),
+            "cliente_key": cat(model.vped["cli"], model.clients),
+            "subrubro": cat(model.vped["sr"], model.subrubros),
+            "cant_pedidos": model.vped["cant_pedidos"].to_numpy(),
+        }
+    )
+    idents = pd.DataFrame(
+        {
+            "vendedor": model.vendedores[model.idents["vend"].to_numpy()],
+            **{c: model.idents[c].to_numpy(dtype=object) for c in IDENT_COLS},
+        }
+    )
+    return {
+        "agg_cs": model.agg_cs,
+        "vcube": vcube,
+        "vped": vped,
+        "idents": idents,
+        "months": np.asarray(model.months, dtype=object),
+        "filas": model.kpis["filas"],
+        "filas_vendedor": model.kpis["filas_vendedor"],
+    }
+
+
+def _concat_keyed(frames: list, keys: list) -> pd.DataFrame:
+    # concatena con las columnas clave como category sobre la unión ordenada de categorías
+    # (mismo dtype en todos los frames: el resultado sigue siendo category)
+    frames = [f.astype({k: "category" for k in keys}) for f in frames]
+    for k in keys:
+        cats = np.unique(np.concatenate([np.asarray(f[k].cat.categories, dtype=object) for f in frames]))
+        frames = [f.assign(**{k: f[k].cat.set_categories(cats)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _merge_parts(a: dict, b: dict) -> dict:
+    # partes de dos juegos de filas distintos (otros meses, u otras empresas en los mismos
+    # meses): se suman cliente x subrubro, los cubos y los pedidos por mes (códigos de mes
+    # llevados a la unión de meses)
+    months = np.asarray(np.union1d(a["months"], b["months"]), dtype=object)
+    recode = [np.searchsorted(months, p["months"]).astype(np.int32) for p in (a, b)]
+
+    agg_cs = _concat_keyed([a["agg_cs"], b["agg_cs"]], ["cliente_key", "subrubro"])
+    agg_cs = agg_cs.groupby(["cliente_key", "subrubro"], as_index=False, observed=True).agg(
+        cant_pedidos=("cant_pedidos", "sum"),
+        unidades=("unidades", "sum"),
+        importe=("importe", "sum"),
+    )
+    vcube = _concat_keyed(
+        [p["vcube"].assign(ultimo_mes=r[p["vcube"]["ultimo_mes"].to_numpy()]) for p, r in zip((a, b), recode)],
+        VCUBE_KEYS,
+    )
+    vcube = vcube.groupby(VCUBE_KEYS, as_index=False, observed=True).agg(
+        importe=("importe", "sum"),
+        unidades=("unidades", "sum"),
+        cant_pedidos=("cant_pedidos", "sum"),
+        ultimo_mes=("ultimo_mes", "max"),
+    )
+    vped = _concat_keyed(
+        [p["vped"].assign(mes=r[p["vped"]["mes"].to_numpy()]) for p, r in zip((a, b), recode)],
+        ["vendedor", "cliente_key", "subrubro"],
+    )
+    if len(np.intersect1d(a["months"], b["months"])):
+        # meses en los dos: el mismo (vendedor, mes, cliente, subrubro) puede venir de ambos
+        vped = vped.groupby(["vendedor", "mes", "cliente_key", "subrubro"], as_index=False, observed=True).agg(
+            cant_pedidos=("cant_pedidos", "sum")
+        )
+    idents = pd.concat(
+        [p["idents"].astype({c: object for c in ["vendedor"] + IDENT_COLS}) for p in (a, b)], ignore_index=True
+    ).drop_duplicates()
+    filas_vendedor = dict(a["filas_vendedor"])
+    for k, n in b["filas_vendedor"].items():
+        filas_vendedor[k] = filas_vendedor.get(k, 0) + n
+    return {
+        "agg_cs": agg_cs,
+        "vcube": vcube,
+        "vped": vped,
+        "idents": idents,
+        "months": months,
+        "filas": a["filas"] + b["filas"],
+        "filas_vendedor": filas_vendedor,
+    }
+
+
+@timed("extend_model", filas=lambda model: model.kpis["filas"])
+def extend_model(model: Model, df: pd.DataFrame) -> Model:
+    # `model` + ventas que no tiene (`df`: meses nuevos, u otra empresa en meses que ya
+    # tiene; nunca filas que ya estén en el modelo). Las partes viejas salen del modelo (no
+    # se relee su historia) y la co-ocurrencia de los meses que df no toca se reutiliza (la
+    # de un mes al que se suma otra empresa se recalcula: un cliente unificado por CUIT junta
+    # en una sola canasta lo que compró en las dos); lo global (matrices, vecinos, cubo por
+    # subrubro, catálogo) se vuelve a derivar
+    new = _model_parts(df)
+    parts = _merge_parts(_model_parts_of(model), new)
+    n_sr, touched = len(model.subrubros), set(new["months"])
+    month_co = {
+        mes: (model.subrubros, month_block(model.co_months, m, n_sr))
+        for m, mes in enumerate(model.months)
+        if mes not in touched
+    }
+    return _assemble(parts, month_co=month_co)
+
+
+@timed("model_slice", filas=lambda model: model.kpis["filas"])
+def model_slice(model: Model, vendedor: str):
+    # Modelo de un solo vendedor a partir del modelo global: filas de vcube del vendedor,
+    # reindexadas a clientes / subrubros / artículos locales (subconjuntos ordenados de los
+    # globales). Solo se recalculan las matrices chicas del vendedor y sus vecinos.
+    v = key_index(model.vendedores, vendedor)
+    if v < 0:
+        return None
+    vc = model.vcube.iloc[model.vcube_offsets[v] : model.vcube_offsets[v + 1]]
+    cli_g, cli = np.unique(vc["cli"].to_numpy(), return_inverse=True)
+    sr_g, sr = np.unique(vc["sr"].to_numpy(), return_inverse=True)
+    art_g, art = np.unique(vc["art"].to_numpy(), return_inverse=True)
+    clients = model.clients[cli_g]
+    subrubros = model.subrubros[sr_g]
+
+    # vc ya viene ordenado por (sr, cli, art): los códigos locales mantienen ese orden
+    cube = pd.DataFrame(
+        {
+            "sr": sr.astype(np.int32),
+            "cli": cli.astype(np.int32),
+            "art": art.astype(np.int32),
+            **{c: vc[c].to_numpy() for c in ("importe", "unidades", "cant_pedidos")},
+            "ultimo_mes": vc["ultimo_mes"].array,  # category sobre los meses, como en el global
+        }
+    )
+    cube_offsets = np.searchsorted(cube["sr"].to_numpy(), np.arange(len(subrubros) + 1))
+    cli_prod, prod_offsets = _client_products(cube, len(clients), len(subrubros))
+
+    pairs = cube.groupby(["cli", "sr"], as_index=False, sort=True).agg(
+        cant_pedidos=("cant_pedidos", "sum"),
+        unidades=("unidades", "sum"),
+        importe=("importe", "sum"),
+    )
+    agg_cs = pd.DataFrame(
+        {
+            "cliente_key": clients[pairs["cli"].to_numpy()],
+            "subrubro": subrubros[pairs["sr"].to_numpy()],
+            **{c: pairs[c].to_numpy() for c in ("cant_pedidos", "unidades", "importe")},
+        }
+    )
+    X_ped, X_bin, norms, co, freq = _matrices(
+        pairs["cli"].to_numpy(), pairs["sr"].to_numpy(), pairs["cant_pedidos"].to_numpy(), subrubros, len(clients)
+    )
+    neigh_idx, neigh_sim = build_neighbor_index(X_bin, norms)
+
+    lo, hi = np.searchsorted(model.vped["vend"].to_numpy(), [v, v + 1])
+    vp = model.vped.iloc[lo:hi]
+    mes_g, mes = np.unique(vp["mes"].to_numpy(), return_inverse=True)
+    vp = pd.DataFrame(
+        {
+            "vend": np.zeros(len(vp), dtype=np.int32),
+            "mes": mes.astype(np.int32),
+            "cli": np.searchsorted(cli_g, vp["cli"].to_numpy()).astype(np.int32),
+            "sr": np.searchsorted(sr_g, vp["sr"].to_numpy()).astype(np.int32),
+            "cant_pedidos": vp["cant_pedidos"].to_numpy(),
+        }
+    )
+    ped_months, co_months = _month_matrices(
+        vp["mes"].to_numpy(), vp["cli"].to_numpy(), vp["sr"].to_numpy(), vp["cant_pedidos"].to_numpy(),
+        len(mes_g), len(clients), len(subrubros),
+    )
+
+    idents = model.idents[model.idents["vend"].to_numpy() == v]
+    n_filas = int(model.kpis["filas_vendedor"].get(str(vendedor), 0))
+    kpis = {
+        "filas": n_filas,
+        "clientes": len(clients),
+        "subrubros": len(subrubros),
+        "empresas": int(idents["empresa"].nunique()),
+        "filas_vendedor": {str(vendedor): n_filas},
+    }
+
+    return Model(
+        agg_cs=agg_cs,
+        X_ped=X_ped,
+        co=co,
+        freq=freq,
+        X_bin=X_bin,
+        norms=norms,
+        clients=clients,
+        subrubros=subrubros,
+        neigh_idx=neigh_idx,
+        neigh_sim=neigh_sim,
+        cube=cube,
+        cube_offsets=cube_offsets,
+        cli_prod=cli_prod,
+        prod_offsets=prod_offsets,
+        articulos=model.articulos.iloc[art_g].reset_index(drop=True),
+        catalog=build_customer_catalog(idents),
+        kpis=kpis,
+        vendedores=np.asarray([vendedor], dtype=object),
+        vcube=cube.assign(vend=np.int32(0))[["vend"] + list(cube.columns)],
+        vcube_offsets=np.array([0, len(cube)]),
+        idents=idents.assign(vend=np.int32(0)).reset_index(drop=True),
+        months=model.months[mes_g],
+        ped_months=ped_months,
+        co_months=co_months,
+        vped=vp,
+    )
+
+
+def metric_col_name(rank_metric: str) -> str:
+    return {"importe": "importe", "unidades": "unidades", "pedidos": "cant_pedidos"}[rank_metric]
+
+
+def key_index(keys: np.ndarray, key) -> int:
+    # keys viene ordenado (factorize sort=True): -1 si no está
+    pos = int(np.searchsorted(keys, key))
+    if pos < len(keys) and keys[pos] == key:
+        return pos
+    return -1
+
+
+def freq_order(freq: pd.Series, subrubros: np.ndarray) -> np.ndarray:
+    # posiciones de los subrubros por freq_global desc; a igual freq, en orden de subrubro
+    f = freq.reindex(subrubros).fillna(0).to_numpy()
+    return np.lexsort((np.arange(len(subrubros)), -f))
+
+
+def recommend_batch(X_rows: sp.csr_matrix, co: sp.csr_matrix, by_freq: np.ndarray, topk=10):
+    # X_rows: filas de X_bin (uno o varios clientes). Devuelve arrays planos
+    # (fila, puesto, subrubro, score) con el mismo orden que recommend_for_client:
+    # score desc, después freq_global desc, después orden de subrubro.
+    n, n_sr = X_rows.shape
+    k = min(topk, n_sr)
+    if n == 0 or k <= 0:
+        return np.empty(0, np.int32), np.empty(0, np.int16), np.empty(0, np.int32), np.empty(0)
+
+    # columnas reordenadas según by_freq: a igual score, gana la de menor posición
+    S = np.asarray((X_rows @ co).todense())[:, by_freq].astype(np.float64)
+    owned = X_rows.toarray()[:, by_freq] > 0
+    S[owned] = -np.inf
+
+    # top-k con argpartition; los empates en el k-ésimo valor se resuelven por posición
+    kth = np.take_along_axis(S, np.argpartition(-S, k - 1, axis=1)[:, k - 1 : k], axis=1)
+    above = S > kth
+    ties = (S == kth) & (np.cumsum(S == kth, axis=1) <= k - above.sum(axis=1, keepdims=True))
+    cols = np.nonzero(above | ties)[1].reshape(n, k)  # k por fila, en orden de posición
+    vals = np.take_along_axis(S, cols, axis=1)
+    order = np.argsort(-vals, axis=1, kind="stable")
+    top = np.take_along_axis(cols, order, axis=1)
+    score = np.take_along_axis(vals, order, axis=1)
+
+    keep = np.isfinite(score)
+    score[~owned.any(axis=1)] = np.nan  # sin compras: ranking por freq_global, sin score
+    rows = np.broadcast_to(np.arange(n)[:, None], top.shape)
+    return (
+        rows[keep].astype(np.int32),
+        np.broadcast_to(np.arange(k), top.shape)[keep].astype(np.int16),
+        by_freq[top[keep]].astype(np.int32),
+        score[keep],
+    )
+
+
+@timed("recommend_for_client", filas=len)
+def recommend_for_client(
+    cliente_key: str,
+    X_bin: sp.csr_matrix,
+    co: sp.csr_matrix,
+    freq: pd.Series,
+    clients: np.ndarray,
+    subrubros: np.ndarray,
+    topk=10,
+):
+    idx = key_index(clients, cliente_key)
+    if idx < 0:
+        return pd.DataFrame(columns=["subrubro", "score_cooc", "freq_global"])
+
+    owned = X_bin[idx]
+    if owned.nnz == 0:
+        rec = freq.head(topk).reset_index()
+        rec.columns = ["subrubro", "freq_global"]
+        rec["score_cooc"] = np.nan
+        return rec[["subrubro", "score_cooc", "freq_global"]]
+
+    # score de cada subrubro j = suma de co[i, j] sobre los subrubros i que ya compra (owned @ co)
+    _rows, _rank, sr, score = recommend_batch(owned, co, freq_order(freq, subrubros), topk)
+    return pd.DataFrame(
+        {
+            "subrubro": subrubros[sr],
+            "score_cooc": score,
+            "freq_global": freq.reindex(subrubros[sr]).fillna(0).values,
+        }
+    )
+
+
+def related_subrubros(subrubro: str, co: sp.csr_matrix, freq: pd.Series, subrubros: np.ndarray, topk=10):
+    j = key_index(subrubros, subrubro)
+    if j < 0:
+        return pd.DataFrame(columns=["subrubro", "score_similitud", "freq_global"])
+
+    row = co.getrow(j)
+    scores = pd.Series(0.0, index=subrubros)
+    scores.iloc[row.indices] = row.data
+    scores = scores.drop(index=subrubro).sort_values(ascending=False).head(topk)
+    return pd.DataFrame(
+        {
+            "subrubro": scores.index,
+            "score_similitud": as_counts(scores.values),
+            "freq_global": as_counts(freq.reindex(scores.index).fillna(0).values),
+        }
+    )
+
+
+def subrubro_slice(subrubro: str, cube: pd.DataFrame, cube_offsets: np.ndarray, subrubros: np.ndarray) -> pd.DataFrame:
+    j = key_index(subrubros, subrubro)
+    if j < 0:
+        return cube.iloc[0:0]
+    return cube.iloc[cube_offsets[j] : cube_offsets[j + 1]]
+
+
+def client_neighbors(selected_cliente_key: str, clients: np.ndarray, neigh_idx, neigh_sim, neighbors_n: int = 50):
+    # (idx, vecinos, similitudes) del cliente: se calcula una vez y sirve para todos los
+    # subrubros que se rankeen después. idx = -1 si el cliente no está en el modelo
+    idx = key_index(clients, selected_cliente_key)
+    if idx < 0:
+        return idx, np.empty(0, dtype=neigh_idx.dtype), np.empty(0, dtype=neigh_sim.dtype)
+    return (idx, *similar_clients(idx, neigh_idx, neigh_sim, neighbors_n))
+
+
+def _rank_products(
+    idx: int,
+    top_idx: np.ndarray,
+    top_sim: np.ndarray,
+    js: list,
+    rank_metric: str,
+    topn: int,
+    cube: pd.DataFrame,
+    cli_prod: sp.csr_matrix,
+    prod_offsets: np.ndarray,
+    articulos: pd.DataFrame,
+    exclude_already_bought: bool,
+) -> dict:
+    # {j: ranking} de los subrubros (posiciones) js: las filas de los vecinos en cli_prod
+    # (indexar el CSR, sin recorrer el cubo), sumas por producto con bincount y un DataFrame
+    # solo con las topn filas de cada ranking
+    R = cli_prod[top_idx]
+    prod, rows = R.indices, R.data
+    w = np.repeat(top_sim, np.diff(R.indptr))
+    keep = np.isin(np.searchsorted(prod_offsets, prod, side="right") - 1, js)
+    prod, rows, w = prod[keep], rows[keep], w[keep]
+
+    # columnas que compró algún vecino, ordenadas: por subrubro y dentro por artículo
+    cols, inv = np.unique(prod, return_inverse=True)
+    n = len(cols)
+    cube_art = cube["art"].to_numpy()
+    art = np.empty(n, dtype=np.int64)
+    art[inv] = cube_art[rows]
+
+    def total(values):
+        return np.bincount(inv, weights=values, minlength=n).astype(np.float64, copy=False)  # vacío: int
+
+    score = total(cube[metric_col_name(rank_metric)].to_numpy()[rows] * w)
+    sums = {c: total(cube[c].to_numpy()[rows]) for c in ("importe", "unidades", "cant_pedidos")}
+    vecinos = np.bincount(inv, minlength=n)
+    ultimo = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(ultimo, inv, cube["ultimo_mes"].cat.codes.to_numpy()[rows])
+    bounds = np.searchsorted(cols, prod_offsets)
+
+    own = cli_prod[idx]
+    own_prod, own_arts = own.indices, cube_art[own.data]
+    codes = articulos["articulo_codigo"].to_numpy()
+
+    out = {}
+    for j in js:
+        lo, hi = bounds[j], bounds[j + 1]
+        # score desc con el mismo orden de empates que sort_values sobre el ranking entero
+        order = lo + pd.Series(score[lo:hi]).sort_values(ascending=False).index.to_numpy()
+        pos = np.arange(len(order))
+        if exclude_already_bought:
+            mine = (own_prod >= prod_offsets[j]) & (own_prod < prod_offsets[j + 1])
+            ok = ~np.isin(codes[art[order]], codes[own_arts[mine]])
+            order, pos = order[ok], pos[ok]
+        out[j] = _ranking_frame(
+            articulos, art[order[:topn]], score[order[:topn]], {c: v[order[:topn]] for c, v in sums.items()},
+            vecinos[order[:topn]], ultimo[order[:topn]], cube["ultimo_mes"].dtype, pos[:topn],
+        )
+    return out
+
+
+def _ranking_frame(articulos, art, score, sums, vecinos, ultimo, mes_dtype, index) -> pd.DataFrame:
+    # index: puesto en el ranking antes de sacar lo ya comprado
+    return pd.DataFrame(
+        {
+            **{c: articulos[c].to_numpy()[art] for c in articulos.columns},
+            "score": score,
+            "importe": sums["importe"],
+            "unidades": sums["unidades"],
+            "pedidos": sums["cant_pedidos"],
+            "vecinos": vecinos,
+            "ultimo_mes": pd.Categorical.from_codes(ultimo, dtype=mes_dtype),
+        },
+        index=index,
+    )
+
+
+def _empty_ranking(articulos: pd.DataFrame, cube: pd.DataFrame) -> pd.DataFrame:
+    # mismas columnas que un ranking, sin filas (subrubro que no está en el modelo)
+    empty = np.empty(0, dtype=np.int64)
+    sums = {c: np.empty(0) for c in ("importe", "unidades", "cant_pedidos")}
+    return _ranking_frame(articulos, empty, np.empty(0), sums, empty, empty, cube["ultimo_mes"].dtype, empty)
+
+
+@timed("top_products_by_subrubro", filas=len)
+def top_products_by_subrubro(
+    neighbors,
+    subrubros_sel,
+    rank_metric: str,
+    topn: int,
+    cube: pd.DataFrame,
+    cli_prod: sp.csr_matrix,
+    prod_offsets: np.ndarray,
+    articulos: pd.DataFrame,
+    subrubros: np.ndarray,
+    exclude_already_bought: bool = True,
+) -> dict:
+    # {subrubro: ranking} para varios subrubros con los vecinos ya buscados (client_neighbors):
+    # una sola pasada por las filas de los vecinos en cli_prod. Cada ranking es igual al de
+    # top_products_similar_clients para ese subrubro.
+    idx, top_idx, top_sim = neighbors
+    if idx < 0:
+        return {s: pd.DataFrame() for s in subrubros_sel}
+    js = {s: key_index(subrubros, s) for s in subrubros_sel}
+    found = sorted({j for j in js.values() if j >= 0})
+    ranked = _rank_products(
+        idx, top_idx, top_sim, found, rank_metric, topn, cube, cli_prod, prod_offsets, articulos,
+        exclude_already_bought,
+    )
+    return {s: ranked[j] if j >= 0 else _empty_ranking(articulos, cube) for s, j in js.items()}
+
+
+def top_products_similar_clients(
+    selected_cliente_key: str,
+    subrubro: str,
+    rank_metric: str,
+    topn: int,
+    cube: pd.DataFrame,
+    cli_prod: sp.csr_matrix,
+    prod_offsets: np.ndarray,
+    articulos: pd.DataFrame,
+    clients: np.ndarray,
+    subrubros: np.ndarray,
+    neigh_idx: np.ndarray,
+    neigh_sim: np.ndarray,
+    neighbors_n: int = 50,
+    exclude_already_bought: bool = True,
+):
+    # un solo subrubro: sus columnas en las filas de los vecinos; para varios del mismo cliente
+    # conviene client_neighbors + top_products_by_subrubro (vecinos una vez, una sola pasada)
+    idx = key_index(clients, selected_cliente_key)
+    if idx < 0:
+        return pd.DataFrame()
+    j = key_index(subrubros, subrubro)
+    if j < 0:
+        return _empty_ranking(articulos, cube)
+    top_idx, top_sim = similar_clients(idx, neigh_idx, neigh_sim, neighbors_n)
+    ranked = _rank_products(
+        idx, top_idx, top_sim, [j], rank_metric, topn, cube, cli_prod, prod_offsets, articulos,
+        exclude_already_bought,
+    )
+    return ranked[j]
+
+
+def top_clients_for_subrubro(
+    subrubro: str,
+    cube: pd.DataFrame,
+    cube_offsets: np.ndarray,
+    clients: np.ndarray,
+    subrubros: np.ndarray,
+    topn: int = 25,
+) -> pd.DataFrame:
+    sl = subrubro_slice(subrubro, cube, cube_offsets, subrubros)
+    g = (
+        sl.groupby("cli", as_index=False)
+        .agg(importe=("importe", "sum"), unidades=("unidades", "sum"), pedidos=("cant_pedidos", "sum"))
+        .sort_values("importe", ascending=False)
+        .head(topn)
+    )
+    g.insert(0, "cliente_key", clients[g["cli"].to_numpy()])
+    return g.drop(columns="cli")
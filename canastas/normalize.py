@@ -0,0 +1,152 @@
+# canastas/normalize.py — Normalización de archivos de ventas (Cromosol / BBA) a columnas estándar
+#
+# Las columnas de texto de un export ERP tienen pocos valores distintos comparado con la
+# cantidad de filas (clientes, subrubros, artículos, períodos). Por eso cada limpieza se
+# hace sobre los valores únicos (pd.factorize) y se vuelve a expandir por código.
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from canastas.timing import timed
+
+REQUIRED = {
+    "cliente": ["cliente", "razonsocial", "razon_social", "razon", "cliente_nombre"],
+    "cliente_id": ["cliente_id", "cliente_codigo", "codigo_cliente", "id_cliente", "nro_cliente", "numero_cliente"],
+    "cuit": ["cuit", "cuit_cliente", "tax_id", "cuitcuil", "cuil"],
+    "subrubro": ["subrubro", "articulo_sub_rubro", "articulo_subrubro", "sub_rubro", "subrubros"],
+    "importe": ["importe", "monto", "total", "neto", "importe_neto"],
+    "unidades": ["unidades", "unidad", "qty", "cantidad"],
+    "cant_pedidos": ["cant_pedidos", "cantidad_pedidos", "cant_pedido", "pedidos", "cantidad_pedidos_distintos"],
+    "anio_mes": ["anio_mes", "año_mes", "periodo", "mes", "year_month", "anio_mes_norm"],
+    "articulo_codigo": ["articulo_codigo", "articulo_cod", "codigo_articulo", "sku", "articulo", "codigo"],
+    "articulo_descripcion": ["articulo_descripcion", "descripcion", "articulo_desc", "producto", "desc"],
+    # NUEVO: vendedor
+    "vendedor": ["vendedor", "cod_vendedor", "vendedor_id", "vendedor_nombre", "sales_rep", "representante"],
+}
+
+_RE_NON_NUMERIC = re.compile(r"[^\d\.\-]")
+_RE_NON_DIGIT = re.compile(r"\D")
+_RE_SPACES = re.compile(r"\s+")
+_RE_PERIOD = re.compile(r"^(\d{4})-(\d{1,2})$")
+
+
+def pick_col(df_cols, candidates):
+    for c in candidates:
+        if c in df_cols:
+            return c
+    return None
+
+
+def clean_cuit(x) -> str:
+    s = str(x or "").strip()
+    s = _RE_NON_DIGIT.sub("", s)
+    # CUIT típico 11 dígitos. Si viene con basura igual lo dejamos numérico.
+    return s
+
+
+def normalize_period(s: str) -> str:
+    s = (s or "").strip().replace("/", "-")
+    m = _RE_PERIOD.match(s)
+    if m:
+        y, mo = m.group(1), int(m.group(2))
+        return f"{y}{mo:02d}"
+    digs = _RE_NON_DIGIT.sub("", s)
+    if len(digs) == 6:
+        return digs
+    return s
+
+
+def _factorize_apply(series: pd.Series, fn):
+    # aplica fn (Series -> Series/array) a los valores únicos; devuelve (códigos, únicos transformados)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return codes, np.asarray(fn(pd.Series(uniques)), dtype=object)
+
+
+def _on_uniques(series: pd.Series, fn) -> np.ndarray:
+    codes, out = _factorize_apply(series, fn)
+    return out[codes]
+
+
+def _strip_text(u: pd.Series) -> pd.Series:
+    return u.astype(str).str.strip()
+
+
+def _parse_numbers(u: pd.Series) -> pd.Series:
+    s = u.astype(str).str.strip()
+    # Heurística: si contiene coma -> decimal coma y miles punto
+    mask_comma = s.str.contains(",", regex=False)
+    s = s.where(~mask_comma, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    # espacios, NBSP, comas de miles y cualquier otro símbolo se van en una sola pasada
+    s = s.str.replace(_RE_NON_NUMERIC, "", regex=True)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _to_number(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.to_numeric(series, errors="coerce").astype(float)
+    values = _on_uniques(series, _parse_numbers).astype(float)
+    return pd.Series(values, index=series.index)
+
+
+@timed("standardize_one", filas=len)
+def standardize_one(df: pd.DataFrame, empresa: str) -> pd.DataFrame:
+    cols = set(df.columns)
+
+    mapping = {}
+    for std_name, candidates in REQUIRED.items():
+        col = pick_col(cols, candidates)
+        if col:
+            mapping[std_name] = col
+
+    if "subrubro" not in mapping:
+        raise ValueError("Falta columna de subrubro (ej: 'subrubro').")
+
+    if "cliente" not in mapping and "cliente_id" not in mapping:
+        raise ValueError("Falta columna de cliente (razón social o id).")
+
+    if "articulo_codigo" not in mapping or "articulo_descripcion" not in mapping:
+        raise ValueError("Necesito articulo_codigo y articulo_descripcion para productos (Punto 4).")
+
+    df = df.rename(columns={v: k for k, v in mapping.items()})
+
+    # defaults
+    if "cliente" not in df.columns and "cliente_id" in df.columns:
+        df["cliente"] = df["cliente_id"]
+
+    for c in ("cliente_id", "cuit", "vendedor", "anio_mes"):
+        if c not in df.columns:
+            df[c] = ""
+
+    df["empresa"] = empresa
+
+    # clean (sobre valores únicos); el filtro de filas vacías se resuelve también por código
+    keep = np.ones(len(df), dtype=bool)
+    for c in ("cliente", "subrubro", "articulo_codigo", "articulo_descripcion"):
+        codes, out = _factorize_apply(df[c], _strip_text)
+        df[c] = out[codes]
+        keep &= (out != "")[codes]
+    for c in ("cliente_id", "vendedor", "anio_mes"):
+        df[c] = _on_uniques(df[c], _strip_text)
+    df["cuit"] = _on_uniques(df["cuit"], lambda u: [clean_cuit(x) for x in u])
+
+    df["importe"] = _to_number(df["importe"]).fillna(0.0) if "importe" in df.columns else 0.0
+    df["unidades"] = _to_number(df["unidades"]).fillna(0.0) if "unidades" in df.columns else 0.0
+
+    # si no viene cant_pedidos, ponemos 1 por fila (aprox)
+    if "cant_pedidos" in df.columns:
+        ped = _to_number(df["cant_pedidos"]).fillna(0.0)
+        df["cant_pedidos"] = ped.where(ped > 0, 1.0)
+    else:
+        df["cant_pedidos"] = 1.0
+
+    # clave unificada por CUIT (si falta CUIT, fallback por cliente normalizado)
+    # OJO: para unificar por CUIT sí o sí, ideal que venga CUIT.
+    fallback = _on_uniques(
+        df["cliente"], lambda u: "NO_CUIT::" + u.str.lower().str.replace(_RE_SPACES, " ", regex=True).str.strip()
+    )
+    df["cliente_key"] = np.where(df["cuit"].to_numpy() == "", fallback, df["cuit"].to_numpy())
+
+    # filtro de filas mínimas
+    return df.take(np.flatnonzero(keep))
@@ -0,0 +1,348 @@
+# canastas/parquet_store.py — Base de ventas en Parquet particionado (alternativa a SQLite)
+#
+# Mismas funciones que el lado "ventas" de canastas.store (huella, filtros, carga
+# incremental, lectura filtrada) sobre un dataset Parquet:
+#
+#   PARQUET_PATH/
+#     datasets.json                                  archivos cargados + filas por partición
+#     ventas/empresa=<E>/anio_mes=<AAAAMM>/part-<dataset_id>.parquet
+#
+# Una partición por (empresa, anio_mes): leer un rango de períodos o unas empresas no abre
+# los demás archivos (partition pruning) y solo se leen las columnas pedidas. El texto se
+# guarda con diccionario (category al leer) y cada archivo ordenado por vendedor, así un
+# filtro de vendedor saltea row groups por estadísticas.
+#
+# La carga respeta lo mismo que SQLite: un archivo (hash) se carga una vez; los meses que
+# ya estaban se saltean salvo replace_periods (se reemplaza la partición entera); filas
+# repetidas dentro del archivo se suman. Se escribe en una carpeta de staging y recién al
+# final se mueven las particiones y se actualiza datasets.json; si algo falla en ese paso se
+# deshace lo movido (las particiones reemplazadas vuelven a su lugar). Una carga a la vez:
+# toda la carga corre con PARQUET_PATH/.lock tomado (entre procesos).
+#
+# datasets.json guarda también los vendedores de cada partición: los filtros de la app
+# (vendedores, empresas, períodos) salen de ahí sin abrir ningún Parquet.
+
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import urllib.parse
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from canastas import store
+from canastas.normalize import normalize_period
+from canastas.timing import timed
+
+PARQUET_PATH = "data_cache_parquet"
+PARTITION_COLS = ["empresa", "anio_mes"]
+TEXT_COLS = [c for c in store.VENTAS_COLS if c not in store.MEASURES and c not in PARTITION_COLS]
+
+FILE_SCHEMA = pa.schema(
+    [(c, pa.dictionary(pa.int32(), pa.string())) for c in TEXT_COLS]
+    + [(c, pa.float64()) for c in store.MEASURES]
+    + [("loaded_at", pa.string()), ("dataset_id", pa.int64())]
+)
+PARTITIONING = ds.partitioning(pa.schema([(c, pa.string()) for c in PARTITION_COLS]), flavor="hive")
+
+
+def _ventas_dir() -> str:
+    return os.path.join(PARQUET_PATH, "ventas")
+
+
+def _partition_dir(empresa: str, mes: str) -> str:
+    q = urllib.parse.quote
+    return os.path.join(_ventas_dir(), f"empresa={q(empresa, safe='')}", f"anio_mes={q(mes, safe='')}")
+
+
+def _registry() -> dict:
+    path = os.path.join(PARQUET_PATH, "datasets.json")
+    if not os.path.exists(path):
+        return {"next_id": 1, "datasets": [], "partitions": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_registry(reg: dict):
+    path = os.path.join(PARQUET_PATH, "datasets.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(reg, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _part_key(empresa: str, mes: str) -> str:
+    return f"{empresa}\t{mes}"
+
+
+@contextlib.contextmanager
+def _locked():
+    # lock exclusivo entre procesos sobre PARQUET_PATH/.lock (se libera al cerrar el archivo)
+    os.makedirs(PARQUET_PATH, exist_ok=True)
+    with open(os.path.join(PARQUET_PATH, ".lock"), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK se rinde a los 10 s: seguir esperando
+                    continue
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _partition_vendedores(empresa: str, mes: str) -> list:
+    # datasets.json de versiones anteriores: se leen una vez de la partición
+    t = pq.read_table(_partition_dir(empresa, mes), columns=["vendedor"])
+    return sorted({v for v in pc.unique(t["vendedor"].combine_chunks().dictionary_decode()).to_pylist() if v})
+
+
+def _dataset():
+    if not os.path.isdir(_ventas_dir()):
+        return None
+    return ds.dataset(_ventas_dir(), format="parquet", partitioning=PARTITIONING)
+
+
+def _filter(vendedor: str = None, empresas: list = None, period_from: str = None, period_to: str = None):
+    # empresa / anio_mes son columnas de partición: esas condiciones descartan carpetas enteras
+    expr = None
+    for cond in (
+        ds.field("vendedor") == vendedor if vendedor is not None else None,
+        ds.field("empresa").isin(empresas) if empresas else None,
+        ds.field("anio_mes") >= period_from if period_from is not None else None,
+        ds.field("anio_mes") <= period_to if period_to is not None else None,
+    ):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+    return expr
+
+
+# -----------------------------
+# Lectura
+# -----------------------------
+def pq_fingerprint() -> dict:
+    # sale de datasets.json (no se abre ningún Parquet)
+    reg = _registry()
+    if not reg["datasets"]:
+        return {}
+    return {
+        "backend": "parquet",
+        "rows": sum(p["rows"] for p in reg["partitions"].values()),
+        "max_dataset_id": max(d["dataset_id"] for d in reg["datasets"]),
+        "max_loaded_at": max(d["loaded_at"] for d in reg["datasets"]),
+    }
+
+
+def pq_month_fingerprints(
+    vendedor: str = None,
+    empresas: list = None,
+    period_from: str = None,
+    period_to: str = None,
+) -> dict:
+    # mismo formato que store.db_month_fingerprints
+    dataset = _dataset()
+    if dataset is None:
+        return {}
+    t = dataset.to_table(
+        columns=["anio_mes", "empresa", "dataset_id", "cant_pedidos"],
+        filter=_filter(vendedor, empresas, period_from, period_to),
+    )
+    g = t.group_by(["anio_mes", "empresa"]).aggregate(
+        [("dataset_id", "count"), ("dataset_id", "max"), ("cant_pedidos", "sum")]
+    )
+    rows = zip(
+        g["anio_mes"].to_pylist(),
+        g["empresa"].to_pylist(),
+        g["dataset_id_count"].to_pylist(),
+        g["dataset_id_max"].to_pylist(),
+        g["cant_pedidos_sum"].to_pylist(),
+    )
+    return store.month_fingerprints_from(rows, vendedor, empresas)
+
+
+def pq_filter_options():
+    # todo sale de datasets.json: empresas y períodos de las particiones, vendedores de lo
+    # que se guardó de cada una al cargarla
+    reg = _registry()
+    if not reg["partitions"]:
+        return [], [], []
+    missing = [k for k, p in reg["partitions"].items() if "vendedores" not in p]
+    if missing:
+        with _locked():
+            reg = _registry()
+            for k, p in reg["partitions"].items():
+                if "vendedores" not in p:
+                    p["vendedores"] = _partition_vendedores(*k.split("\t"))
+            _save_registry(reg)
+    parts = [k.split("\t") for k in reg["partitions"]]
+    empresas = sorted({e for e, _ in parts})
+    periodos = sorted({m for _, m in parts})
+    vendedores = sorted({v for p in reg["partitions"].values() for v in p["vendedores"]})
+    return vendedores, empresas, periodos
+
+
+@timed("pq_load_df", filas=len)
+def pq_load_df(
+    columns: list = None,
+    vendedor: str = None,
+    empresas: list = None,
+    period_from: str = None,
+    period_to: str = None,
+) -> pd.DataFrame:
+    # mismo contrato que store.db_load_df: texto como category con solo las categorías
+    # presentes y ordenadas (build_model ordena / busca sobre ellas), medidas en MEASURE_DTYPES
+    dataset = _dataset()
+    if dataset is None:
+        return pd.DataFrame()
+    columns = columns or store.VENTAS_COLS
+    t = dataset.to_table(columns=columns, filter=_filter(vendedor, empresas, period_from, period_to))
+    df = t.to_pandas()
+    for c in columns:
+        if c in store.MEASURES:
+            df[c] = df[c].astype(store.MEASURE_DTYPES[c], copy=False)
+        elif c == "dataset_id":
+            continue
+        elif isinstance(df[c].dtype, pd.CategoricalDtype):
+            s = df[c].cat.remove_unused_categories()
+            df[c] = s.cat.reorder_categories(sorted(s.cat.categories))
+        else:
+            df[c] = df[c].astype("category")
+    return df
+
+
+# -----------------------------
+# Carga incremental
+# -----------------------------
+def _write_part(df: pd.DataFrame, path: str) -> int:
+    # un archivo de una partición: sin las columnas de partición y ordenado por vendedor
+    out = df.drop(columns=PARTITION_COLS).sort_values(["vendedor", "subrubro"], kind="stable")
+    table = pa.Table.from_pandas(out[FILE_SCHEMA.names], schema=FILE_SCHEMA, preserve_index=False)
+    pq.write_table(table, path, compression="zstd")
+    return len(out)
+
+
+def pq_ingest_chunks(chunks, file_name: str, file_hash: str, replace_periods: bool = False) -> int:
+    # mismo contrato que store.db_ingest_chunks; devuelve las filas escritas
+    with _locked():
+        return _ingest_locked(chunks, file_name, file_hash, replace_periods)
+
+
+def _ingest_locked(chunks, file_name: str, file_hash: str, replace_periods: bool) -> int:
+    reg = _registry()
+    if any(d["file_hash"] == file_hash for d in reg["datasets"]):
+        return 0
+    # con el lock tomado, una carpeta de staging que quedó es de una carga que se cortó
+    for d in os.listdir(PARQUET_PATH):
+        if d.startswith("_staging-"):
+            shutil.rmtree(os.path.join(PARQUET_PATH, d), ignore_errors=True)
+
+    existing = {tuple(k.split("\t")) for k in reg["partitions"]}
+    dataset_id = reg["next_id"]
+    loaded_at = datetime.now().isoformat(timespec="seconds")
+    staging = tempfile.mkdtemp(prefix=f"_staging-{dataset_id}-", dir=PARQUET_PATH)
+
+    try:
+        staged = {}  # (empresa, anio_mes) -> [archivos en staging]
+        vendedores = {}  # (empresa, anio_mes) -> vendedores con filas
+        n_files = 0
+        for df in chunks:
+            out = df[store.VENTAS_COLS].copy()
+            periods = {p: normalize_period(p) for p in out["anio_mes"].unique()}
+            out["anio_mes"] = out["anio_mes"].map(periods)
+            out = store._dedup_natural_key(out)
+            if not replace_periods and existing:
+                keep = pd.MultiIndex.from_frame(out[PARTITION_COLS]).isin(list(existing))
+                out = out[~keep]
+            if out.empty:
+                continue
+            out = out.assign(loaded_at=loaded_at, dataset_id=dataset_id)
+            for (empresa, mes), g in out.groupby(PARTITION_COLS, sort=False):
+                path = os.path.join(staging, f"{n_files}.parquet")
+                _write_part(g, path)
+                staged.setdefault((empresa, mes), []).append(path)
+                vendedores.setdefault((empresa, mes), set()).update(str(v) for v in g["vendedor"].unique() if v)
+                n_files += 1
+
+        # una partición con filas en varios bloques: se juntan y se suman las repetidas
+        written, final = 0, {}
+        for i, ((empresa, mes), paths) in enumerate(staged.items()):
+            if len(paths) == 1:
+                final[(empresa, mes)] = paths[0], pq.read_metadata(paths[0]).num_rows
+                continue
+            df = pd.concat([pq.read_table(p).to_pandas() for p in paths], ignore_index=True)
+            df = df.astype({c: object for c in TEXT_COLS}).assign(empresa=empresa, anio_mes=mes)
+            df = store._dedup_natural_key(df[store.VENTAS_COLS]).assign(loaded_at=loaded_at, dataset_id=dataset_id)
+            path = os.path.join(staging, f"merged-{i}.parquet")
+            final[(empresa, mes)] = path, _write_part(df, path)
+
+        # commit: reemplazar / crear particiones y registrar el archivo. Si algo falla antes de
+        # guardar datasets.json se deshace: se borran las particiones nuevas y las reemplazadas
+        # (apartadas en staging) vuelven a su lugar
+        moved = []  # (partición, copia de la anterior o None)
+        try:
+            for (empresa, mes), (path, n) in final.items():
+                target = _partition_dir(empresa, mes)
+                backup = None
+                if os.path.isdir(target):  # solo pasa con replace_periods
+                    backup = os.path.join(staging, f"anterior-{len(moved)}")
+                    os.replace(target, backup)
+                moved.append((target, backup))
+                os.makedirs(target)
+                os.replace(path, os.path.join(target, f"part-{dataset_id}.parquet"))
+                reg["partitions"][_part_key(empresa, mes)] = {
+                    "dataset_id": dataset_id,
+                    "rows": n,
+                    "vendedores": sorted(vendedores[(empresa, mes)]),
+                }
+                written += n
+            reg["datasets"].append(
+                {
+                    "dataset_id": dataset_id,
+                    "file_name": file_name,
+                    "file_hash": file_hash,
+                    "rows": written,
+                    "loaded_at": loaded_at,
+                }
+            )
+            reg["next_id"] = dataset_id + 1
+            _save_registry(reg)
+        except BaseException:
+            for target, backup in reversed(moved):
+                shutil.rmtree(target, ignore_errors=True)
+                if backup is not None:
+                    os.replace(backup, target)
+            raise
+        return written
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def pq_clear():
+    if not os.path.isdir(PARQUET_PATH):
+        return
+    with _locked():
+        for d in os.listdir(PARQUET_PATH):
+            path = os.path.join(PARQUET_PATH, d)
+            if d == ".lock":
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+
+PARQUET = store.Backend(
+    "parquet", pq_fingerprint, pq_month_fingerprints, pq_filter_options, pq_load_df, pq_ingest_chunks, pq_clear
+)
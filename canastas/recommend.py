@@ -0,0 +1,75 @@
+# canastas/recommend.py — Recomendaciones de un cliente: precalculadas (tablas rec_*) o en vivo
+#
+# Lo que muestra la pestaña "Por cliente": subrubros oportunidad y, para cada uno, los
+# productos que compran sus clientes similares. Si la corrida materializada por
+# canastas.batch cubre los parámetros pedidos se sirve de ahí; si no, se calcula con el modelo.
+
+from collections import namedtuple
+
+from canastas.model import client_neighbors, recommend_for_client, top_products_by_subrubro
+
+# subrubros: DataFrame (subrubro, score_cooc, freq_global)
+# products(subrubro, metrica): DataFrame de artículos rankeados para ese subrubro
+ClientRecs = namedtuple("ClientRecs", ["subrubros", "products", "precalculadas"])
+
+
+def materialized_fits(params: dict, topk: int, topn: int, neighbors_n: int, exclude_bought: bool) -> bool:
+    return (
+        neighbors_n == params["neighbors_n"]
+        and exclude_bought == params["exclude_bought"]
+        and topk <= params["topk"]
+        and topn <= params["topn"]
+    )
+
+
+def client_recommendations(
+    model,
+    cliente_key: str,
+    topk: int = 10,
+    topn: int = 10,
+    neighbors_n: int = 50,
+    exclude_bought: bool = True,
+    materialized=None,
+) -> ClientRecs:
+    # materialized: lo que devuelve store.db_read_recommendations (o None)
+    if materialized is not None:
+        params, subs, prods = materialized
+        if materialized_fits(params, topk, topn, neighbors_n, exclude_bought):
+
+            def products(subrubro, metrica):
+                return prods[(prods["metrica"] == metrica) & (prods["subrubro"] == subrubro)].head(topn)
+
+            return ClientRecs(subs.head(topk), products, True)
+
+    rec = recommend_for_client(
+        cliente_key, model.X_bin, model.co, model.freq, model.clients, model.subrubros, topk=topk
+    )
+
+    # los vecinos se buscan una vez; los rankings recién cuando se piden y, la primera vez
+    # por métrica, para todos los subrubros recomendados en una sola pasada por el cubo
+    neighbors = client_neighbors(cliente_key, model.clients, model.neigh_idx, model.neigh_sim, neighbors_n)
+    ranked = {}  # metrica -> {subrubro: DataFrame}
+
+    def products(subrubro, metrica):
+        by_sr = ranked.setdefault(metrica, {})
+        if subrubro not in by_sr:
+            # uno recomendado trae a todos los recomendados que falten; uno suelto (API), solo él
+            recommended = rec["subrubro"].tolist()
+            wanted = [s for s in recommended if s not in by_sr] if subrubro in recommended else [subrubro]
+            by_sr.update(
+                top_products_by_subrubro(
+                    neighbors,
+                    wanted,
+                    metrica,
+                    topn,
+                    model.cube,
+                    model.cli_prod,
+                    model.prod_offsets,
+                    model.articulos,
+                    model.subrubros,
+                    exclude_already_bought=exclude_bought,
+                )
+            )
+        return by_sr[subrubro]
+
+    return ClientRecs(rec, products, False)
@@ -0,0 +1,120 @@
+# canastas/registry.py — Modelos compartidos por todo el proceso, reconstruidos en segundo plano
+#
+# Un lugar (scope) por alcance de datos: la base con sus filtros, o un juego de archivos
+# subidos. Cada lugar guarda la última versión armada del modelo junto con la huella de
+# los datos (source) con la que se armó. Cuando alguien pide una huella nueva:
+#
+#   - si el lugar ya tiene una versión, se devuelve esa en el acto y un único hilo arma la
+#     nueva; al terminar se reemplaza de una vez (ninguna sesión espera una reconstrucción);
+#   - si el lugar está vacío (primera vez) se espera, pero al mismo constructor: varias
+#     sesiones que llegan juntas no arman cada una su propio modelo.
+#
+# Mientras el hilo construye, los pedidos de otras huellas solo actualizan lo que falta
+# armar (se construye la última pedida, no todas las intermedias). Si una reconstrucción
+# falla se sigue sirviendo la versión anterior, y la misma huella se vuelve a intentar en
+# el primer pedido después de REGISTRY_RETRY_SECONDS (un error pasajero no la deja fija).
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+REGISTRY_SCOPES = 8  # lugares en memoria (los menos usados se descartan)
+REGISTRY_RETRY_SECONDS = 60.0  # espera antes de reintentar una huella cuyo armado falló
+
+# version: 1, 2, ... por lugar; built_at: time.time() de cuando quedó lista
+ModelVersion = namedtuple("ModelVersion", ["source", "model", "version", "built_at"])
+
+
+class ModelRegistry:
+    def __init__(self, max_scopes: int = REGISTRY_SCOPES):
+        self.max_scopes = max_scopes
+        self.cond = threading.Condition()
+        self.slots = OrderedDict()  # scope -> ModelVersion que se sirve
+        self.wanted = {}  # scope -> (source, build) que falta armar
+        self.builders = {}  # scope -> hilo constructor
+        self.errors = {}  # scope -> (source, excepción, time.monotonic()) del último intento fallido
+        self.generation = 0  # sube con clear(): lo que se estaba armando antes no se guarda
+
+    def get(self, scope, source, build) -> ModelVersion:
+        # build() arma el modelo de `source` (corre en el hilo constructor). Devuelve la
+        # versión de `source` si ya está; si no, la anterior del lugar mientras se arma la
+        # nueva, o (lugar vacío) espera la primera que quede lista.
+        with self.cond:
+            current = self.slots.get(scope)
+            if current is not None and current.source == source:
+                self.slots.move_to_end(scope)
+                return current
+            failed = self.errors.get(scope)
+            if (
+                failed is None
+                or failed[0] != source
+                or scope not in self.slots
+                or time.monotonic() - failed[2] >= REGISTRY_RETRY_SECONDS
+            ):
+                self._request(scope, source, build)
+            if current is not None:
+                self.slots.move_to_end(scope)
+                return current
+            while scope not in self.slots:
+                if scope not in self.builders:
+                    failed = self.errors.get(scope)
+                    if failed is not None:
+                        raise failed[1]  # el próximo get vuelve a intentar
+                    self._request(scope, source, build)  # se descartó con clear()
+                self.cond.wait()
+            return self.slots[scope]
+
+    def building(self, scope) -> bool:
+        with self.cond:
+            return scope in self.builders
+
+    def clear(self):
+        # los hilos en curso terminan su modelo, pero ya no se guarda
+        with self.cond:
+            self.generation += 1
+            self.slots.clear()
+            self.wanted.clear()
+            self.errors.clear()
+            self.cond.notify_all()
+
+    def _request(self, scope, source, build):
+        # con self.cond tomado
+        pending = self.wanted.get(scope)
+        if pending is not None and pending[0] == source:
+            return
+        self.wanted[scope] = (source, build)
+        self.errors.pop(scope, None)
+        if scope not in self.builders:
+            t = threading.Thread(target=self._builder, args=(scope,), name="model-builder")
+            t.daemon = True
+            self.builders[scope] = t
+            t.start()
+
+    def _builder(self, scope):
+        while True:
+            with self.cond:
+                if scope not in self.wanted:
+                    del self.builders[scope]
+                    self.cond.notify_all()
+                    return
+                source, build = self.wanted[scope]
+                generation = self.generation
+            try:
+                model, error = build(), None
+            except Exception as e:
+                model, error = None, e
+            with self.cond:
+                if generation != self.generation:
+                    continue
+                if self.wanted.get(scope, (None,))[0] == source:
+                    del self.wanted[scope]
+                if error is not None:
+                    self.errors[scope] = (source, error, time.monotonic())
+                else:
+                    prev = self.slots.get(scope)
+                    version = prev.version + 1 if prev is not None else 1
+                    self.slots[scope] = ModelVersion(source, model, version, time.time())
+                    self.slots.move_to_end(scope)
+                    while len(self.slots) > self.max_scopes:
+                        self.slots.popitem(last=False)
+                self.cond.notify_all()
@@ -0,0 +1,131 @@
+# canastas/search.py — Índice de búsqueda para el buscador de clientes
+#
+# Se arma una vez por modelo a partir del catálogo: texto normalizado (minúsculas, sin
+# acentos, solo letras y dígitos) de razones sociales, IDs de cliente y CUIT, partido en
+# tokens. Vocabulario ordenado + postings (token -> filas del catálogo) para búsqueda por
+# prefijo, y trigramas del vocabulario para encontrar el texto en el medio de un token
+# (ej: parte de un CUIT). Cada token de la consulta tiene que aparecer (AND); gana el que
+# matchea exacto, después por prefijo y por último en el medio.
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from canastas.timing import timed
+
+SEARCH_LIMIT = 200  # opciones máximas que mandamos al selectbox
+
+SCORE_EXACT = 3
+SCORE_PREFIX = 2
+SCORE_INFIX = 1
+
+SearchIndex = namedtuple(
+    "SearchIndex",
+    ["vocab", "tok_ptr", "tok_rows", "grams", "gram_ptr", "gram_toks", "label_rank", "row_by_label"],
+)
+
+
+def normalize_text(s: pd.Series) -> pd.Series:
+    return (
+        s.astype(str)
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.lower()
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def _postings(keys: np.ndarray, values: np.ndarray):
+    # (clave, valor) -> claves únicas ordenadas + CSR (ptr, valores)
+    codes, uniques = pd.factorize(keys, sort=True)
+    order = np.argsort(codes, kind="stable")
+    ptr = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return np.asarray(uniques, dtype=object), ptr, values[order]
+
+
+@timed("build_search_index", filas=lambda index: len(index.label_rank))
+def build_search_index(catalog: pd.DataFrame) -> SearchIndex:
+    n = len(catalog)
+    catalog = catalog.reset_index(drop=True)
+    # solo los datos del cliente, no el label armado: su "+N razones" haría que "1" o
+    # "razones" encuentren a cualquier cliente con varias razones sociales
+    razones = pd.Series([" ".join(r) for r in catalog["razones"]])
+    ids = pd.Series([" ".join(r) for r in catalog["ids"]])
+    text = normalize_text(razones + " " + ids + " " + catalog["cuit"].astype(str))
+
+    pairs = text.str.split().explode().dropna()
+    pairs = pd.DataFrame({"tok": pairs.to_numpy(dtype=object), "row": pairs.index.to_numpy()})
+    pairs = pairs[pairs["tok"].ne("")].drop_duplicates()
+    vocab, tok_ptr, tok_rows = _postings(pairs["tok"].to_numpy(dtype=object), pairs["row"].to_numpy(dtype=np.int32))
+
+    # trigramas de cada token del vocabulario (una operación vectorizada por posición)
+    voc = pd.Series(vocab)
+    lens = voc.str.len().to_numpy()
+    gram_keys, gram_tok = [], []
+    for o in range(int(lens.max(initial=0)) - 2):
+        ok = np.flatnonzero(lens >= o + 3)
+        gram_keys.append(voc.iloc[ok].str.slice(o, o + 3).to_numpy(dtype=object))
+        gram_tok.append(ok.astype(np.int32))
+    if gram_keys:
+        g = pd.DataFrame({"g": np.concatenate(gram_keys), "t": np.concatenate(gram_tok)}).drop_duplicates()
+        grams, gram_ptr, gram_toks = _postings(g["g"].to_numpy(dtype=object), g["t"].to_numpy(dtype=np.int32))
+    else:
+        grams, gram_ptr, gram_toks = np.empty(0, dtype=object), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+    labels = catalog["label"].to_numpy(dtype=object)
+    label_rank = np.empty(n, dtype=np.int64)
+    label_rank[np.argsort(labels, kind="stable")] = np.arange(n)
+    # si dos clientes comparten label, gana el primero (igual que antes con .iloc[0])
+    row_by_label = dict(zip(labels[::-1], range(n - 1, -1, -1)))
+
+    return SearchIndex(vocab, tok_ptr, tok_rows, grams, gram_ptr, gram_toks, label_rank, row_by_label)
+
+
+def _term_scores(index: SearchIndex, q: str, n: int) -> np.ndarray:
+    # puntaje de cada fila del catálogo para un token de la consulta (0 = no matchea)
+    best = np.zeros(n, dtype=np.int32)
+    lo = np.searchsorted(index.vocab, q, side="left")
+    hi = np.searchsorted(index.vocab, q + "\x7f", side="left")
+
+    if len(q) >= 3:
+        cand = None
+        for i in range(len(q) - 2):
+            j = np.searchsorted(index.grams, q[i : i + 3])
+            if j == len(index.grams) or index.grams[j] != q[i : i + 3]:
+                cand = np.empty(0, dtype=np.int32)
+                break
+            t = index.gram_toks[index.gram_ptr[j] : index.gram_ptr[j + 1]]
+            cand = t if cand is None else np.intersect1d(cand, t, assume_unique=True)
+        cand = [t for t in cand[(cand < lo) | (cand >= hi)] if q in index.vocab[t]]
+        if cand:
+            best[np.concatenate([index.tok_rows[index.tok_ptr[t] : index.tok_ptr[t + 1]] for t in cand])] = SCORE_INFIX
+
+    # los tokens con ese prefijo son contiguos en el vocabulario: sus postings también
+    best[index.tok_rows[index.tok_ptr[lo] : index.tok_ptr[hi]]] = SCORE_PREFIX
+    if hi > lo and index.vocab[lo] == q:
+        best[index.tok_rows[index.tok_ptr[lo] : index.tok_ptr[lo + 1]]] = SCORE_EXACT
+    return best
+
+
+def search(index: SearchIndex, query: str, limit: int = SEARCH_LIMIT):
+    # devuelve (filas del catálogo rankeadas, cantidad total de coincidencias)
+    n = len(index.label_rank)
+    terms = normalize_text(pd.Series([query])).iloc[0].split()
+    if not terms:
+        return np.arange(min(n, limit)), n
+
+    total = None
+    for q in terms:
+        best = _term_scores(index, q, n)
+        total = best if total is None else np.where((total > 0) & (best > 0), total + best, 0)
+
+    # puntaje descendente y, a igual puntaje, orden alfabético del label
+    key = -total.astype(np.int64) * n + index.label_rank
+    rows = np.flatnonzero(total)
+    n_hits = len(rows)
+    if n_hits > limit:
+        rows = rows[np.argpartition(key[rows], limit - 1)[:limit]]
+    return rows[np.argsort(key[rows])], n_hits
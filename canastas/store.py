@@ -0,0 +1,610 @@
+# canastas/store.py — Base SQLite local: carga incremental de ventas y lectura filtrada
+
+import itertools
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from canastas.normalize import normalize_period
+from canastas.timing import timed
+
+DB_PATH = "data_cache.sqlite"
+
+
+# -----------------------------
+# SQLite: guardar / cargar
+# -----------------------------
+# Carga incremental: cada archivo se registra en `datasets` por hash de contenido (si ya
+# se cargó, no se vuelve a escribir) y `ventas` se particiona lógicamente por
+# (empresa, anio_mes). Solo se agregan los períodos que la base todavía no tiene, salvo
+# que se pida reemplazarlos. Las filas se deduplican por NATURAL_KEY (upsert).
+#
+# Esquema normalizado: `ventas` guarda enteros (surrogate keys) contra las dimensiones
+# clientes / vendedores / subrubros / articulos; db_load_df vuelve a armar las columnas
+# de texto con JOIN y filtra en SQL (vendedor, empresa, rango de períodos).
+VENTAS_COLS = [
+    "empresa",
+    "cliente_key",
+    "cuit",
+    "cliente",
+    "cliente_id",
+    "vendedor",
+    "subrubro",
+    "importe",
+    "unidades",
+    "cant_pedidos",
+    "anio_mes",
+    "articulo_codigo",
+    "articulo_descripcion",
+]
+NATURAL_KEY = [
+    "empresa",
+    "anio_mes",
+    "cliente_key",
+    "cliente_id",
+    "vendedor",
+    "subrubro",
+    "articulo_codigo",
+    "articulo_descripcion",
+]
+MEASURES = ["importe", "unidades", "cant_pedidos"]
+# tipos de las medidas en el frame de ventas en memoria: pedidos y unidades alcanzan con
+# float32 (enteros o pocos decimales); importe queda en float64 (en float32 se pierden centavos)
+MEASURE_DTYPES = {"importe": np.float64, "unidades": np.float32, "cant_pedidos": np.float32}
+INSERT_BATCH = 50_000
+
+# (tabla, surrogate key, columnas que la identifican, atributos, alias en el JOIN)
+DIMENSIONS = [
+    ("clientes", "cliente_sk", ["cliente_key"], ["cuit"], "c"),
+    ("vendedores", "vendedor_sk", ["vendedor"], [], "ve"),
+    ("subrubros", "subrubro_sk", ["subrubro"], [], "s"),
+    ("articulos", "articulo_sk", ["articulo_codigo", "articulo_descripcion"], [], "a"),
+]
+FACT_COLS = [
+    "empresa",
+    "anio_mes",
+    "cliente_sk",
+    "cliente",
+    "cliente_id",
+    "vendedor_sk",
+    "subrubro_sk",
+    "articulo_sk",
+] + MEASURES
+FACT_KEY = ["empresa", "anio_mes", "cliente_sk", "cliente_id", "vendedor_sk", "subrubro_sk", "articulo_sk"]
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS clientes (
+    cliente_sk INTEGER PRIMARY KEY,
+    cliente_key TEXT NOT NULL UNIQUE,
+    cuit TEXT
+);
+CREATE TABLE IF NOT EXISTS vendedores (
+    vendedor_sk INTEGER PRIMARY KEY,
+    vendedor TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS subrubros (
+    subrubro_sk INTEGER PRIMARY KEY,
+    subrubro TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS articulos (
+    articulo_sk INTEGER PRIMARY KEY,
+    articulo_codigo TEXT NOT NULL,
+    articulo_descripcion TEXT NOT NULL,
+    UNIQUE (articulo_codigo, articulo_descripcion)
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT,
+    file_hash TEXT UNIQUE,
+    rows INTEGER,
+    loaded_at TEXT
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ventas (
+    empresa TEXT NOT NULL,
+    anio_mes TEXT NOT NULL,
+    cliente_sk INTEGER NOT NULL REFERENCES clientes (cliente_sk),
+    cliente TEXT,
+    cliente_id TEXT,
+    vendedor_sk INTEGER NOT NULL REFERENCES vendedores (vendedor_sk),
+    subrubro_sk INTEGER NOT NULL REFERENCES subrubros (subrubro_sk),
+    articulo_sk INTEGER NOT NULL REFERENCES articulos (articulo_sk),
+    importe REAL NOT NULL,
+    unidades REAL NOT NULL,
+    cant_pedidos REAL NOT NULL,
+    loaded_at TEXT,
+    dataset_id INTEGER REFERENCES datasets (dataset_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_ventas_natural
+    ON ventas (empresa, anio_mes, cliente_sk, cliente_id, vendedor_sk, subrubro_sk, articulo_sk);
+CREATE INDEX IF NOT EXISTS ix_ventas_anio_mes ON ventas (anio_mes);
+CREATE INDEX IF NOT EXISTS ix_ventas_vendedor ON ventas (vendedor_sk, anio_mes);
+CREATE INDEX IF NOT EXISTS ix_ventas_subrubro ON ventas (subrubro_sk);
+"""
+
+
+def db_connect(path: str = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    return conn
+
+
+def _db_migrate_flat(conn: sqlite3.Connection):
+    # bases anteriores: una sola tabla `ventas` con todo en texto (y quizás filas repetidas)
+    cur = conn.cursor()
+    flat_cols = [r[1] for r in cur.execute("PRAGMA table_info(ventas)")]
+    cur.execute("DROP INDEX IF EXISTS ux_ventas_natural")
+    cur.execute("ALTER TABLE ventas RENAME TO ventas_flat")
+    cur.executescript(SCHEMA_SQL)
+
+    conn.create_function("normalize_period", 1, normalize_period)
+    txt = {c: f"COALESCE(f.{c}, '')" for c in VENTAS_COLS if c not in MEASURES}
+    txt["anio_mes"] = "normalize_period(COALESCE(f.anio_mes, ''))"
+
+    for table, _sk, keys, attrs, _alias in DIMENSIONS:
+        key_sql = ", ".join(txt[k] for k in keys)
+        attr_sql = "".join(f", MAX({txt[a]})" for a in attrs)
+        cur.execute(
+            f"INSERT OR IGNORE INTO {table} ({', '.join(keys + attrs)}) "
+            f"SELECT {key_sql}{attr_sql} FROM ventas_flat f GROUP BY {key_sql}"
+        )
+
+    joins = " ".join(
+        f"JOIN {table} {alias} ON " + " AND ".join(f"{alias}.{k} = {txt[k]}" for k in keys)
+        for table, _sk, keys, _attrs, alias in DIMENSIONS
+    )
+    dataset = "MAX(f.dataset_id)" if "dataset_id" in flat_cols else "NULL"
+    cur.execute(
+        f"""
+        INSERT INTO ventas ({', '.join(FACT_COLS)}, loaded_at, dataset_id)
+        SELECT {txt['empresa']}, {txt['anio_mes']}, c.cliente_sk, MAX({txt['cliente']}), {txt['cliente_id']},
+               ve.vendedor_sk, s.subrubro_sk, a.articulo_sk,
+               SUM(COALESCE(f.importe, 0)), SUM(COALESCE(f.unidades, 0)), SUM(COALESCE(f.cant_pedidos, 0)),
+               MAX(f.loaded_at), {dataset}
+        FROM ventas_flat f {joins}
+        GROUP BY {txt['empresa']}, {txt['anio_mes']}, c.cliente_sk, {txt['cliente_id']},
+                 ve.vendedor_sk, s.subrubro_sk, a.articulo_sk
+        """
+    )
+    cur.execute("DROP TABLE ventas_flat")
+
+
+def db_init():
+    conn = db_connect()
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(ventas)")]
+    if "cliente_key" in cols:
+        _db_migrate_flat(conn)
+    else:
+        conn.executescript(SCHEMA_SQL)
+    conn.commit()
+    conn.close()
+
+
+def db_clear():
+    if not os.path.exists(DB_PATH):
+        return
+    db_init()
+    conn = db_connect()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM ventas")
+    cur.execute("DELETE FROM datasets")
+    for table, *_ in DIMENSIONS:
+        cur.execute(f"DELETE FROM {table}")
+    _db_refresh_metadata(cur)
+    conn.commit()
+    conn.close()
+
+
+def _db_refresh_metadata(cur: sqlite3.Cursor) -> dict:
+    # lo que se pregunta en cada rerun (filas, valores de los filtros) se calcula una vez por
+    # carga y queda en `metadata`: la huella y los filtros no recorren `ventas`
+    meta = {
+        "rows": cur.execute("SELECT COUNT(*) FROM ventas").fetchone()[0],
+        "vendedores": [
+            r[0]
+            for r in cur.execute(
+                "SELECT vendedor FROM vendedores WHERE vendedor <> '' "
+                "AND vendedor_sk IN (SELECT DISTINCT vendedor_sk FROM ventas) ORDER BY vendedor"
+            )
+        ],
+        "empresas": [r[0] for r in cur.execute("SELECT DISTINCT empresa FROM ventas ORDER BY empresa")],
+        "periodos": [r[0] for r in cur.execute("SELECT DISTINCT anio_mes FROM ventas ORDER BY anio_mes")],
+    }
+    cur.executemany(
+        "INSERT OR REPLACE INTO metadata (clave, valor) VALUES (?, ?)",
+        [(k, json.dumps(v, ensure_ascii=False)) for k, v in meta.items()],
+    )
+    return meta
+
+
+def _db_metadata(conn: sqlite3.Connection) -> dict:
+    meta = {k: json.loads(v) for k, v in conn.execute("SELECT clave, valor FROM metadata")}
+    if "rows" not in meta:  # base de una versión anterior: se calcula una vez y se guarda
+        with conn:
+            meta = _db_refresh_metadata(conn.cursor())
+    return meta
+
+
+def _dedup_natural_key(df: pd.DataFrame) -> pd.DataFrame:
+    # filas repetidas dentro del mismo archivo son renglones distintos: se suman
+    aggs = {c: "sum" for c in MEASURES}
+    aggs.update({c: "first" for c in VENTAS_COLS if c not in NATURAL_KEY and c not in MEASURES})
+    return df.groupby(NATURAL_KEY, as_index=False, sort=False, dropna=False).agg(aggs)[VENTAS_COLS]
+
+
+def _db_upsert_dim(cur: sqlite3.Cursor, df: pd.DataFrame, table: str, sk: str, keys: list, attrs: list) -> np.ndarray:
+    vals = df[keys + attrs].drop_duplicates(subset=keys)
+    cur.executemany(
+        f"INSERT OR IGNORE INTO {table} ({', '.join(keys + attrs)}) VALUES ({', '.join('?' * len(keys + attrs))})",
+        vals.itertuples(index=False, name=None),
+    )
+    dim = pd.DataFrame(cur.execute(f"SELECT {sk}, {', '.join(keys)} FROM {table}").fetchall(), columns=[sk] + keys)
+    return df[keys].merge(dim, on=keys, how="left")[sk].to_numpy()
+
+
+def db_ingest_chunks(chunks, file_name: str, file_hash: str, replace_periods: bool = False) -> int:
+    # `chunks`: iterable de DataFrames estandarizados de un mismo archivo; se escriben a medida
+    # que llegan, en una sola transacción (si un bloque falla no queda el archivo a medias).
+    db_init()
+    conn = db_connect()
+    try:
+        cur = conn.cursor()
+        if cur.execute("SELECT 1 FROM datasets WHERE file_hash = ?", (file_hash,)).fetchone():
+            return 0
+
+        # particiones que ya estaban antes de este archivo (las que escribe el archivo no cuentan)
+        existing = set(cur.execute("SELECT DISTINCT empresa, anio_mes FROM ventas").fetchall())
+        replaced = set()
+
+        loaded_at = datetime.now().isoformat(timespec="seconds")
+        cols = FACT_COLS + ["loaded_at", "dataset_id"]
+        # una fila repetida en otro bloque del mismo archivo se suma; de otro archivo, se pisa
+        upsert = (
+            f"INSERT INTO ventas ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT ({', '.join(FACT_KEY)}) DO UPDATE SET "
+            + ", ".join(
+                f"{c} = CASE WHEN ventas.dataset_id = excluded.dataset_id "
+                f"THEN ventas.{c} + excluded.{c} ELSE excluded.{c} END"
+                if c in MEASURES
+                else f"{c} = excluded.{c}"
+                for c in cols
+                if c not in FACT_KEY
+            )
+        )
+
+        written = 0
+        with conn:
+            cur.execute(
+                "INSERT INTO datasets (file_name, file_hash, rows, loaded_at) VALUES (?, ?, ?, ?)",
+                (file_name, file_hash, 0, loaded_at),
+            )
+            dataset_id = cur.lastrowid
+
+            for df in chunks:
+                out = df[VENTAS_COLS].copy()
+                periods = {p: normalize_period(p) for p in out["anio_mes"].unique()}
+                out["anio_mes"] = out["anio_mes"].map(periods)
+                out = _dedup_natural_key(out)
+
+                parts = set(out[["empresa", "anio_mes"]].drop_duplicates().itertuples(index=False, name=None))
+                overlap = parts & existing
+                if replace_periods:
+                    cur.executemany("DELETE FROM ventas WHERE empresa = ? AND anio_mes = ?", sorted(overlap - replaced))
+                    replaced |= overlap
+                elif overlap:
+                    keep = pd.MultiIndex.from_frame(out[["empresa", "anio_mes"]]).isin(list(overlap))
+                    out = out[~keep]
+                if out.empty:
+                    continue
+
+                for table, sk, keys, attrs, _alias in DIMENSIONS:
+                    out[sk] = _db_upsert_dim(cur, out, table, sk, keys, attrs)
+                fact = out[FACT_COLS].assign(loaded_at=loaded_at, dataset_id=dataset_id)
+
+                rows = fact.itertuples(index=False, name=None)
+                while True:
+                    batch = list(itertools.islice(rows, INSERT_BATCH))
+                    if not batch:
+                        break
+                    cur.executemany(upsert, batch)
+                written += len(out)
+
+            # filas repetidas entre bloques se sumaron sobre la misma fila: contar lo que quedó
+            if written:
+                written = cur.execute("SELECT COUNT(*) FROM ventas WHERE dataset_id = ?", (dataset_id,)).fetchone()[0]
+            cur.execute("UPDATE datasets SET rows = ? WHERE dataset_id = ?", (written, dataset_id))
+            if written or replaced:
+                _db_refresh_metadata(cur)
+
+        return written
+    finally:
+        conn.close()
+
+
+def db_ingest_df(df: pd.DataFrame, file_name: str, file_hash: str, replace_periods: bool = False) -> int:
+    return db_ingest_chunks([df], file_name, file_hash, replace_periods=replace_periods)
+
+
+# columna de salida -> expresión SQL (alias de `ventas` = v, dimensiones según DIMENSIONS)
+LOAD_EXPR = {
+    "empresa": "v.empresa",
+    "cliente_key": "c.cliente_key",
+    "cuit": "c.cuit",
+    "cliente": "v.cliente",
+    "cliente_id": "v.cliente_id",
+    "vendedor": "ve.vendedor",
+    "subrubro": "s.subrubro",
+    "importe": "v.importe",
+    "unidades": "v.unidades",
+    "cant_pedidos": "v.cant_pedidos",
+    "anio_mes": "v.anio_mes",
+    "articulo_codigo": "a.articulo_codigo",
+    "articulo_descripcion": "a.articulo_descripcion",
+    "loaded_at": "v.loaded_at",
+    "dataset_id": "v.dataset_id",
+}
+
+
+def db_fingerprint() -> dict:
+    # barato: cambia con cada archivo cargado (dataset_id autoincremental) o con un clear
+    if not os.path.exists(DB_PATH):
+        return {}
+    db_init()
+    conn = db_connect()
+    try:
+        rows = _db_metadata(conn)["rows"]
+        max_id, max_loaded = conn.execute("SELECT MAX(dataset_id), MAX(loaded_at) FROM datasets").fetchone()
+    finally:
+        conn.close()
+    return {"rows": rows, "max_dataset_id": max_id, "max_loaded_at": max_loaded}
+
+
+def db_month_fingerprints(
+    vendedor: str = None,
+    empresas: list = None,
+    period_from: str = None,
+    period_to: str = None,
+) -> dict:
+    # huella por mes (mismos filtros que db_load_df): si un mes no cambió, su parte del
+    # modelo (co-ocurrencia del mes) se reutiliza del disco. por_empresa: la huella de cada
+    # empresa en ese mes (otra empresa que carga un mes ya cargado extiende el modelo)
+    if not os.path.exists(DB_PATH):
+        return {}
+    db_init()
+    where, params = _where(vendedor, empresas, period_from, period_to)
+    conn = db_connect()
+    rows = conn.execute(
+        f"SELECT anio_mes, empresa, COUNT(*), MAX(dataset_id), TOTAL(cant_pedidos) FROM ventas v{where} "
+        "GROUP BY anio_mes, empresa",
+        params,
+    ).fetchall()
+    conn.close()
+    return month_fingerprints_from(rows, vendedor, empresas)
+
+
+def month_fingerprints_from(rows, vendedor: str = None, empresas: list = None) -> dict:
+    # (anio_mes, empresa, filas, max dataset_id, pedidos) por mes y empresa -> huellas por mes
+    # (también para parquet_store)
+    scope = {"vendedor": vendedor, "empresas": sorted(empresas) if empresas else None}
+    out = {}
+    for mes, empresa, n, max_id, ped in rows:
+        fp = out.setdefault(mes, {**scope, "rows": 0, "max_dataset_id": max_id, "pedidos": 0.0, "por_empresa": {}})
+        fp["rows"] += n
+        fp["max_dataset_id"] = max((i for i in (fp["max_dataset_id"], max_id) if i is not None), default=None)
+        fp["pedidos"] += ped
+        fp["por_empresa"][empresa] = [n, max_id, round(ped, 6)]
+    for fp in out.values():
+        fp["pedidos"] = round(fp["pedidos"], 6)
+    return out
+
+
+def db_filter_options():
+    # valores para armar los filtros del sidebar sin leer la tabla de ventas (ver `metadata`)
+    if not os.path.exists(DB_PATH):
+        return [], [], []
+    db_init()
+    conn = db_connect()
+    try:
+        meta = _db_metadata(conn)
+    finally:
+        conn.close()
+    return meta["vendedores"], meta["empresas"], meta["periodos"]
+
+
+def _where(vendedor: str = None, empresas: list = None, period_from: str = None, period_to: str = None):
+    where, params = [], []
+    if vendedor is not None:
+        where.append("v.vendedor_sk = (SELECT vendedor_sk FROM vendedores WHERE vendedor = ?)")
+        params.append(vendedor)
+    if empresas:
+        where.append(f"v.empresa IN ({', '.join('?' * len(empresas))})")
+        params.extend(empresas)
+    if period_from is not None:
+        where.append("v.anio_mes >= ?")
+        params.append(period_from)
+    if period_to is not None:
+        where.append("v.anio_mes <= ?")
+        params.append(period_to)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+@timed("db_load_df", filas=len)
+def db_load_df(
+    columns: list = None,
+    vendedor: str = None,
+    empresas: list = None,
+    period_from: str = None,
+    period_to: str = None,
+) -> pd.DataFrame:
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame()
+    db_init()
+
+    columns = columns or VENTAS_COLS
+    select = ", ".join(f"{LOAD_EXPR[c]} AS {c}" for c in columns)
+    joins = " ".join(
+        f"JOIN {table} {alias} ON {alias}.{sk} = v.{sk}"
+        for table, sk, _keys, _attrs, alias in DIMENSIONS
+        if any(LOAD_EXPR[c].startswith(f"{alias}.") for c in columns)
+    )
+
+    where, params = _where(vendedor, empresas, period_from, period_to)
+    sql = f"SELECT {select} FROM ventas v {joins}{where}"
+
+    conn = db_connect()
+    df = pd.read_sql_query(sql, conn, params=params)
+    conn.close()
+
+    # compacto: texto como category (diccionario ordenado, solo valores presentes)
+    dtypes = {c: MEASURE_DTYPES.get(c, "category") for c in columns if c != "dataset_id"}
+    return df.astype(dtypes, copy=False)
+
+
+# -----------------------------
+# Backends de ventas
+# -----------------------------
+# La app y la ingesta hablan con la base de ventas a través de estas funciones; SQLite
+# (este módulo) o Parquet particionado (canastas.parquet_store) las implementan igual.
+# Las recomendaciones precalculadas (rec_*) viven siempre en SQLite.
+Backend = namedtuple(
+    "Backend", ["name", "fingerprint", "month_fingerprints", "filter_options", "load_df", "ingest_chunks", "clear"]
+)
+SQLITE = Backend(
+    "sqlite", db_fingerprint, db_month_fingerprints, db_filter_options, db_load_df, db_ingest_chunks, db_clear
+)
+
+
+def backend(name: str = "sqlite") -> Backend:
+    if name == "parquet":
+        from canastas import parquet_store  # pyarrow recién si se usa
+
+        return parquet_store.PARQUET
+    return SQLITE
+
+
+# -----------------------------
+# Recomendaciones precalculadas
+# -----------------------------
+# Las escribe canastas.batch. Cada corrida queda identificada por la clave del modelo
+# (huella de los datos + filtros); una corrida nueva con los mismos filtros reemplaza a
+# la anterior.
+REC_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS rec_runs (
+    model_key TEXT PRIMARY KEY,
+    filtros TEXT NOT NULL,
+    params TEXT NOT NULL,
+    clientes INTEGER,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS rec_subrubros (
+    model_key TEXT NOT NULL,
+    vendedor TEXT,
+    cliente_key TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    subrubro TEXT NOT NULL,
+    score_cooc REAL,
+    freq_global REAL
+);
+CREATE INDEX IF NOT EXISTS ix_rec_subrubros ON rec_subrubros (model_key, cliente_key);
+CREATE TABLE IF NOT EXISTS rec_productos (
+    model_key TEXT NOT NULL,
+    vendedor TEXT,
+    cliente_key TEXT NOT NULL,
+    subrubro TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    articulo_codigo TEXT,
+    articulo_descripcion TEXT,
+    score REAL,
+    vecinos INTEGER,
+    importe REAL,
+    unidades REAL,
+    pedidos REAL,
+    ultimo_mes TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_rec_productos ON rec_productos (model_key, cliente_key, metrica, subrubro);
+"""
+REC_TABLES = ["rec_runs", "rec_subrubros", "rec_productos"]
+
+
+def _db_init_rec(conn: sqlite3.Connection):
+    # son datos derivados: si el esquema cambió, se tiran y se vuelven a calcular
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(rec_productos)")]
+    if cols and "metrica" not in cols:
+        for table in REC_TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.executescript(REC_SCHEMA_SQL)
+
+
+def db_write_recommendations(runs: pd.DataFrame, subs: pd.DataFrame, prods: pd.DataFrame, path: str = None):
+    conn = db_connect(path)
+    try:
+        _db_init_rec(conn)
+        cur = conn.cursor()
+        with conn:
+            for filtros in runs["filtros"].unique():
+                old = [r[0] for r in cur.execute("SELECT model_key FROM rec_runs WHERE filtros = ?", (filtros,))]
+                for table in REC_TABLES:
+                    cur.executemany(f"DELETE FROM {table} WHERE model_key = ?", [(k,) for k in old])
+
+            for table, df in zip(REC_TABLES, (runs, subs, prods)):
+                rows = df.itertuples(index=False, name=None)
+                sql = f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({', '.join('?' * df.shape[1])})"
+                while True:
+                    batch = list(itertools.islice(rows, INSERT_BATCH))
+                    if not batch:
+                        break
+                    cur.executemany(sql, batch)
+    finally:
+        conn.close()
+
+
+def db_recommendation_params(model_key: str, path: str = None):
+    # parámetros con los que se materializó ese modelo, o None si no está
+    path = path or DB_PATH
+    if not os.path.exists(path):
+        return None
+    conn = db_connect(path)
+    try:
+        _db_init_rec(conn)
+        run = conn.execute("SELECT params FROM rec_runs WHERE model_key = ?", (model_key,)).fetchone()
+    finally:
+        conn.close()
+    return None if run is None else json.loads(run[0])
+
+
+def db_read_recommendations(model_key: str, cliente_key: str, path: str = None):
+    # (params de la corrida, subrubros, productos) del cliente, o None si ese modelo no está materializado
+    params = db_recommendation_params(model_key, path)
+    if params is None:
+        return None
+    conn = db_connect(path)
+    try:
+        subs = pd.read_sql_query(
+            "SELECT subrubro, score_cooc, freq_global FROM rec_subrubros "
+            "WHERE model_key = ? AND cliente_key = ? ORDER BY rank",
+            conn,
+            params=(model_key, cliente_key),
+        )
+        prods = pd.read_sql_query(
+            "SELECT subrubro, metrica, rank, articulo_codigo, articulo_descripcion, score, vecinos, "
+            "importe, unidades, pedidos, ultimo_mes FROM rec_productos "
+            "WHERE model_key = ? AND cliente_key = ? ORDER BY metrica, subrubro, rank",
+            conn,
+            params=(model_key, cliente_key),
+        )
+    finally:
+        conn.close()
+    return params, subs, prods
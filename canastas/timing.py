@@ -0,0 +1,187 @@
+# canastas/timing.py — Tiempo y memoria por etapa (spans), log estructurado y cProfile opcional
+#
+# Cada etapa pesada (leer el archivo, estandarizar, leer la base, armar el modelo, el
+# catálogo, el ranking de productos, ...) corre dentro de un span: se mide el tiempo, la
+# memoria residente (RSS) al terminar, cuánto creció y el pico del proceso, y las filas que
+# produjo. Los spans se juntan en la lista de la ejecución actual (collect(): la app arma
+# una por rerun y la muestra en el panel de diagnóstico) y, si el logger "canastas.timing"
+# tiene INFO habilitado, salen como una línea JSON por etapa.
+#
+# Sin lista activa y sin log habilitado un span no mide nada: en las funciones que se llaman
+# miles de veces (el ranking de productos de cada subrubro recomendado en la pestaña "Por
+# cliente" y en la API) el costo es un par de lookups.
+
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+log = logging.getLogger("canastas.timing")
+
+# nivel: anidamiento (build_customer_catalog corre dentro de build_model)
+Span = namedtuple("Span", ["etapa", "nivel", "segundos", "filas", "rss_mb", "delta_mb", "pico_mb", "extra"])
+
+_spans = contextvars.ContextVar("canastas_spans", default=None)
+_depth = contextvars.ContextVar("canastas_span_depth", default=0)
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_END = object()  # fin del iterador en timed_iter
+
+
+def rss_mb() -> float:
+    # memoria residente actual; /proc en Linux, si no el pico como aproximación
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE / 2**20
+    except (OSError, IndexError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10  # macOS en bytes, Linux en KB
+
+
+def setup_log(force: bool = False):
+    # CANASTAS_LOG=1 (o force): spans como JSON por stderr. Idempotente (la app lo llama en cada rerun)
+    if not (force or os.environ.get("CANASTAS_LOG")) or log.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+
+def collect() -> list:
+    # empieza una lista nueva de spans para el contexto actual (hilo / rerun) y la devuelve
+    spans = []
+    _spans.set(spans)
+    return spans
+
+
+@contextmanager
+def span(etapa: str, **extra):
+    # with span("db_load_df") as s: df = ...; s["filas"] = len(df)
+    # lo que se agregue al dict (además de "filas") va al log y a la columna extra
+    info = dict(extra)
+    spans = _spans.get()
+    if spans is None and not log.isEnabledFor(logging.INFO):
+        yield info
+        return
+
+    nivel = _depth.get()
+    token = _depth.set(nivel + 1)
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        secs = time.perf_counter() - t0
+        _depth.reset(token)
+        if info.pop("_descartar", False):  # timed_iter: el next() que encontró el final
+            return
+        rss = rss_mb()
+        filas = info.pop("filas", None)
+        s = Span(etapa, nivel, secs, filas, rss, rss - rss0, peak_rss_mb(), info)
+        if spans is not None:
+            spans.append(s)
+        if log.isEnabledFor(logging.INFO):
+            record = {"etapa": etapa, "nivel": nivel, "segundos": round(secs, 4), "filas": filas}
+            record.update(rss_mb=round(rss, 1), delta_mb=round(s.delta_mb, 1), pico_mb=round(s.pico_mb, 1))
+            log.info(json.dumps({**record, **info}, ensure_ascii=False, default=str))
+
+
+def timed(etapa: str, filas=None):
+    # decorador: la función entera es un span; filas(resultado) -> filas producidas
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _spans.get() is None and not log.isEnabledFor(logging.INFO):
+                return fn(*args, **kwargs)
+            with span(etapa) as s:
+                result = fn(*args, **kwargs)
+                if filas is not None and result is not None:
+                    s["filas"] = filas(result)
+                return result
+
+        return wrapper
+
+    return deco
+
+
+def timed_iter(etapa: str, iterable, **extra):
+    # un span por elemento (ej: cada bloque que devuelve el lector de CSV); el tiempo es el
+    # de producirlo, no el de lo que haga después quien lo consume
+    it = iter(iterable)
+    while True:
+        with span(etapa, **extra) as s:
+            item = next(it, _END)
+            if item is _END:
+                s["_descartar"] = True
+            else:
+                s["filas"] = len(item)
+        if item is _END:
+            return
+        yield item
+
+
+def summarize(spans: list):
+    # DataFrame para mostrar: una fila por span en orden de ejecución (pandas recién acá)
+    import pandas as pd
+
+    rows = [
+        {
+            "etapa": "  " * s.nivel + s.etapa,
+            "segundos": round(s.segundos, 3),
+            "filas": s.filas,
+            "rss_mb": round(s.rss_mb, 1),
+            "delta_mb": round(s.delta_mb, 1),
+            "pico_mb": round(s.pico_mb, 1),
+            "detalle": ", ".join(f"{k}={v}" for k, v in s.extra.items()),
+        }
+        for s in spans
+    ]
+    return pd.DataFrame(rows, columns=["etapa", "segundos", "filas", "rss_mb", "delta_mb", "pico_mb", "detalle"])
+
+
+# -----------------------------
+# cProfile (opcional)
+# -----------------------------
+# Un perfil por sesión: quien llama guarda el suyo (la app, en st.session_state) y lo pasa
+# como `previous` al empezar el siguiente; no hay un perfil global que otra sesión pise.
+def start_profile(folder: str, previous=None):
+    # folder vacío / None = sin perfil. Si el rerun anterior de la sesión cortó antes de
+    # dump_profile (st.stop) su perfil sigue activo: se apaga antes de empezar el nuevo.
+    # Devuelve None si no hay perfil o si Python no deja activar otro (3.12+: uno por proceso)
+    if previous is not None:
+        previous.disable()
+    if not folder:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # otra sesión está perfilando
+        return None
+    return profiler
+
+
+def dump_profile(profiler, folder: str, name: str = "rerun") -> str:
+    # guarda <folder>/<name>-<fecha>.prof (para snakeviz / pstats) y devuelve la ruta
+    if profiler is None:
+        return None
+    profiler.disable()
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}.prof")
+    profiler.dump_stats(path)
+    return path
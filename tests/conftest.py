@@ -0,0 +1,32 @@
+# tests/conftest.py — Datos de prueba: exports sintéticos chicos cargados en una base temporal
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from canastas import store  # noqa: E402
+from canastas.normalize import normalize_period, standardize_one  # noqa: E402
+from synthetic import synthetic_exports  # noqa: E402
+
+ESCALA = dict(filas=4_000, clientes=300, subrubros=25, articulos=200, vendedores=3, meses=4)
+
+
+@pytest.fixture(scope="session")
+def ventas():
+    # ventas normalizadas por empresa; anio_mes ya en "AAAA-MM" para filtrar por mes
+    out = {}
+    for e, d in synthetic_exports(**ESCALA, seed=0).items():
+        d = standardize_one(d, empresa=e)[store.VENTAS_COLS]
+        out[e] = d.assign(anio_mes=d["anio_mes"].map(normalize_period))
+    return out
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "DB_PATH", str(tmp_path / "ventas.sqlite"))
+    return store
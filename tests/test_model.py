@@ -0,0 +1,100 @@
+# tests/test_model.py — extend_model contra un modelo rearmado, y el orden de recommend_batch
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from canastas.model import build_model, extend_model, freq_order, recommend_batch, recommend_for_client
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def assert_same_model(a, b):
+    # campo por campo; idents no tiene un orden propio (depende del orden de carga)
+    for f in a._fields:
+        x, y = getattr(a, f), getattr(b, f)
+        if f == "idents":
+            x, y = (v.sort_values(list(v.columns), ignore_index=True) for v in (x, y))
+        if sp.issparse(x):
+            assert x.shape == y.shape, f
+            assert abs(x - y).max() < 1e-9 if x.nnz or y.nnz else True, f
+        elif isinstance(x, pd.DataFrame):
+            pd.testing.assert_frame_equal(
+                x.reset_index(drop=True), y.reset_index(drop=True), check_dtype=False, check_categorical=False, obj=f
+            )
+        elif isinstance(x, pd.Series):
+            pd.testing.assert_series_equal(x, y, check_dtype=False, check_categorical=False, obj=f)
+        elif isinstance(x, np.ndarray):
+            np.testing.assert_allclose(x, y, err_msg=f) if x.dtype.kind == "f" else np.testing.assert_array_equal(x, y, f)
+        else:
+            assert x == y, f
+
+
+def ingest(db, ventas, keep):
+    # carga en la base las filas de cada empresa que cumplen keep(empresa, df)
+    for e, d in ventas.items():
+        part = d[keep(e, d)]
+        if len(part):
+            db.db_ingest_df(part, f"{e}.csv", f"{e}-{len(part)}-{part['anio_mes'].min()}")
+
+
+# -----------------------------
+# extend_model
+# -----------------------------
+def test_extend_with_new_month_equals_rebuild(db, ventas):
+    last = max(d["anio_mes"].max() for d in ventas.values())
+    ingest(db, ventas, lambda e, d: d["anio_mes"] < last)
+    prev = build_model(db.db_load_df())
+
+    ingest(db, ventas, lambda e, d: d["anio_mes"] == last)
+    extended = extend_model(prev, db.db_load_df(period_from=last, period_to=last))
+
+    assert_same_model(extended, build_model(db.db_load_df()))
+
+
+def test_extend_with_other_empresa_in_loaded_month_equals_rebuild(db, ventas):
+    # BBA suma un mes que CROMOSOL ya tenía: los clientes por CUIT comparten canasta
+    last = max(d["anio_mes"].max() for d in ventas.values())
+    ingest(db, ventas, lambda e, d: (d["anio_mes"] < last) | (e == "CROMOSOL"))
+    prev = build_model(db.db_load_df())
+
+    ingest(db, ventas, lambda e, d: (d["anio_mes"] == last) & (e == "BBA"))
+    extended = extend_model(prev, db.db_load_df(empresas=["BBA"], period_from=last, period_to=last))
+
+    assert_same_model(extended, build_model(db.db_load_df()))
+
+
+# -----------------------------
+# recommend_batch
+# -----------------------------
+def test_recommend_batch_breaks_ties_by_freq():
+    # 5 subrubros; el cliente 0 compra el "a": "b", "c" y "e" empatan en score 2, "d" queda en 1
+    co = np.zeros((5, 5), dtype=np.float32)
+    co[0, 1:] = co[1:, 0] = [2, 2, 1, 2]
+    X = sp.csr_matrix(np.array([[1, 0, 0, 0, 0], [0, 0, 0, 0, 0]], dtype=np.float32))
+    subrubros = np.array(["a", "b", "c", "d", "e"], dtype=object)
+    freq = pd.Series({"a": 9.0, "d": 7.0, "c": 5.0, "b": 3.0, "e": 3.0})
+
+    rows, rank, sr, score = recommend_batch(X, sp.csr_matrix(co), freq_order(freq, subrubros), topk=4)
+
+    # score desc; a igual score, freq_global desc y, a igual freq, orden de subrubro
+    assert list(subrubros[sr[rows == 0]]) == ["c", "b", "e", "d"]
+    assert list(rank[rows == 0]) == [0, 1, 2, 3]
+    assert list(score[rows == 0]) == [2, 2, 2, 1]
+    # sin compras: por freq_global, sin score
+    assert list(subrubros[sr[rows == 1]]) == ["a", "d", "c", "b"]
+    assert np.isnan(score[rows == 1]).all()
+
+
+@pytest.mark.parametrize("topk", [1, 5, 25])
+def test_recommend_batch_matches_recommend_for_client(db, ventas, topk):
+    ingest(db, ventas, lambda e, d: d["anio_mes"] == d["anio_mes"])
+    m = build_model(db.db_load_df())
+    rows, _rank, sr, score = recommend_batch(m.X_bin, m.co, freq_order(m.freq, m.subrubros), topk)
+
+    for i in range(0, len(m.clients), 7):
+        one = recommend_for_client(m.clients[i], m.X_bin, m.co, m.freq, m.clients, m.subrubros, topk)
+        assert list(m.subrubros[sr[rows == i]]) == list(one["subrubro"]), m.clients[i]
+        np.testing.assert_array_equal(score[rows == i], one["score_cooc"].to_numpy())